@@ -1,12 +1,17 @@
 import os
-import json
+import sys
 import re
 from pathlib import Path
 from collections import Counter
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts" / "pipelines"))
+from jsonl_frames import write_jsonl as write_framed_jsonl
+
 ROOT = Path(r"C:\Users\amy\Downloads\Hollow_Books_Text")
 OUT = ROOT / "datasets"
 OUT.mkdir(exist_ok=True)
+# "none" for plain JSONL, "gzip"/"zstd" for compressed, seekable frames
+COMPRESSION = "none"
 
 def read_text(path):
     try:
@@ -44,10 +49,7 @@ def entity_extract(t):
     return list(set(re.findall(r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)*\b", t)))
 
 def write_jsonl(name, rows):
-    path = OUT / name
-    with open(path, "w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    path = write_framed_jsonl(OUT / name, rows, COMPRESSION)
     print("Wrote:", path)
 
 files = [p for p in ROOT.iterdir() if p.suffix.lower() in [".txt", ".md"]]
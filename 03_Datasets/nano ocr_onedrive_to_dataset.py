@@ -10,6 +10,10 @@ from dataclasses import dataclass, asdict
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts" / "pipelines"))
+from jsonl_frames import CODECS, FramedJsonlWriter, output_path
+from near_dedup import NearDuplicateIndex
+
 DEFAULT_EXTS = (".txt", ".md")
 SEED = 17
 
@@ -90,18 +94,17 @@ def iter_files(root: Path, exts: Sequence[str], recursive: bool) -> Iterable[Pat
     else:
         yield from (p for p in root.iterdir() if p.is_file() and p.suffix.lower() in exts)
 
-def write_jsonl(path: Path, rows: Iterable[Dict]) -> int:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    n = 0
-    with tmp.open("w", encoding="utf-8") as f:
+def write_jsonl(path: Path, rows: Iterable[Dict], codec: str = "none") -> int:
+    # why: framed writer handles tmp+replace; codec adds a seekable frame index
+    with FramedJsonlWriter(output_path(path, codec), codec) as w:
         for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n"); n += 1
-    tmp.replace(path)
-    return n
+            w.write(r)
+    return w.count
 
 def write_checksums(dir_path: Path) -> None:
-    for p in dir_path.glob("*.jsonl"):
+    for p in dir_path.iterdir():
+        if not p.name.endswith((".jsonl", ".jsonl.gz", ".jsonl.zst")):
+            continue
         h = hashlib.sha256(p.read_bytes()).hexdigest()
         (p.with_suffix(p.suffix + ".sha256")).write_text(h + "  " + p.name, encoding="utf-8")
 
@@ -111,10 +114,13 @@ def build_records(
     keep_urls: bool,
     chunk_chars: int,
     tags: List[str],
+    near_dup: float = 0.0,
 ) -> Tuple[List[Record], Dict[str, int], Dict[str, int]]:
     seen_hashes: set = set()
     pii_totals: Dict[str, int] = {k: 0 for k in PII_PATTERNS}
-    drop_reasons: Dict[str, int] = {"empty": 0, "duplicate": 0}
+    drop_reasons: Dict[str, int] = {"empty": 0, "duplicate": 0, "near_duplicate": 0}
+    # why: exact SHA1 misses re-exports of one document; MinHash/LSH keeps the first of each cluster
+    near = NearDuplicateIndex(near_dup) if near_dup > 0 else None
     out: List[Record] = []
 
     for p in inputs:
@@ -136,6 +142,13 @@ def build_records(
             continue
         seen_hashes.add(h)
 
+        if near is not None:
+            hit = near.add(p.name, red)
+            if hit is not None:
+                drop_reasons["near_duplicate"] += 1
+                print(f"[~] near-duplicate: {p.name} ~ {hit[0]} (J~{hit[1]:.2f})")
+                continue
+
         chunks = greedy_chunks(red, char_budget=chunk_chars)
         for idx, ch in enumerate(chunks):
             rid = sha1_hex(f"{h}:{idx}")
@@ -168,7 +181,10 @@ def validate_record(rec: Record) -> None:
     if not re.fullmatch(r"[0-9a-f]{40}", rec.hash):
         raise ValueError("invalid hash")
 
-def export_dataset(out_dir: Path, recs: List[Record], split: str) -> Dict[str, int]:
+def split_files(codec: str) -> Dict[str, str]:
+    return {s: output_path(Path("processed") / f"{s}.jsonl", codec).as_posix() for s in ("train", "val", "test")}
+
+def export_dataset(out_dir: Path, recs: List[Record], split: str, codec: str = "none") -> Dict[str, int]:
     ds_dir = out_dir / "processed"
     ds_dir.mkdir(parents=True, exist_ok=True)
 
@@ -180,9 +196,9 @@ def export_dataset(out_dir: Path, recs: List[Record], split: str) -> Dict[str, i
     for r in recs:
         validate_record(r)
 
-    n_train = write_jsonl(ds_dir / "train.jsonl", (asdict(r) for r in train))
-    n_val   = write_jsonl(ds_dir / "val.jsonl",   (asdict(r) for r in val))
-    n_test  = write_jsonl(ds_dir / "test.jsonl",  (asdict(r) for r in test))
+    n_train = write_jsonl(ds_dir / "train.jsonl", (asdict(r) for r in train), codec)
+    n_val   = write_jsonl(ds_dir / "val.jsonl",   (asdict(r) for r in val), codec)
+    n_test  = write_jsonl(ds_dir / "test.jsonl",  (asdict(r) for r in test), codec)
     write_checksums(ds_dir)
     return {"train": n_train, "val": n_val, "test": n_test}
 
@@ -195,18 +211,19 @@ def write_manifest(out_dir: Path, name: str, license_str: str, counts: Dict[str,
         "license": license_str,
         "schema": {
             "format": "jsonl",
+            "compression": args.compress,
             "record": {
                 "id": "str", "source_path": "str", "title": "str", "text": "str",
                 "tokens_est": "int", "hash": "hex(40)", "tags": "list[str]"
             }
         },
-        "files": {"train": "processed/train.jsonl", "val": "processed/val.jsonl", "test": "processed/test.jsonl"},
+        "files": split_files(args.compress),
         "counts": counts,
         "drops": drop_reasons,
         "pii_redactions": pii_totals,
         "build_args": vars(args),
     }
-    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2, default=str), encoding="utf-8")
 
 def write_stats(out_dir: Path, recs: List[Record]) -> None:
     toks = [r.tokens_est for r in recs]
@@ -217,25 +234,28 @@ def write_stats(out_dir: Path, recs: List[Record]) -> None:
     }
     (out_dir / "stats.json").write_text(json.dumps(stats, indent=2), encoding="utf-8")
 
-def write_dataset_card(out_dir: Path, name: str, license_str: str, counts: Dict[str, int], keep_urls: bool) -> None:
+def write_dataset_card(out_dir: Path, name: str, license_str: str, counts: Dict[str, int], keep_urls: bool,
+                       codec: str = "none", near_dup: float = 0.0) -> None:
+    files = split_files(codec)
+    fmt = "JSONL (UTF-8)" if codec == "none" else f"JSONL (UTF-8), {codec}-compressed in seekable frames (.idx.json index)"
     md = f"""# {name}
 
 **Version:** 1.0.0  
 **License:** {license_str}  
-**Format:** JSONL (UTF-8)  
+**Format:** {fmt}  
 **Splits:** train / val / test
 
 ## Schema
 - `id` (str), `source_path` (str), `title` (str), `text` (str), `tokens_est` (int), `hash` (hex40), `tags` (str[])
 
 ## Files
-- `processed/train.jsonl` — {counts.get("train",0)} rows  
-- `processed/val.jsonl` — {counts.get("val",0)} rows  
-- `processed/test.jsonl` — {counts.get("test",0)} rows
+- `{files["train"]}` — {counts.get("train",0)} rows  
+- `{files["val"]}` — {counts.get("val",0)} rows  
+- `{files["test"]}` — {counts.get("test",0)} rows
 
 ## Notes
 - PII redaction applied (emails/phones/SSNs/credit cards/IPs{", URLs kept" if keep_urls else ", URLs redacted"}).  
-- Duplicates removed via SHA1 after cleaning.  
+- Duplicates removed via SHA1 after cleaning{f"; near-duplicates (MinHash Jaccard >= {near_dup}) removed, first file kept" if near_dup > 0 else ""}.  
 - Chunks are ~target char budget without splitting words.
 """
     (out_dir / "DATASET_CARD.md").write_text(md, encoding="utf-8")
@@ -255,6 +275,10 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--split", type=str, default="90,5,5", help="Split percentages train,val,test.")
     ap.add_argument("--tags", type=str, default="", help="Comma-separated tags to include on each record.")
     ap.add_argument("--keep-urls", action="store_true", help="Do NOT redact URLs.")
+    ap.add_argument("--near-dup", type=float, default=0.0,
+                    help="Also drop near-duplicate files at this MinHash Jaccard similarity (e.g. 0.8; 0 = off).")
+    ap.add_argument("--compress", choices=CODECS, default="none",
+                    help="Write splits as compressed, seekable JSONL frames (gzip, or zstd if installed).")
     return ap.parse_args()
 
 def main() -> None:
@@ -271,15 +295,15 @@ def main() -> None:
         print(f"[!] No files with {exts} in {in_dir}", file=sys.stderr)
         sys.exit(1)
 
-    recs, pii_totals, drops = build_records(files, args.keep_urls, args.chunk_chars, tags)
+    recs, pii_totals, drops = build_records(files, args.keep_urls, args.chunk_chars, tags, args.near_dup)
     if not recs:
         print("[!] No usable records after processing.", file=sys.stderr)
         sys.exit(1)
 
-    counts = export_dataset(out_dir, recs, args.split)
+    counts = export_dataset(out_dir, recs, args.split, args.compress)
     write_manifest(out_dir, name, license_str, counts, pii_totals, drops, args)
     write_stats(out_dir, recs)
-    write_dataset_card(out_dir, name, license_str, counts, args.keep_urls)
+    write_dataset_card(out_dir, name, license_str, counts, args.keep_urls, args.compress, args.near_dup)
 
     print(f"[OK] {name} built at {out_dir}")
     print(f"  total records: {len(recs)} | train={counts['train']} val={counts['val']} test={counts['test']}")
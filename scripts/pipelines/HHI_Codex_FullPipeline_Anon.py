@@ -3,9 +3,31 @@ import re
 import json
 import hashlib
 import shutil
+import argparse
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+from anon_engine import AnonEngine, Gazetteer, Replace, Tokenize
+from anon_registry import AnonRegistry
+from source_manifest import SourceManifest
+from object_store import ObjectStore, is_compacted
+from version_delta import VersionReader, encode_version, is_delta
+from jsonl_frames import CODECS, FramedJsonlWriter, output_path
+from columnar_export import FORMATS as COLUMNAR_FORMATS, export_version
+from ops_parser import FIELD_PATTERN, HEADER_PATTERN, PARSER_VERSION, iter_ops
+from record_index import RecordIndexWriter, index_name
+from version_catalog import LATEST_POINTER_NAME, VersionCatalog
+from search_index import SEARCH_INDEX_NAME, SearchIndexWriter
+from version_diff import write_changelog
+from instrumentation import STATS
+from raw_watcher import DEBOUNCE_SECONDS, RawWatcher
+from release_profile import (PATHS_NAME, PROFILES, RAW_BLOCKS_NAME, RAW_OPS_NAME, RAW_SIDECAR_MODES,
+                             SOURCES_NAME, compact_block, compact_op, source_id)
 
 # =========================================================
 # CONFIG
@@ -16,20 +38,43 @@ RAW_DIR = ROOT / "codex_raw"
 OUT_ROOT = ROOT / "data" / "processed"
 VERSIONS_DIR = OUT_ROOT / "versions"
 LATEST_DIR = OUT_ROOT / "latest"
+# Names the published version; the one publish step that is atomic everywhere.
+LATEST_POINTER = OUT_ROOT / LATEST_POINTER_NAME
+# Token registry carried across versions so DATE_003 means the same date everywhere.
+ANON_REGISTRY_PATH = OUT_ROOT / "anonymization_registry.json"
+# Per-file manifest + cached parse/anon results for incremental rebuilds.
+CACHE_DIR = OUT_ROOT / "cache"
+# Content-addressed store; versions other than the published one are compacted into it.
+STORE_DIR = OUT_ROOT / "store"
+COMPACT_OLD_VERSIONS = True
+# Store old versions as record-level deltas against their parent instead (see version_delta.py).
+DELTA_VERSIONS = False
+# Positional fields left out of delta matching and rewritten on reconstruct.
+DELTA_RENUMBER = {"blocks_anon.jsonl": "index"}
+# Cross-version record catalog, updated as each version is written (see version_catalog.py).
+CATALOG_PATH = OUT_ROOT / "catalog.sqlite"
+# Full-text index over text_anon / block_anon only (see search_index.py).
+BUILD_SEARCH_INDEX = True
+# Record-level changelog against the previous version (see version_diff.py).
+WRITE_CHANGELOG = True
+CHANGELOG_DIR = OUT_ROOT / "changelogs"
+# JSONL codec: "none" (plain), or "gzip"/"zstd" in seekable frames (see jsonl_frames.py).
+OUTPUT_CODEC = "none"
+# "compact": release anonymized text only; raw text, paths and the anonymization
+# map go to RESTRICTED_DIR/<version> ("restricted") or are dropped ("none").
+# See release_profile.py.
+RELEASE_PROFILE = "full"
+RAW_SIDECAR = "restricted"
+RESTRICTED_DIR = OUT_ROOT / "restricted"
+# Bump when the cached per-file payload layout changes.
+CACHE_VERSION = 2
+
+SOURCE_SUFFIXES = {".txt", ".md"}
 
 # Version folder format: v001, v002, v003, ...
 VERSION_PREFIX = "v"
-
-# OPS detection: matches entire blocks like:
-# ■ Op 434 — Operation 434
-# Glyph: ...
-# ...
-OPS_PATTERN = re.compile(
-    r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)(.*?)(?=^■\s*Op\s+\d+\s*—\s*Operation\s+\d+|\\Z)",
-    re.S | re.M,
-)
-
-FIELD_PATTERN = re.compile(r"([A-Za-z ]+):\s*(.+)")
+# content_hash = SHA-256 over the canonical OPS/block record streams (see ContentHasher).
+CONTENT_HASH_SCHEME = "records-v1"
 
 # =========================================================
 # ANONYMIZATION CONFIG (HARD MODE "B")
@@ -75,6 +120,44 @@ MONTH_DATE_PATTERN = re.compile(
     re.I,
 )
 
+# Pronouns (hard mode) – very rough but effective
+# I / I'm / I've / I'd → "the subject", my / mine → the subject's
+PRONOUN_RULES = [
+    (r"\bI'm\b", "the subject is"),
+    (r"\bI’ve\b", "the subject has"),
+    (r"\bI'd\b", "the subject would"),
+    (r"\bI\b", "the subject"),
+    (r"\bmy\b", "the subject's"),
+    (r"\bmine\b", "the subject's"),
+]
+
+# Family relations → RELATION_###
+RELATION_TERMS = [
+    "mother", "father", "mom", "dad", "son", "daughter",
+    "husband", "wife", "boyfriend", "girlfriend", "partner",
+    "ex-husband", "ex-wife", "ex"
+]
+
+# Rule order matters: each rule sees the output of the ones before it.
+# The engine compiles them once and rewrites each block in a single scan.
+ANON_ENGINE = AnonEngine(
+    [
+        Replace(EMAIL_PATTERN, "CONTACT_EMAIL"),
+        Replace(PHONE_PATTERN, "CONTACT_PHONE"),
+        Tokenize(DATE_PATTERN, "DATE"),
+        Tokenize(MONTH_DATE_PATTERN, "DATE"),
+        Gazetteer(CUSTOM_NAMES, "NAME"),
+        Gazetteer(CUSTOM_LOCATIONS, "LOC", escape=True),
+        *(Replace(re.compile(p, re.I), r) for p, r in PRONOUN_RULES),
+        Gazetteer(RELATION_TERMS, "REL", token_prefix="RELATION"),
+    ]
+)
+# Per-rule match counts and scan time go into metadata.json "stats".
+ANON_ENGINE.stats = STATS
+
+SPACES_PATTERN = STATS.pattern("normalize.spaces", re.compile(r"[ \t]+"))
+BLANK_LINES_PATTERN = STATS.pattern("normalize.blank_lines", re.compile(r"\n{3,}"))
+
 # =========================================================
 # UTILS
 # =========================================================
@@ -84,22 +167,40 @@ def normalize_text(text: str) -> str:
     text = text.replace("\r", "")
     text = text.replace("\u007f", "")
     # collapse multiple spaces and tabs
-    text = re.sub(r"[ \t]+", " ", text)
+    text = SPACES_PATTERN.sub(" ", text)
     # normalize multiple blank lines
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = BLANK_LINES_PATTERN.sub("\n\n", text)
     return text.strip()
 
 
+def normalize_doc(raw: str) -> str:
+    """normalize_text for a whole source document, timed as the "normalize" stage."""
+    with STATS.stage("normalize"):
+        return normalize_text(raw)
+
+
+def iter_source_paths(raw_dir: Path) -> List[Path]:
+    """All .txt/.md files under raw_dir, in discovery order."""
+    return [p for p in raw_dir.rglob("*") if p.is_file() and p.suffix.lower() in SOURCE_SUFFIXES]
+
+
+def read_source(p: Path) -> str | None:
+    try:
+        with STATS.stage("load"):
+            raw = p.read_text(encoding="utf-8", errors="ignore")
+        STATS.add_bytes("read", p.stat().st_size)
+        return raw
+    except Exception as e:
+        print(f"[WARN] Could not read {p}: {e}")
+        return None
+
+
 def load_all_files(raw_dir: Path) -> List[Dict[str, Any]]:
     """Load all .txt/.md files as raw documents."""
     docs = []
-    for p in raw_dir.rglob("*"):
-        if p.is_file() and p.suffix.lower() in {".txt", ".md"}:
-            try:
-                raw = p.read_text(encoding="utf-8", errors="ignore")
-            except Exception as e:
-                print(f"[WARN] Could not read {p}: {e}")
-                continue
+    for p in iter_source_paths(raw_dir):
+        raw = read_source(p)
+        if raw is not None:
             docs.append(
                 {
                     "path": str(p),
@@ -112,31 +213,16 @@ def load_all_files(raw_dir: Path) -> List[Dict[str, Any]]:
 
 
 def parse_ops_from_text(text: str) -> List[Dict[str, Any]]:
-    """Extract OPS blocks & fields from a normalized text blob."""
+    """Extract OPS blocks & fields from a normalized text blob (see ops_parser.py)."""
     ops = []
-    for m in OPS_PATTERN.finditer(text):
-        op_id = m.group(1)
-        op_number = m.group(2)
-        block_raw = m.group(3)
-        block_norm = normalize_text(block_raw)
-
-        fields = {}
-        for line in block_raw.splitlines():
-            line = line.strip().lstrip("\u007f")
-            fm = FIELD_PATTERN.match(line)
-            if fm:
-                label = fm.group(1).strip()
-                value = fm.group(2).strip()
-                key = label.lower().replace(" ", "_")
-                fields[key] = value
-
+    for op in iter_ops(text):
         ops.append(
             {
-                "op_id": op_id,
-                "op_number": op_number,
-                "block_raw": block_raw.strip(),
-                "block_normalized": block_norm,
-                **fields,
+                "op_id": op.op_id,
+                "op_number": op.op_number,
+                "block_raw": op.body.strip(),
+                "block_normalized": normalize_text(op.body),
+                **op.fields,
             }
         )
     return ops
@@ -148,83 +234,216 @@ def parse_ops_from_text(text: str) -> List[Dict[str, Any]]:
 
 def anonymize_text_hard(text: str, anon_map: Dict[str, str]) -> str:
     """Apply hard anonymization to a text block."""
-    # 1) Contacts (email, phone)
-    text = EMAIL_PATTERN.sub("CONTACT_EMAIL", text)
-    text = PHONE_PATTERN.sub("CONTACT_PHONE", text)
-
-    # 2) Dates → DATE_###
-    # tokenization via mapping; increment counters
-    # We'll use anon_map to store stable replacements.
-    def _date_repl(m):
-        val = m.group(0)
-        key = f"DATE::{val}"
-        if key not in anon_map:
-            idx = sum(k.startswith("DATE::") for k in anon_map) + 1
-            anon_map[key] = f"DATE_{idx:03d}"
-        return anon_map[key]
-
-    text = DATE_PATTERN.sub(_date_repl, text)
-    text = MONTH_DATE_PATTERN.sub(_date_repl, text)
-
-    # 3) Custom names → NAME_###
-    for name in CUSTOM_NAMES:
-        pattern = re.compile(rf"\b{name}\b", re.I)
-        key = f"NAME::{name}"
-        if key not in anon_map:
-            idx = sum(k.startswith("NAME::") for k in anon_map) + 1
-            anon_map[key] = f"NAME_{idx:03d}"
-        text = pattern.sub(anon_map[key], text)
-
-    # 4) Custom locations → LOC_###
-    for loc in CUSTOM_LOCATIONS:
-        pattern = re.compile(rf"\b{re.escape(loc)}\b", re.I)
-        key = f"LOC::{loc}"
-        if key not in anon_map:
-            idx = sum(k.startswith("LOC::") for k in anon_map) + 1
-            anon_map[key] = f"LOC_{idx:03d}"
-        text = pattern.sub(anon_map[key], text)
-
-    # 5) Pronouns (hard mode) – very rough but effective
-    # I / I'm / I've / I'd → "the subject"
-    text = re.sub(r"\bI'm\b", "the subject is", text, flags=re.I)
-    text = re.sub(r"\bI’ve\b", "the subject has", text, flags=re.I)
-    text = re.sub(r"\bI'd\b", "the subject would", text, flags=re.I)
-    text = re.sub(r"\bI\b", "the subject", text, flags=re.I)
-
-    # my / mine → the subject's
-    text = re.sub(r"\bmy\b", "the subject's", text, flags=re.I)
-    text = re.sub(r"\bmine\b", "the subject's", text, flags=re.I)
-
-    # family relations → RELATION_###
-    relation_terms = [
-        "mother", "father", "mom", "dad", "son", "daughter",
-        "husband", "wife", "boyfriend", "girlfriend", "partner",
-        "ex-husband", "ex-wife", "ex"
-    ]
-    for rel in relation_terms:
-        pattern = re.compile(rf"\b{rel}\b", re.I)
-        key = f"REL::{rel}"
-        if key not in anon_map:
-            idx = sum(k.startswith("REL::") for k in anon_map) + 1
-            anon_map[key] = f"RELATION_{idx:03d}"
-        text = pattern.sub(anon_map[key], text)
+    return ANON_ENGINE.anonymize(text, anon_map)
+
+
+# =========================================================
+# PER-DOCUMENT PROCESSING
+# =========================================================
+
+def process_doc(path: Path, text_norm: str,
+                anon_map: Dict[str, str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Parse + anonymize one normalized document.
+
+    Blocks carry no global index yet; main() numbers them across documents.
+    """
+    with STATS.stage("parse"):
+        parsed = parse_ops_from_text(text_norm)
+        # generic blocks: split by double newline
+        chunks = [c.strip() for c in text_norm.split("\n\n") if c.strip()]
+
+    with STATS.stage("anonymize"):
+        ops = []
+        for op in parsed:
+            # anonymize block
+            # the file's name, as on blocks: op ids restart in every ledger
+            op_anon = dict(op, source=path.name)
+            op_anon["block_anon"] = anonymize_text_hard(op["block_normalized"], anon_map)
+            ops.append(op_anon)
+
+        blocks = []
+        for c in chunks:
+            blocks.append(
+                {
+                    "source": path.name,
+                    "path": str(path),
+                    "text": c,
+                    "text_anon": anonymize_text_hard(c, anon_map),
+                }
+            )
+    return {"ops": ops, "blocks": blocks}
+
+
+# Workers number new tokens from here until the parent assigns final numbers.
+PROVISIONAL_TOKEN_OFFSET = 1_000_000
+
+
+def _process_doc_task(task) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Tuple[str, str]],
+                                     Dict[str, Any]]:
+    """Worker: normalize + process one doc against a registry snapshot.
+
+    Returns the payload, the keys this doc added (in allocation order) and
+    the worker's stats for this doc.
+    """
+    path, raw, entries, counters, tracing = task
+    # A forked worker starts with a copy of the parent's totals.
+    STATS.reset()
+    STATS.tracing = tracing
+    anon_map = AnonRegistry(entries, counters)
+    payload = process_doc(path, normalize_doc(raw), anon_map)
+    new_keys = [(k, v) for k, v in anon_map.items() if k not in entries]
+    return payload, new_keys, STATS.drain()
+
+
+def _retokenize(payload: Dict[str, List[Dict[str, Any]]], text_norm: str,
+                mapping: Dict[str, str]) -> bool:
+    """Swap provisional tokens for final ones in a worker payload, in place.
+
+    Only safe when no provisional token occurs in the source text itself, so
+    every occurrence in the output is one the anonymizer inserted. Returns
+    False (payload untouched) otherwise.
+    """
+    if any(tok in text_norm for tok in mapping):
+        return False
+    alternation = "|".join(re.escape(t) for t in sorted(mapping, key=len, reverse=True))
+    pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")
+
+    def repl(m):
+        return mapping[m.group(0)]
+
+    for op in payload["ops"]:
+        op["block_anon"] = pattern.sub(repl, op["block_anon"])
+    for b in payload["blocks"]:
+        b["text_anon"] = pattern.sub(repl, b["text_anon"])
+    return True
+
+
+def _worker_counters(anon_map: AnonRegistry) -> Dict[str, int]:
+    categories = {r.category for r in ANON_ENGINE.rules if hasattr(r, "category")}
+    return {
+        c: anon_map.counters.get(c, 0) + PROVISIONAL_TOKEN_OFFSET
+        for c in categories | set(anon_map.counters)
+    }
 
-    return text
+
+def _merge_worker_result(path: Path, raw: str, result,
+                         anon_map: AnonRegistry) -> Dict[str, List[Dict[str, Any]]]:
+    """Allocate a worker's new keys in order and return its payload with final tokens."""
+    payload, new_keys, stats = result
+    STATS.merge(stats)
+    mapping = {}
+    for key, provisional in new_keys:
+        category = key.split("::", 1)[0]
+        prefix = provisional.rsplit("_", 1)[0]
+        final = anon_map.allocate(key, category, prefix)
+        if final != provisional:
+            mapping[provisional] = final
+    if mapping and not _retokenize(payload, normalize_text(raw), mapping):
+        # Ambiguous swap: redo here; every key is registered now, so nothing new is allocated.
+        print(f"[INFO] Re-running {path.name} against the merged registry")
+        payload = process_doc(path, normalize_doc(raw), anon_map)
+    return payload
+
+
+def iter_doc_payloads(paths: List[Path], manifest: SourceManifest, anon_map: AnonRegistry,
+                      workers: int):
+    """Yield each readable source's payload, in path order, one at a time.
+
+    Unchanged files come from the manifest cache; changed ones are processed and
+    cached. With workers > 1 changed docs go to a process pool, at most
+    2 * workers in flight. Workers tokenize against a snapshot of the registry,
+    numbering new keys from PROVISIONAL_TOKEN_OFFSET; the keys are allocated
+    here in document order, exactly as the serial loop would, and provisional
+    tokens are swapped for the final ones.
+    """
+    if workers <= 1:
+        for p in paths:
+            payload, raw = manifest.lookup(p, read_source)
+            if payload is None:
+                if raw is None:
+                    continue
+                payload = process_doc(p, normalize_doc(raw), anon_map)
+                manifest.store(p, raw, payload)
+                STATS.count("docs_processed")
+            else:
+                STATS.count("docs_cached")
+            yield payload
+        return
+
+    print(f"[INFO] Processing changed docs with {workers} workers")
+
+    def resolve(item):
+        p, raw, pending = item
+        if raw is None:
+            return pending
+        payload = _merge_worker_result(p, raw, pending.result(), anon_map)
+        manifest.store(p, raw, payload)
+        return payload
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        for p in paths:
+            payload, raw = manifest.lookup(p, read_source)
+            if payload is not None:
+                window.append((p, None, payload))
+                STATS.count("docs_cached")
+            elif raw is not None:
+                task = (p, raw, dict(anon_map), _worker_counters(anon_map), STATS.tracing)
+                window.append((p, raw, pool.submit(_process_doc_task, task)))
+                STATS.count("docs_processed")
+            while len(window) > 2 * workers:
+                yield resolve(window.popleft())
+        while window:
+            yield resolve(window.popleft())
+
+
+def pipeline_fingerprint() -> str:
+    """Hash of everything that shapes per-file results; a change drops the cache."""
+    parts = [CACHE_VERSION, HEADER_PATTERN.pattern, PARSER_VERSION, FIELD_PATTERN.pattern,
+             ANON_ENGINE.fingerprint()]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
 
 
 # =========================================================
 # VERSIONING
 # =========================================================
 
+class ContentHasher:
+    """Incremental hash over the canonical OPS and block record streams.
+
+    Each record is serialized with sorted keys and fed in output order, so the
+    hash never needs the whole corpus in memory.
+    """
+
+    def __init__(self):
+        self._ops = hashlib.sha256()
+        self._blocks = hashlib.sha256()
+
+    @staticmethod
+    def _canonical(record: Dict[str, Any]) -> bytes:
+        line = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return (line + "\n").encode("utf-8")
+
+    def add_op(self, op: Dict[str, Any]) -> None:
+        self._ops.update(self._canonical(op))
+
+    def add_block(self, block: Dict[str, Any]) -> None:
+        self._blocks.update(self._canonical(block))
+
+    def hexdigest(self) -> str:
+        combined = (f"{CONTENT_HASH_SCHEME}\nops:{self._ops.hexdigest()}"
+                    f"\nblocks:{self._blocks.hexdigest()}")
+        return hashlib.sha256(combined.encode("utf-8")).hexdigest()
+
+
 def compute_content_hash(ops: List[Dict[str, Any]], blocks: List[Dict[str, Any]]) -> str:
     """Compute a stable hash from OPS + blocks to detect changes."""
-    # Sort for stability
-    ops_sorted = sorted(ops, key=lambda d: (d.get("op_id"), d.get("op_number")))
-    blocks_sorted = sorted(blocks, key=lambda d: (d.get("source"), d.get("index")))
-    payload = json.dumps(
-        {"ops": ops_sorted, "blocks": blocks_sorted}, ensure_ascii=False, sort_keys=True
-    )
-    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    hasher = ContentHasher()
+    for op in ops:
+        hasher.add_op(op)
+    for b in blocks:
+        hasher.add_block(b)
+    return hasher.hexdigest()
 
 
 def list_versions() -> List[str]:
@@ -252,130 +471,425 @@ def get_next_version_name(latest: str | None) -> str:
     return f"{VERSION_PREFIX}{num+1:03d}"
 
 
-def load_prev_hash(latest: str | None) -> str | None:
+def load_prev_metadata(latest: str | None) -> Dict[str, Any]:
     if latest is None:
-        return None
+        return {}
     meta_path = VERSIONS_DIR / latest / "metadata.json"
     if not meta_path.exists():
-        return None
+        return {}
     try:
-        meta = json.loads(meta_path.read_text(encoding="utf-8"))
-        return meta.get("content_hash")
+        return json.loads(meta_path.read_text(encoding="utf-8"))
     except Exception:
-        return None
+        return {}
+
+
+def load_prev_hash(latest: str | None) -> str | None:
+    return load_prev_metadata(latest).get("content_hash")
 
 
 # =========================================================
-# MAIN PIPELINE
+# PUBLISH
 # =========================================================
 
-def main():
-    print(f"[INFO] ROOT      : {ROOT}")
-    print(f"[INFO] RAW_DIR   : {RAW_DIR}")
-    print(f"[INFO] OUT_ROOT  : {OUT_ROOT}")
-
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-    OUT_ROOT.mkdir(parents=True, exist_ok=True)
-    VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+def _remove_path(p: Path) -> None:
+    if p.is_symlink() or p.is_file():
+        p.unlink()
+    elif p.is_dir():
+        shutil.rmtree(p)
 
-    # 1) Load all docs
-    docs = load_all_files(RAW_DIR)
-    print(f"[INFO] Loaded {len(docs)} docs from codex_raw")
 
-    # 2) Build OPS + blocks
-    all_ops: List[Dict[str, Any]] = []
-    all_blocks: List[Dict[str, Any]] = []
-    anon_map: Dict[str, str] = {}
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def commit_version(staging_dir: Path, version_dir: Path) -> None:
+    """Move a finished staging folder to `version_dir` with a single directory rename.
+
+    Published versions are never rewritten; a leftover folder of the same name
+    (from an interrupted run that never published it) is cleared first.
+    """
+    if version_dir.exists():
+        shutil.rmtree(version_dir)
+    os.replace(staging_dir, version_dir)
+
+
+def _write_latest_pointer(version_dir: Path) -> None:
+    tmp = LATEST_POINTER.with_name(f".{LATEST_POINTER.name}.tmp")
+    pointer = {"version": version_dir.name,
+               "path": Path(os.path.relpath(version_dir, LATEST_POINTER.parent)).as_posix()}
+    tmp.write_text(json.dumps(pointer, indent=4), encoding="utf-8")
+    os.replace(tmp, LATEST_POINTER)
+
+
+def publish_latest(version_dir: Path) -> str:
+    """Point LATEST_DIR and LATEST_POINTER at `version_dir` without copying data.
+
+    Returns the method used for LATEST_DIR. Preferred: a relative symlink
+    built beside it and renamed over it, so readers see either the old
+    release or the new one. Where symlinks are unavailable (e.g. Windows
+    without developer mode) a hardlinked tree is built instead and swapped in
+    with two renames: between them LATEST_DIR does not exist. A directory
+    cannot be replaced in one rename there, so LATEST_POINTER is the atomic
+    reference: a small file replaced with one os.replace() on every publish.
+    Readers that must never miss a release read it instead of LATEST_DIR.
+    Both methods cost O(files).
+    """
+    tmp = LATEST_DIR.with_name(f".{LATEST_DIR.name}.tmp")
+    old = LATEST_DIR.with_name(f".{LATEST_DIR.name}.old")
+    _remove_path(tmp)
+    _remove_path(old)
 
-    block_idx = 0
-    for doc in docs:
-        text_norm = doc["normalized"]
+    try:
+        os.symlink(os.path.relpath(version_dir, LATEST_DIR.parent), tmp, target_is_directory=True)
+        method = "symlink"
+    except (OSError, NotImplementedError):
+        shutil.copytree(version_dir, tmp, copy_function=_link_or_copy)
+        method = "hardlinks"
+
+    if tmp.is_symlink() and (LATEST_DIR.is_symlink() or not LATEST_DIR.exists()):
+        os.replace(tmp, LATEST_DIR)
+    else:
+        # A directory cannot be renamed over another path: move the old one aside first.
+        if LATEST_DIR.is_symlink() or LATEST_DIR.exists():
+            os.replace(LATEST_DIR, old)
+        os.replace(tmp, LATEST_DIR)
+        _remove_path(old)
+    _write_latest_pointer(version_dir)
+    return method
+
+
+def compact_old_versions(current: str, delta: bool = False) -> None:
+    """Move every version except `current` into the object store.
+
+    With `delta`, a version is stored as a record-level delta against its
+    parent instead, until the chain reaches SNAPSHOT_INTERVAL and a full
+    compaction starts the next one. A version already compacted is skipped,
+    so one materialized in place on demand stays on disk until it is
+    compacted again by hand.
+    """
+    store = ObjectStore(STORE_DIR)
+    reader = VersionReader(VERSIONS_DIR, STORE_DIR)
+    for v in list_versions():
+        vdir = VERSIONS_DIR / v
+        if v == current or is_compacted(vdir) or is_delta(vdir):
+            continue
+        if delta:
+            # Indexes are rebuilt from the records on demand
+            # (record_index.py / search_index.py build).
+            derived = [SEARCH_INDEX_NAME] + [index_name(v, kind)
+                                             for kind in ("block_index", "ops_index")]
+            stats = encode_version(reader, v, DELTA_RENUMBER, derived=derived)
+            if stats is not None:
+                changed = sum(s["inserted"] + s["deleted"] for s in stats.values())
+                print(f"[OK] Stored {v} as a delta ({changed} records inserted/deleted)")
+                continue
+        result = store.compact(vdir)
+        print(f"[OK] Compacted {v} into store ({result['bytes_freed']} bytes freed)")
 
-        # OPS from this doc
-        ops = parse_ops_from_text(text_norm)
-        for op in ops:
-            # anonymize block
-            anon_block = anonymize_text_hard(op["block_normalized"], anon_map)
-            op_anon = dict(op)
-            op_anon["block_anon"] = anon_block
-            all_ops.append(op_anon)
 
-        # generic blocks: split by double newline
-        chunks = [c.strip() for c in text_norm.split("\n\n") if c.strip()]
-        for c in chunks:
-            anon_c = anonymize_text_hard(c, anon_map)
-            all_blocks.append(
-                {
-                    "source": doc["name"],
-                    "path": doc["path"],
-                    "index": block_idx,
-                    "text": c,
-                    "text_anon": anon_c,
-                }
-            )
-            block_idx += 1
+# =========================================================
+# MAIN PIPELINE
+# =========================================================
 
-    print(f"[INFO] OPS entries     : {len(all_ops)}")
-    print(f"[INFO] Generic blocks  : {len(all_blocks)}")
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="HHI Codex FullPipeline (anon, versioned, normalized)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Processes for parsing + anonymization (0 = all cores). "
+                         "Output is identical for any value.")
+    ap.add_argument("--delta", action="store_true", default=DELTA_VERSIONS,
+                    help="Store superseded versions as record-level deltas with periodic "
+                         "snapshots.")
+    ap.add_argument("--compress", choices=CODECS, default=OUTPUT_CODEC,
+                    help="Write ops/blocks JSONL in compressed, seekable frames "
+                         "(gzip, or zstd if installed).")
+    ap.add_argument("--columnar", choices=sorted(COLUMNAR_FORMATS), default=None,
+                    help="Also export ops/blocks as Parquet or Arrow IPC (needs pyarrow).")
+    ap.add_argument("--trace", type=Path, default=None,
+                    help="Also write every stage call as a Chrome trace "
+                         "(chrome://tracing, Perfetto) to this file.")
+    ap.add_argument("--profile", choices=PROFILES, default=RELEASE_PROFILE,
+                    help="compact: release anonymized text and fields only, with short source IDs.")
+    ap.add_argument("--raw-sidecar", choices=RAW_SIDECAR_MODES, default=RAW_SIDECAR,
+                    help="compact profile: keep raw text under RESTRICTED_DIR/<version>, "
+                         "or drop it.")
+    ap.add_argument("--watch", action="store_true",
+                    help="After the run, keep watching RAW_DIR and update latest/ "
+                         "whenever sources change.")
+    ap.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS,
+                    help="--watch: seconds of quiet before a burst of writes is processed.")
+    ap.add_argument("--poll", action="store_true",
+                    help="--watch: poll the folder instead of using inotify.")
+    return ap.parse_args(argv)
+
+
+def run_pipeline(args: argparse.Namespace, workers: int) -> None:
+    """One incremental run: reprocess changed sources, publish if the content changed."""
+    STATS.reset()
+    STATS.tracing = args.trace is not None
+
+    # Existing tokens keep their numbers; new surface forms get the next free ID.
+    latest = get_latest_version()
+    seed_map = None
+    if latest:
+        seed_map = VERSIONS_DIR / latest / "anonymization_map.json"
+        if not seed_map.exists():
+            seed_map = RESTRICTED_DIR / latest / "anonymization_map.json"
+    anon_map = AnonRegistry.load(ANON_REGISTRY_PATH, seed_map)
+    print(f"[INFO] Anon registry   : {len(anon_map)} known keys")
+
+    # 1) Load docs, reprocessing only files whose content changed
+    manifest = SourceManifest(CACHE_DIR, pipeline_fingerprint())
+    paths = iter_source_paths(RAW_DIR)
+    prev_meta = load_prev_metadata(latest)
+    prev_hash = prev_meta.get("content_hash")
+    codec = args.compress
+    compact = args.profile == "compact"
+    # Output options of the latest version; a change publishes a new version
+    # even when the sources did not.
+    same_layout = (LATEST_DIR.exists() and prev_meta.get("compression") == codec
+                   and prev_meta.get("columnar") == args.columnar
+                   and prev_meta.get("raw_sidecar") == (args.raw_sidecar if compact else None))
+    if (latest is not None and same_layout and manifest.extra.get("content_hash") == prev_hash
+            and manifest.up_to_date(paths)):
+        print(f"[INFO] No source change detected. Latest version {latest} is current.")
+        return
+
+    # 2) Stream OPS + blocks straight to a staging folder, one doc at a time
+    staging_dir = VERSIONS_DIR / ".staging"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+    hasher = ContentHasher()
+    doc_count = ops_count = block_count = 0
+
+    raw_staging = None
+    if compact and args.raw_sidecar == "restricted":
+        raw_staging = RESTRICTED_DIR / ".staging"
+        shutil.rmtree(raw_staging, ignore_errors=True)
+        raw_staging.mkdir(parents=True)
+    sources: Dict[str, str] = {}
+
+    def anonymize_field(value: str) -> str:
+        return anonymize_text_hard(value, anon_map)
+
+    def raw_writer(name: str):
+        if raw_staging is None:
+            return nullcontext()
+        return FramedJsonlWriter(output_path(raw_staging / name, codec), codec)
+
+    # Byte-offset indexes (see record_index.py); renamed to <version>_*.jsonl below.
+    search_index = (SearchIndexWriter(staging_dir / SEARCH_INDEX_NAME) if BUILD_SEARCH_INDEX
+                    else nullcontext())
+    ops_path = output_path(staging_dir / "ops_ledger_anon.jsonl", codec)
+    blocks_path = output_path(staging_dir / "blocks_anon.jsonl", codec)
+    with FramedJsonlWriter(ops_path, codec) as ops_data, \
+         FramedJsonlWriter(blocks_path, codec) as blocks_data, \
+         RecordIndexWriter(staging_dir / "ops_index.jsonl", ops_data, "op_id") as ops_f, \
+         RecordIndexWriter(staging_dir / "block_index.jsonl", blocks_data, "index") as blocks_f, \
+         search_index as search, \
+         raw_writer(RAW_OPS_NAME) as raw_ops_f, \
+         raw_writer(RAW_BLOCKS_NAME) as raw_blocks_f:
+        for payload in iter_doc_payloads(paths, manifest, anon_map, workers):
+            doc_count += 1
+            ops = payload["ops"]
+            blocks = []
+            for b in payload["blocks"]:
+                blocks.append({
+                    "source": b["source"],
+                    "path": b["path"],
+                    "index": block_count + len(blocks),
+                    "text": b["text"],
+                    "text_anon": b["text_anon"],
+                })
+            if compact:
+                with STATS.stage("compact"):
+                    # A doc with ops always has blocks, so `sid` is set for them.
+                    sid = source_id(blocks[0]["path"], RAW_DIR) if blocks else ""
+                    if ops:
+                        ops, raw_ops = zip(*(compact_op(op, sid, anonymize_field) for op in ops))
+                    else:
+                        raw_ops = ()
+                    if blocks:
+                        sources[sid] = blocks[0]["path"]
+                        blocks, raw_blocks = zip(*(compact_block(b, sid) for b in blocks))
+                    else:
+                        raw_blocks = ()
+                    if raw_staging:
+                        for r in raw_ops:
+                            raw_ops_f.write(r)
+                        for r in raw_blocks:
+                            raw_blocks_f.write(r)
+            with STATS.stage("hash"):
+                for op in ops:
+                    hasher.add_op(op)
+                for block in blocks:
+                    hasher.add_block(block)
+            with STATS.stage("write"):
+                for op in ops:
+                    ops_f.write(op)
+                    if search:
+                        search.add("op", ops_count, op)
+                    ops_count += 1
+                for block in blocks:
+                    blocks_f.write(block)
+                    if search:
+                        search.add("block", block_count, block)
+                    block_count += 1
+    manifest.prune(str(p) for p in paths)
+
+    print(f"[INFO] Loaded {doc_count} docs from codex_raw ({manifest.changed} changed)")
+    print(f"[INFO] OPS entries     : {ops_count}")
+    print(f"[INFO] Generic blocks  : {block_count}")
     print(f"[INFO] Anon map size   : {len(anon_map)} keys")
 
-    # 3) Compute hash & decide version
-    content_hash = compute_content_hash(all_ops, all_blocks)
-    latest = get_latest_version()
-    prev_hash = load_prev_hash(latest)
+    # 3) Decide version from the streamed hash
+    content_hash = hasher.hexdigest()
 
     if prev_hash == content_hash and latest is not None:
-        print(f"[INFO] No content change detected. Reusing latest version: {latest}")
-        version_name = latest
+        if same_layout:
+            # Same records, same layout: keep the published files untouched.
+            shutil.rmtree(staging_dir)
+            if raw_staging:
+                shutil.rmtree(raw_staging)
+            anon_map.save(ANON_REGISTRY_PATH)
+            manifest.extra["content_hash"] = content_hash
+            manifest.save()
+            print(f"[INFO] No content change detected. Latest version {latest} is current.")
+            return
+        # A published folder is never rewritten in place (latest/ may point at it):
+        # the new layout becomes a version of its own.
+        version_name = get_next_version_name(latest)
+        print(f"[INFO] No content change, but the output layout changed. "
+              f"Creating version: {version_name}")
     else:
         version_name = get_next_version_name(latest)
         print(f"[INFO] New content detected. Creating version: {version_name}")
 
     version_dir = VERSIONS_DIR / version_name
-    version_dir.mkdir(parents=True, exist_ok=True)
-
-    # 4) Write datasets into version folder
-    ops_jsonl = version_dir / "ops_ledger_anon.jsonl"
-    blocks_jsonl = version_dir / "blocks_anon.jsonl"
-    anon_map_path = version_dir / "anonymization_map.json"
-    meta_path = version_dir / "metadata.json"
-
-    # ops JSONL
-    with ops_jsonl.open("w", encoding="utf-8") as f:
-        for op in all_ops:
-            f.write(json.dumps(op, ensure_ascii=False) + "\n")
 
-    # blocks JSONL
-    with blocks_jsonl.open("w", encoding="utf-8") as f:
-        for b in all_blocks:
-            f.write(json.dumps(b, ensure_ascii=False) + "\n")
+    # 4) Finish the version in staging, then move it into place
+    index_files = {}
+    for kind in ("block_index", "ops_index"):
+        index_files[kind] = index_name(version_name, kind)
+        (staging_dir / f"{kind}.jsonl").replace(staging_dir / index_files[kind])
+
+    with STATS.stage("write"):
+        if args.columnar:
+            export_version(staging_dir, args.columnar)
+
+        # Raw surface forms -> tokens: part of the restricted sidecar in the compact profile.
+        map_dir = staging_dir if not compact else raw_staging
+        if map_dir is not None:
+            with (map_dir / "anonymization_map.json").open("w", encoding="utf-8") as f:
+                json.dump(anon_map, f, indent=4, ensure_ascii=False)
+        # Local paths: release metadata in the full profile, restricted otherwise.
+        local_paths = {"root": str(ROOT), "raw_dir": str(RAW_DIR)}
+        if raw_staging:
+            with (raw_staging / SOURCES_NAME).open("w", encoding="utf-8") as f:
+                json.dump(sources, f, indent=4, ensure_ascii=False)
+            with (raw_staging / PATHS_NAME).open("w", encoding="utf-8") as f:
+                json.dump({"version": version_name, **local_paths}, f, indent=4, ensure_ascii=False)
+    for d in filter(None, (staging_dir, raw_staging)):
+        STATS.add_bytes("written", sum(p.stat().st_size for p in d.iterdir() if p.is_file()))
 
-    # anonymization map
-    with anon_map_path.open("w", encoding="utf-8") as f:
-        json.dump(anon_map, f, indent=4, ensure_ascii=False)
-
-    # metadata
     metadata = {
         "version": version_name,
         "generated_at": datetime.utcnow().isoformat() + "Z",
-        "root": str(ROOT),
-        "raw_dir": str(RAW_DIR),
-        "ops_count": len(all_ops),
-        "block_count": len(all_blocks),
+        **({} if compact else local_paths),
+        "ops_count": ops_count,
+        "block_count": block_count,
         "content_hash": content_hash,
+        "hash_scheme": CONTENT_HASH_SCHEME,
+        "compression": codec,
+        "columnar": args.columnar,
+        "profile": args.profile,
+        "raw_sidecar": args.raw_sidecar if compact else None,
+        "index_files": index_files,
+        "stats": STATS.summary(),
     }
-    with meta_path.open("w", encoding="utf-8") as f:
+    with (staging_dir / "metadata.json").open("w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=4, ensure_ascii=False)
 
+    commit_version(staging_dir, version_dir)
     print(f"[OK] Wrote version data to {version_dir}")
+    if raw_staging:
+        restricted = RESTRICTED_DIR / version_name
+        shutil.rmtree(restricted, ignore_errors=True)
+        os.replace(raw_staging, restricted)
+        print(f"[OK] Wrote raw text sidecar to {restricted} (restricted; not part of the release)")
+
+    anon_map.save(ANON_REGISTRY_PATH)
+    # Saved last: cached results may reference tokens only the registry knows.
+    manifest.extra["content_hash"] = content_hash
+    manifest.save()
+
+    # 5) Point latest/ at the version
+    method = publish_latest(version_dir)
+    print(f"[OK] Updated 'latest' -> {version_dir.name} ({method})")
+
+    with VersionCatalog(CATALOG_PATH, STORE_DIR) as catalog:
+        if not catalog.is_current(version_dir):
+            n = catalog.index_version(version_dir)
+            print(f"[OK] Catalogued {version_name} ({n} records) in {CATALOG_PATH.name}")
+        catalog.set_alias("latest", version_name)
+
+    if WRITE_CHANGELOG and latest is not None and version_name != latest:
+        summary = write_changelog(VERSIONS_DIR / latest, version_dir, CHANGELOG_DIR, STORE_DIR)
+        print(f"[OK] Changelog {latest} -> {version_name} in {CHANGELOG_DIR} "
+              f"({summary['changes']})")
+
+    # 6) Compact older versions into the object store (materialize on demand)
+    if COMPACT_OLD_VERSIONS:
+        compact_old_versions(version_name, delta=args.delta)
+
+    print("[INFO] Stage times:")
+    print(STATS.report())
+    if args.trace is not None:
+        print(f"[OK] Trace written to {STATS.write_trace(args.trace)}")
+    print("[DONE] HHI Codex FullPipeline (anon, versioned, normalized) complete.")
 
-    # 5) Update latest/
-    if LATEST_DIR.exists():
-        shutil.rmtree(LATEST_DIR)
-    shutil.copytree(version_dir, LATEST_DIR)
-    print(f"[OK] Updated 'latest' -> {LATEST_DIR}")
 
-    print("[DONE] HHI Codex FullPipeline (anon, versioned, normalized) complete.")
+def watch(args: argparse.Namespace, workers: int) -> None:
+    """Re-run the pipeline each time sources under RAW_DIR change (Ctrl+C stops)."""
+    watcher = RawWatcher(RAW_DIR, SOURCE_SUFFIXES, debounce=args.debounce, force_poll=args.poll)
+    print(f"[INFO] Watching {RAW_DIR} ({watcher.backend}); Ctrl+C to stop")
+    try:
+        while True:
+            changed = watcher.wait()
+            names = ", ".join(p.name for p in list(changed)[:5])
+            names += " ..." if len(changed) > 5 else ""
+            print(f"[INFO] {len(changed)} source file(s) changed: {names}")
+            t0 = time.perf_counter()
+            try:
+                run_pipeline(args, workers)
+            except Exception as e:
+                # A half-copied or unreadable file should not end the watch.
+                print(f"[WARN] Run failed: {e!r}; waiting for the next change")
+                continue
+            print(f"[OK] latest/ checked in {time.perf_counter() - t0:.2f}s")
+    except KeyboardInterrupt:
+        print("[INFO] Watch stopped.")
+    finally:
+        watcher.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    print(f"[INFO] ROOT      : {ROOT}")
+    print(f"[INFO] RAW_DIR   : {RAW_DIR}")
+    print(f"[INFO] OUT_ROOT  : {OUT_ROOT}")
+
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    OUT_ROOT.mkdir(parents=True, exist_ok=True)
+    VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+
+    run_pipeline(args, workers)
+    if args.watch:
+        watch(args, workers)
 
 
 if __name__ == "__main__":
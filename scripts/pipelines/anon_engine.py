@@ -0,0 +1,408 @@
+"""
+anon_engine.py
+Compiled single-pass hard anonymizer shared by the HHI pipelines.
+
+The legacy anonymizers apply their rules one `re.sub` at a time, in a fixed
+order (contacts, dates, names, locations, pronouns, relations). This engine
+compiles the same ordered rule list once into a single alternation, with each
+gazetteer folded into a prefix trie, and rewrites a block in one scan. Output
+(and anon_map allocation order) is byte-identical to the ordered passes:
+
+  * gazetteer entries that an earlier entry always pre-empts are dropped, and
+    entries that could overlap an earlier one from the left get their own
+    alternative, so leftmost-longest matching inside a trie equals rule order;
+  * while scanning, a match that a higher-priority rule would have cut into
+    (or whose replacement changes a word boundary) marks the block, and that
+    block alone is re-run through the ordered passes.
+
+Set `engine.stats` to an instrumentation.Instrumentation to collect
+per-rule match counts ("anon.<stage>.<category or replacement>") and the
+time spent in the combined scanner ("anon.scanner") or in each ordered pass.
+
+Author: Hollow House Institute (HHI)
+"""
+
+import hashlib
+import json
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Characters re.escape() touches that are literal outside a character class,
+# so `rf"\b{name}\b"` and `rf"\b{re.escape(name)}\b"` mean the same thing.
+_LITERAL_SPECIALS = set("-&~# ")
+
+
+# =========================================================
+# RULE SPECS
+# =========================================================
+
+@dataclass(frozen=True)
+class Replace:
+    """Replace every match of `pattern` with a fixed string (no backreferences)."""
+    pattern: re.Pattern
+    replacement: str
+
+
+@dataclass(frozen=True)
+class Tokenize:
+    """Replace every match with a stable `<category>_###` token keyed on the match."""
+    pattern: re.Pattern
+    category: str
+    token_prefix: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Gazetteer:
+    """Replace whole-word, case-insensitive entries with `<category>_###` tokens."""
+    entries: Sequence[str]
+    category: str
+    token_prefix: Optional[str] = None
+    escape: bool = False
+
+
+# =========================================================
+# HELPERS
+# =========================================================
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _boundaries(s: str) -> List[int]:
+    """Internal positions of `s` where `\\b` holds."""
+    return [i for i in range(1, len(s)) if _is_word(s[i - 1]) != _is_word(s[i])]
+
+
+def _fold(s: str) -> str:
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in s)
+
+
+def trie_regex(words: Sequence[str]) -> str:
+    """Alternation over `words` as a prefix trie; longer words are tried first."""
+    trie: Dict[str, dict] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        parts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if "" in node:
+            if not parts:
+                return ""
+            return "(?:" + "|".join(parts) + ")?"
+        return parts[0] if len(parts) == 1 else "(?:" + "|".join(parts) + ")"
+
+    return emit(trie)
+
+
+def _flagged(pattern: re.Pattern) -> str:
+    if pattern.flags & re.I:
+        return f"(?i:{pattern.pattern})"
+    return f"(?:{pattern.pattern})"
+
+
+class _Group:
+    """One alternative of the combined scanner, in rule priority order."""
+
+    def __init__(self, stage: int, source: str, *,
+                 lookup: Optional[Dict[str, int]] = None, solo: Optional[int] = None):
+        self.stage = stage
+        self.source = source
+        self.lookup = lookup
+        self.solo = solo
+
+
+# =========================================================
+# ENGINE
+# =========================================================
+
+class AnonEngine:
+    """Ordered anonymization rules compiled into one scanner.
+
+    `counter` selects how new token numbers are chosen: "category" numbers each
+    category on its own (DATE_001, NAME_001, ...), "shared" numbers every key in
+    anon_map in one sequence. An anon_map with an `allocate` method (see
+    anon_registry.AnonRegistry) assigns numbers itself.
+    """
+
+    def __init__(self, rules: Sequence[object], counter: str = "category"):
+        if counter not in {"category", "shared"}:
+            raise ValueError(f"unknown counter mode: {counter}")
+        self.rules = list(rules)
+        self.counter = counter
+        self._sequential: Optional[List[Tuple[int, re.Pattern, Optional[int]]]] = None
+        # anon_map that already holds every gazetteer key (we only ever add keys).
+        self._primed: Optional[Dict[str, str]] = None
+        # Keys per category of a plain anon_map ("category" mode), valid while
+        # it is `_counted` and still has `_counted_len` keys.
+        self._counted: Optional[Dict[str, str]] = None
+        self._counted_len = 0
+        self._counts: Dict[str, int] = {}
+        # Optional instrumentation.Instrumentation collector.
+        self.stats = None
+
+        self._groups: List[_Group] = []
+        for stage, rule in enumerate(self.rules):
+            if isinstance(rule, Replace):
+                self._groups.append(_Group(stage, _flagged(rule.pattern)))
+            elif isinstance(rule, Tokenize):
+                self._groups.append(_Group(stage, _flagged(rule.pattern)))
+            elif isinstance(rule, Gazetteer):
+                self._groups.extend(self._gazetteer_groups(stage, rule))
+            else:
+                raise TypeError(f"unsupported rule: {rule!r}")
+
+        self._scanner = re.compile(
+            "|".join(f"(?P<g{i}>{g.source})" for i, g in enumerate(self._groups))
+        )
+        self.single_pass = self._outputs_are_inert()
+
+    def rule_name(self, stage: int) -> str:
+        """Label of a rule in collected stats."""
+        rule = self.rules[stage]
+        label = rule.replacement if isinstance(rule, Replace) else rule.category
+        return f"anon.{stage:02d}.{label}"
+
+    def fingerprint(self) -> str:
+        """Stable hash of the rule list; changes whenever any rule would anonymize differently."""
+        desc = []
+        for rule in self.rules:
+            fields = {"kind": type(rule).__name__}
+            for name, value in vars(rule).items():
+                if isinstance(value, re.Pattern):
+                    value = [value.pattern, value.flags]
+                elif isinstance(value, (list, tuple)):
+                    value = list(value)
+                fields[name] = value
+            desc.append(fields)
+        desc.append(self.counter)
+        return hashlib.sha256(json.dumps(desc, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    # ---------------- compile ----------------
+
+    @staticmethod
+    def _entry_source(rule: Gazetteer, entry: str) -> str:
+        return re.escape(entry) if rule.escape else entry
+
+    def _gazetteer_groups(self, stage: int, rule: Gazetteer) -> List[_Group]:
+        """Split a gazetteer into trie groups whose leftmost match equals list order."""
+        groups: List[_Group] = []
+        chunk: List[Tuple[str, int]] = []
+        full: Dict[str, int] = {}
+        prefixes: Dict[str, int] = {}
+
+        def flush():
+            if chunk:
+                lookup = {key: idx for key, idx in chunk}
+                src = r"(?i:\b" + trie_regex([key for key, _ in chunk]) + r"\b)"
+                groups.append(_Group(stage, src, lookup=lookup))
+                chunk.clear()
+
+        for idx, entry in enumerate(rule.entries):
+            literal = bool(entry) and _is_word(entry[0]) and _is_word(entry[-1]) and (
+                rule.escape or all(re.escape(c) == c or c in _LITERAL_SPECIALS for c in entry)
+            )
+            if not literal:
+                flush()
+                src = r"(?i:\b" + self._entry_source(rule, entry) + r"\b)"
+                groups.append(_Group(stage, src, solo=idx))
+                continue
+
+            key = _fold(entry)
+            cuts = [0] + _boundaries(key) + [len(key)]
+            # Dead: an earlier entry occurs whole-word inside this one.
+            if any(key[a:b] in full for a in cuts for b in cuts if a < b):
+                continue
+            # Overlap from the left: a suffix of this entry starts an earlier one.
+            if any(key[a:] in prefixes for a in cuts[1:-1]):
+                flush()
+                groups.append(_Group(stage, r"(?i:\b" + re.escape(key) + r"\b)", lookup={key: idx}))
+            else:
+                chunk.append((key, idx))
+
+            full.setdefault(key, idx)
+            for b in cuts[1:-1]:
+                prefixes.setdefault(key[:b], idx)
+        flush()
+        return groups
+
+    def _outputs_are_inert(self) -> bool:
+        """True when no replacement can create or extend a later rule's match."""
+        for gi, group in enumerate(self._groups):
+            rule = self.rules[group.stage]
+            if isinstance(rule, Replace):
+                samples = [rule.replacement]
+            else:
+                prefix = rule.token_prefix or rule.category
+                samples = [f"{prefix}_001", f"{prefix}_1000"]
+            for sample in samples:
+                cuts = _boundaries(sample)
+                # A gazetteer's own later entries run after its earlier ones.
+                start = gi if group.lookup is not None else gi + 1
+                for later in self._groups[start:]:
+                    if re.search(later.source, sample):
+                        return False
+                    if not cuts:
+                        continue
+                    if later.lookup is None:
+                        if later.solo is not None:
+                            return False
+                        continue
+                    heads = {_fold(sample[:b]) for b in cuts if _is_word(sample[b - 1])}
+                    tails = {_fold(sample[b:]) for b in cuts if _is_word(sample[b])}
+                    for key in later.lookup:
+                        kcuts = _boundaries(key)
+                        if (any(key[b:] in heads for b in kcuts)
+                                or any(key[:b] in tails for b in kcuts)):
+                            return False
+        return True
+
+    # ---------------- allocation ----------------
+
+    def _token(self, rule, key: str, anon_map: Dict[str, str]) -> str:
+        if key not in anon_map:
+            # A persistent registry keeps its own per-category counters.
+            allocate = getattr(anon_map, "allocate", None)
+            if allocate is not None:
+                return allocate(key, rule.category, rule.token_prefix or rule.category)
+            if self.counter == "shared":
+                idx = len(anon_map) + 1
+            else:
+                idx = self._category_count(rule.category, anon_map) + 1
+            anon_map[key] = f"{rule.token_prefix or rule.category}_{idx:03d}"
+            if self.counter != "shared":
+                self._count_key(key, anon_map)
+        return anon_map[key]
+
+    def _category_count(self, category: str, anon_map: Dict[str, str]) -> int:
+        """Keys of `category` in anon_map; a full count only for a new map or category."""
+        if anon_map is not self._counted or len(anon_map) != self._counted_len:
+            self._counted, self._counted_len, self._counts = anon_map, len(anon_map), {}
+        if category not in self._counts:
+            prefix = f"{category}::"
+            self._counts[category] = sum(k.startswith(prefix) for k in anon_map)
+        return self._counts[category]
+
+    def _count_key(self, key: str, anon_map: Dict[str, str]) -> None:
+        for category in self._counts:
+            if key.startswith(f"{category}::"):
+                self._counts[category] += 1
+        self._counted_len = len(anon_map)
+
+    def _entry_token(self, rule: Gazetteer, idx: int, anon_map: Dict[str, str]) -> str:
+        return self._token(rule, f"{rule.category}::{rule.entries[idx]}", anon_map)
+
+    # ---------------- scanning ----------------
+
+    def anonymize(self, text: str, anon_map: Dict[str, str]) -> str:
+        """Anonymize `text`, recording new surface forms in `anon_map`."""
+        stats = self.stats
+        t0 = time.perf_counter() if stats is not None else 0.0
+        hits = self._scan(text) if self.single_pass else None
+        if stats is not None and self.single_pass:
+            stats.add_regex("anon.scanner", len(hits or ()), time.perf_counter() - t0)
+            for s, e, gi, _ in hits or ():
+                stats.add_regex(self.rule_name(self._groups[gi].stage), 1, 0.0, calls=0)
+        if hits is None:
+            return self.anonymize_sequential(text, anon_map)
+
+        # Allocate tokens in the order the ordered passes would have.
+        for stage, rule in enumerate(self.rules):
+            if isinstance(rule, Tokenize):
+                for s, e, gi, _ in hits:
+                    if self._groups[gi].stage == stage:
+                        self._token(rule, f"{rule.category}::{text[s:e]}", anon_map)
+            elif isinstance(rule, Gazetteer) and anon_map is not self._primed:
+                for idx in range(len(rule.entries)):
+                    self._entry_token(rule, idx, anon_map)
+        self._primed = anon_map
+
+        out: List[str] = []
+        pos = 0
+        for s, e, gi, repl in hits:
+            rule = self.rules[self._groups[gi].stage]
+            out.append(text[pos:s])
+            if repl is None:
+                out.append(anon_map[f"{rule.category}::{text[s:e]}"])
+            elif isinstance(repl, int):
+                out.append(self._entry_token(rule, repl, anon_map))
+            else:
+                out.append(repl)
+            pos = e
+        out.append(text[pos:])
+        return "".join(out)
+
+    def _scan(self, text: str) -> Optional[List[Tuple[int, int, int, object]]]:
+        """Collect (start, end, group, replacement) hits, or None if the block
+        needs the ordered passes.
+
+        The replacement is a fixed string, a gazetteer entry index, or None for a
+        Tokenize match whose token is looked up after allocation.
+        """
+        hits: List[Tuple[int, int, int, object]] = []
+        scanner = self._scanner
+        for m in scanner.finditer(text):
+            gi = int(m.lastgroup[1:])
+            s, e = m.span()
+            group = self._groups[gi]
+            rule = self.rules[group.stage]
+
+            # A higher-priority rule starting inside this match would have claimed it first.
+            if gi:
+                for p in range(s + 1, e):
+                    other = scanner.match(text, p)
+                    if other and int(other.lastgroup[1:]) < gi:
+                        return None
+
+            if isinstance(rule, Replace):
+                repl: object = rule.replacement
+                edges = rule.replacement
+            elif isinstance(rule, Tokenize):
+                repl, edges = None, "X_0"
+            else:
+                repl = group.solo if group.solo is not None else group.lookup.get(_fold(text[s:e]))
+                if repl is None:
+                    return None
+                edges = "X_0"
+
+            # Replacing must not move a word boundary the later passes depend on.
+            if (not edges or _is_word(text[s]) != _is_word(edges[0])
+                    or _is_word(text[e - 1]) != _is_word(edges[-1])):
+                return None
+            hits.append((s, e, gi, repl))
+        return hits
+
+    # ---------------- reference path ----------------
+
+    def anonymize_sequential(self, text: str, anon_map: Dict[str, str]) -> str:
+        """Apply the rules one pass at a time (the legacy semantics)."""
+        if self._sequential is None:
+            passes = []
+            for stage, rule in enumerate(self.rules):
+                if isinstance(rule, Gazetteer):
+                    for idx, entry in enumerate(rule.entries):
+                        pat = re.compile(rf"\b{self._entry_source(rule, entry)}\b", re.I)
+                        passes.append((stage, pat, idx))
+                else:
+                    passes.append((stage, rule.pattern, None))
+            self._sequential = passes
+
+        stats = self.stats
+        for stage, pattern, idx in self._sequential:
+            rule = self.rules[stage]
+            t0 = time.perf_counter() if stats is not None else 0.0
+            if isinstance(rule, Replace):
+                text, n = pattern.subn(rule.replacement, text)
+            elif isinstance(rule, Tokenize):
+                text, n = pattern.subn(
+                    lambda m, r=rule: self._token(r, f"{r.category}::{m.group(0)}", anon_map), text
+                )
+            else:
+                text, n = pattern.subn(self._entry_token(rule, idx, anon_map), text)
+            if stats is not None:
+                stats.add_regex(self.rule_name(stage), n, time.perf_counter() - t0)
+        return text
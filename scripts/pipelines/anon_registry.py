@@ -0,0 +1,77 @@
+"""
+anon_registry.py
+Persistent anonymization token registry for the HHI pipelines.
+
+An AnonRegistry is the anon_map the pipelines already pass around (a dict of
+"CATEGORY::surface" -> "TOKEN_###"), plus one counter per category so a new
+surface form gets the next free number in O(1). It is stored on disk between
+runs and seeded from the previous version's anonymization_map.json, so a
+token keeps its meaning from one version to the next and unchanged blocks
+anonymize (and hash) identically.
+
+Author: Hollow House Institute (HHI)
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+TOKEN_PATTERN = re.compile(r"^(.*)_(\d+)$")
+
+
+class AnonRegistry(dict):
+    """anon_map with per-category counters; existing tokens are never renumbered."""
+
+    def __init__(self, entries: Optional[Dict[str, str]] = None,
+                 counters: Optional[Dict[str, int]] = None):
+        super().__init__(entries or {})
+        self.counters: Dict[str, int] = {}
+        for key, token in self.items():
+            self._observe(key, token)
+        for category, last in (counters or {}).items():
+            self.counters[category] = max(self.counters.get(category, 0), int(last))
+
+    def _observe(self, key: str, token: str) -> None:
+        category = key.split("::", 1)[0]
+        m = TOKEN_PATTERN.match(token)
+        if m:
+            self.counters[category] = max(self.counters.get(category, 0), int(m.group(2)))
+
+    def __setitem__(self, key: str, token: str) -> None:
+        super().__setitem__(key, token)
+        self._observe(key, token)
+
+    def allocate(self, key: str, category: str, token_prefix: str) -> str:
+        """Return the token for `key`, assigning the category's next number if new."""
+        token = self.get(key)
+        if token is None:
+            idx = self.counters.get(category, 0) + 1
+            token = f"{token_prefix}_{idx:03d}"
+            super().__setitem__(key, token)
+            self.counters[category] = idx
+        return token
+
+    # ---------------- persistence ----------------
+
+    @classmethod
+    def load(cls, path: Path, seed_map: Optional[Path] = None) -> "AnonRegistry":
+        """Load the registry at `path`, else seed it from a version's anonymization_map.json."""
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return cls(data.get("entries", {}), data.get("counters", {}))
+        if seed_map is not None and seed_map.exists():
+            try:
+                return cls(json.loads(seed_map.read_text(encoding="utf-8")))
+            except Exception as e:
+                print(f"[WARN] Could not seed registry from {seed_map}: {e}")
+        return cls()
+
+    def save(self, path: Path) -> None:
+        """Write the registry atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        payload = {"counters": dict(sorted(self.counters.items())), "entries": dict(self)}
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=4, ensure_ascii=False)
+        tmp.replace(path)
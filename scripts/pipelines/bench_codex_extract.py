@@ -0,0 +1,101 @@
+"""
+bench_codex_extract.py
+Benchmark the single-pass v3.1 extractor against the per-bucket scans it replaced.
+
+Every .txt file of a codex_raw folder (a synthetic tree from
+synth_codex_raw.py by default, or --raw) is extracted by:
+
+    multipass     codex_extract.extract_file_multipass (one regex scan per bucket)
+    single_pass   codex_extract.extract_file
+
+and the buckets of the two are compared record for record; any difference
+is reported and makes the run fail. Also timed: the ledger alone repeated
+--scale times as one file, where the lazy DOTALL bodies of the old
+patterns run longest. The best of --repeat runs is reported.
+
+Usage:
+    python bench_codex_extract.py [--raw codex_raw] [--tree-scale 4] [--scale 20] [--repeat 3]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from codex_extract import BUCKETS, extract_file, extract_file_multipass
+from synth_codex_raw import generate_tree
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_LEDGER = REPO_ROOT / "02_OPS" / "Master_OPS_Ledger_434.txt"
+EXTRACTORS: Dict[str, Callable] = {
+    "multipass": extract_file_multipass,
+    "single_pass": extract_file,
+}
+
+
+def time_extractor(fn: Callable, docs: List[Tuple[str, str]],
+                   repeat: int) -> Tuple[float, Dict[str, list]]:
+    best = float("inf")
+    out: Dict[str, list] = {}
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = {b: [] for b in BUCKETS}
+        for name, text in docs:
+            for bucket, rows in fn(name, text).items():
+                out[bucket].extend(rows)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def bench(label: str, docs: List[Tuple[str, str]], repeat: int) -> bool:
+    mb = sum(len(t.encode("utf-8")) for _, t in docs) / 1e6
+    print(f"[INFO] {label}: {len(docs)} files, {mb:.1f} MB")
+    results = {name: time_extractor(fn, docs, repeat) for name, fn in EXTRACTORS.items()}
+    ref_seconds, ref = results["multipass"]
+    ok = True
+    for name, (seconds, out) in results.items():
+        print(f"  {name:<12} {seconds:8.3f}s {mb / seconds:7.2f} MB/s  "
+              f"x{ref_seconds / seconds:.2f}")
+        for bucket in BUCKETS:
+            if out[bucket] != ref[bucket]:
+                ok = False
+                print(f"  [WARN] {name}: {bucket} differs "
+                      f"({len(out[bucket])} vs {len(ref[bucket])} records)")
+    print("  " + ", ".join(f"{b}={len(ref[b])}" for b in BUCKETS))
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark v3.1 record extraction")
+    parser.add_argument("--raw", type=Path, default=None,
+                        help="codex_raw folder (default: synthetic tree)")
+    parser.add_argument("--tree-scale", type=float, default=4.0, help="Scale of the synthetic tree")
+    parser.add_argument("--work", type=Path, default=Path("bench_work"),
+                        help="Where the synthetic tree is kept")
+    parser.add_argument("--ledger", type=Path, default=DEFAULT_LEDGER)
+    parser.add_argument("--scale", type=int, default=20, help="Times the ledger is repeated")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per extractor (best is reported)")
+    args = parser.parse_args(argv)
+
+    raw = args.raw
+    if raw is None:
+        raw = args.work / f"scale_{args.tree_scale:g}" / "codex_raw"
+        generate_tree(raw, args.tree_scale)
+    docs = [(p.name, p.read_text(encoding="utf-8", errors="ignore"))
+            for p in sorted(raw.glob("*.txt"))]
+    ok = bench(str(raw), docs, args.repeat)
+
+    if args.ledger.exists():
+        ledger = args.ledger.read_text(encoding="utf-8", errors="ignore")
+        docs = [(args.ledger.name, "\n".join([ledger] * args.scale))]
+        ok &= bench(f"{args.ledger.name} x{args.scale}", docs, args.repeat)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
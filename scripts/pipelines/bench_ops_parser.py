@@ -0,0 +1,122 @@
+"""
+bench_ops_parser.py
+Benchmark the shared OPS parser (ops_parser.py) against the regexes it replaced.
+
+The ledger is normalized the way the full pipeline does it, repeated
+`--scale` times (100 by default) and parsed by:
+
+    full_pipeline      HHI_Codex_FullPipeline_Anon.py OPS_PATTERN (loses the last op)
+    v3_1               build_codex_datasets_v3_1.py OPS_PATTERN
+    process_codex_raw  process_codex_raw.py OPS_PATTERN (same pattern as v3_1)
+    ops_parser         ops_parser.iter_ops
+
+Two measurements each: "scan" finds every op and its body, "parse" also
+extracts the `Label: value` fields the way the full pipeline did (per line,
+strip, FIELD_PATTERN). The best of `--repeat` runs is reported.
+
+Usage:
+    python bench_ops_parser.py [--ledger 02_OPS/Master_OPS_Ledger_434.txt]
+                               [--scale 100] [--repeat 3]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import ops_parser
+from ops_parser import FIELD_PATTERN, iter_ops
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_LEDGER = REPO_ROOT / "02_OPS" / "Master_OPS_Ledger_434.txt"
+
+# Frozen copies of the patterns removed from the pipelines.
+LEGACY_PATTERNS = {
+    "full_pipeline": re.compile(
+        r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)(.*?)(?=^■\s*Op\s+\d+\s*—\s*Operation\s+\d+|\\Z)",
+        re.S | re.M,
+    ),
+    "v3_1": re.compile(r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)(.*?)(?=■\s*Op\s+\d+|$)", re.S),
+    "process_codex_raw": re.compile(
+        r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)(.*?)(?=■\s*Op\s+\d+|$)", re.S),
+}
+
+
+def normalize_text(text: str) -> str:
+    """Same normalization as HHI_Codex_FullPipeline_Anon.normalize_text."""
+    text = text.replace("\r", "").replace("\u007f", "")
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def legacy_fields(block: str) -> Dict[str, str]:
+    """The per-line field loop the pipelines ran after their regex."""
+    fields = {}
+    for line in block.splitlines():
+        fm = FIELD_PATTERN.match(line.strip().lstrip("\u007f"))
+        if fm:
+            fields[fm.group(1).strip().lower().replace(" ", "_")] = fm.group(2).strip()
+    return fields
+
+
+def _legacy(pattern: "re.Pattern", fields: bool) -> Callable[[str], int]:
+    def run(text: str) -> int:
+        n = 0
+        for m in pattern.finditer(text):
+            if fields:
+                legacy_fields(m.group(3))
+            n += 1
+        return n
+    return run
+
+
+def _parser(fields: bool) -> Callable[[str], int]:
+    def run(text: str) -> int:
+        ops_parser._field_cache.clear()  # no warm cache carried between runs
+        return sum(1 for _ in iter_ops(text, fields))
+    return run
+
+
+def bench(text: str, repeat: int) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for mode, fields in (("scan", False), ("parse", True)):
+        parsers = {name: _legacy(p, fields) for name, p in LEGACY_PATTERNS.items()}
+        parsers["ops_parser"] = _parser(fields)
+        for name, fn in parsers.items():
+            best = float("inf")
+            found = 0
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                found = fn(text)
+                best = min(best, time.perf_counter() - t0)
+            results.setdefault(name, {"ops": found})[mode] = best
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark OPS parsing")
+    parser.add_argument("--ledger", type=Path, default=DEFAULT_LEDGER)
+    parser.add_argument("--scale", type=int, default=100, help="Times the ledger is repeated")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per parser (best is reported)")
+    args = parser.parse_args(argv)
+
+    ledger = normalize_text(args.ledger.read_text(encoding="utf-8", errors="ignore"))
+    per_copy = sum(1 for _ in iter_ops(ledger))
+    text = "\n\n".join([ledger] * args.scale)
+    mb = len(text.encode("utf-8")) / 1e6
+    print(f"[INFO] {args.ledger.name} x{args.scale}: {mb:.1f} MB, "
+          f"{per_copy * args.scale} ops expected")
+
+    results = bench(text, args.repeat)
+    print(f"  {'parser':<18} {'ops':>8}  {'scan s':>8} {'MB/s':>7}  {'parse s':>8} {'MB/s':>7}")
+    for name, r in results.items():
+        print(f"  {name:<18} {r['ops']:>8}  {r['scan']:8.3f} {mb / r['scan']:7.1f}  "
+              f"{r['parse']:8.3f} {mb / r['parse']:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
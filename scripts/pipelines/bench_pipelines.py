@@ -0,0 +1,270 @@
+"""
+bench_pipelines.py
+Scaling benchmark of the HHI pipelines over synthetic codex_raw trees.
+
+For every scale a seeded tree is generated with synth_codex_raw.py (and
+kept for later runs), then each pipeline runs on it in a fresh process:
+
+    full          HHI_Codex_FullPipeline_Anon.main()     (config rebased to the work dir)
+    v3_1          build_codex_datasets_v3_1.main()       (--raw/--out pointed at the tree,
+                                                          --jobs = --workers)
+    process_raw   process_codex_raw.process_codex_raw()
+    sale_ready    03_Datasets/nano ocr_onedrive_to_dataset.py main()
+
+Each run reports wall seconds, input MB/s, output records (JSONL lines,
+index sidecars excluded) and peak RSS of the process, including any worker
+processes. Per pipeline, the scaling exponent k is fitted as
+seconds ~ bytes^k over all scales: k ~ 1 is linear, k > 1 degrades with
+size.
+
+Results go to <work>/bench_results.json ("hhi-bench-1"). With --compare,
+a previous results file is matched by pipeline and scale and the speed
+ratio is printed, so two commits can be compared on the same machine.
+
+Usage:
+    python bench_pipelines.py [--scales 1,10,100] [--pipelines full,v3_1,process_raw,sale_ready]
+                              [--seed 17] [--repeat 1] [--workers 1] [--work bench_work]
+                              [--compare old_results.json]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import math
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from synth_codex_raw import SEED, generate_tree
+
+PIPELINES_DIR = Path(__file__).resolve().parent
+REPO_ROOT = PIPELINES_DIR.parents[1]
+SALE_READY_SCRIPT = REPO_ROOT / "03_Datasets" / "nano ocr_onedrive_to_dataset.py"
+PIPELINES = ("full", "v3_1", "process_raw", "sale_ready")
+RESULTS_NAME = "bench_results.json"
+RESULTS_FORMAT = "hhi-bench-1"
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+# =========================================================
+# CHILD: one pipeline run
+# =========================================================
+
+def _run_full(raw: Path, out: Path, workers: int) -> Path:
+    m = importlib.import_module("HHI_Codex_FullPipeline_Anon")
+    old_root = m.ROOT
+    # Every configured path hangs off ROOT; move them all under `out`.
+    for name, value in list(vars(m).items()):
+        if name.isupper() and isinstance(value, Path) and value.is_relative_to(old_root):
+            setattr(m, name, out / value.relative_to(old_root))
+    m.RAW_DIR = raw
+    m.main(["--workers", str(workers)])
+    return out
+
+
+def _run_v3_1(raw: Path, out: Path, workers: int) -> Path:
+    m = importlib.import_module("build_codex_datasets_v3_1")
+    m.main(["--version", "bench", "--raw", str(raw), "--out", str(out), "--jobs", str(workers)])
+    return out
+
+
+def _run_process_raw(raw: Path, out: Path, workers: int) -> Path:
+    m = importlib.import_module("process_codex_raw")
+    m.RAW_DIR = str(raw)
+    m.OUT_DIR = str(out)
+    m.process_codex_raw()
+    return out
+
+
+def _run_sale_ready(raw: Path, out: Path, workers: int) -> Path:
+    spec = importlib.util.spec_from_file_location("sale_ready", SALE_READY_SCRIPT)
+    m = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(m)
+    sys.argv = [str(SALE_READY_SCRIPT), "--in", str(raw), "--out", str(out)]
+    m.main()
+    return out
+
+
+RUNNERS = {
+    "full": _run_full,
+    "v3_1": _run_v3_1,
+    "process_raw": _run_process_raw,
+    "sale_ready": _run_sale_ready,
+}
+
+
+def count_records(out: Path) -> int:
+    n = 0
+    for p in out.rglob("*.jsonl"):
+        if p.name.endswith("_index.jsonl"):
+            continue
+        with p.open("rb") as f:
+            n += sum(1 for line in f if line.strip())
+    return n
+
+
+def child(name: str, raw: Path, out: Path, workers: int) -> None:
+    """Run one pipeline in this process and print its BENCH_RESULT line."""
+    from instrumentation import peak_rss_bytes
+
+    t0 = time.perf_counter()
+    produced = RUNNERS[name](raw, out, workers)
+    seconds = time.perf_counter() - t0
+    result = {
+        "seconds": round(seconds, 4),
+        "records": count_records(produced),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "peak_rss_children_bytes": peak_rss_bytes(children=True),
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+# =========================================================
+# PARENT: scales x pipelines
+# =========================================================
+
+def run_one(name: str, raw: Path, out: Path, workers: int) -> Dict[str, Any]:
+    shutil.rmtree(out, ignore_errors=True)
+    out.mkdir(parents=True)
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--child", name, str(raw), str(out),
+           "--workers", str(workers)]
+    proc = subprocess.run(cmd, cwd=str(PIPELINES_DIR), capture_output=True, text=True,
+                          encoding="utf-8", errors="replace")
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    tail = (proc.stderr or proc.stdout).strip().splitlines()[-3:]
+    return {"error": " | ".join(tail) or f"exit code {proc.returncode}"}
+
+
+def scaling_exponent(points: List[Dict[str, Any]]) -> Optional[float]:
+    """Least-squares slope of log(seconds) over log(input bytes)."""
+    xy = [(math.log(p["input_bytes"]), math.log(p["seconds"])) for p in points if p.get("seconds")]
+    if len(xy) < 2:
+        return None
+    mx = sum(x for x, _ in xy) / len(xy)
+    my = sum(y for _, y in xy) / len(xy)
+    var = sum((x - mx) ** 2 for x, _ in xy)
+    if not var:
+        return None
+    return round(sum((x - mx) * (y - my) for x, y in xy) / var, 3)
+
+
+def run_bench(scales: List[float], pipelines: List[str], work: Path, seed: int = SEED,
+              repeat: int = 1, workers: int = 1) -> Dict[str, Any]:
+    runs = []
+    for scale in scales:
+        tree = work / f"scale_{scale:g}"
+        t0 = time.perf_counter()
+        manifest = generate_tree(tree / "codex_raw", scale, seed)
+        print(f"[INFO] scale {scale:g}: {manifest['files']} files, "
+              f"{manifest['bytes'] / 1e6:.1f} MB (ready in {time.perf_counter() - t0:.1f}s)")
+        for name in pipelines:
+            best: Optional[Dict[str, Any]] = None
+            for _ in range(repeat):
+                r = run_one(name, tree / "codex_raw", tree / f"out_{name}", workers)
+                if "error" in r:
+                    best = r
+                    break
+                if best is None or r["seconds"] < best["seconds"]:
+                    best = r
+            row = {"pipeline": name, "scale": scale, "files": manifest["files"],
+                   "input_bytes": manifest["bytes"], **best}
+            if "seconds" in best:
+                row["mb_per_s"] = round(manifest["bytes"] / 1e6 / best["seconds"], 3)
+                peak = (best["peak_rss_bytes"] or 0) / 1e6
+                print(f"  {name:<12} {best['seconds']:9.2f}s {row['mb_per_s']:8.2f} MB/s "
+                      f"{best['records']:>10} records  peak {peak:8.1f} MB")
+            else:
+                print(f"  {name:<12} [WARN] failed: {best['error']}")
+            runs.append(row)
+
+    curves = {}
+    for name in pipelines:
+        points = [r for r in runs if r["pipeline"] == name and "seconds" in r]
+        curves[name] = {
+            "points": [[r["scale"], r["input_bytes"], r["seconds"], r["peak_rss_bytes"]]
+                       for r in points],
+            "exponent": scaling_exponent(points),
+        }
+    return {
+        "format": RESULTS_FORMAT,
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "workers": workers,
+        "repeat": repeat,
+        "runs": runs,
+        "curves": curves,
+    }
+
+
+def compare(new: Dict[str, Any], old: Dict[str, Any]) -> None:
+    old_runs = {(r["pipeline"], r["scale"]): r for r in old.get("runs", []) if "seconds" in r}
+    print("[INFO] Compared with previous results (speedup > 1 = faster now):")
+    for r in new["runs"]:
+        o = old_runs.get((r["pipeline"], r["scale"]))
+        if o is None or "seconds" not in r:
+            continue
+        mem = ""
+        if o.get("peak_rss_bytes") and r.get("peak_rss_bytes"):
+            mem = f"  memory x{r['peak_rss_bytes'] / o['peak_rss_bytes']:.2f}"
+        print(f"  {r['pipeline']:<12} scale {r['scale']:<6g} {o['seconds']:9.2f}s -> "
+              f"{r['seconds']:9.2f}s  speedup x{o['seconds'] / r['seconds']:.2f}{mem}")
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the HHI pipelines")
+    parser.add_argument("--scales", default="1,10",
+                        help="Comma-separated corpus scales (1 ~ 550 KB)")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES),
+                        help="Comma-separated pipelines to run")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per point (best is kept)")
+    parser.add_argument("--workers", type=int, default=1, help="--workers for the full pipeline")
+    parser.add_argument("--work", type=Path, default=Path("bench_work"),
+                        help="Trees, outputs and results")
+    parser.add_argument("--compare", type=Path, default=None, help="Previous bench_results.json")
+    parser.add_argument("--child", nargs=3, metavar=("PIPELINE", "RAW", "OUT"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        name, raw, out = args.child
+        child(name, Path(raw).resolve(), Path(out).resolve(), args.workers)
+        return
+
+    pipelines = [p.strip() for p in args.pipelines.split(",") if p.strip()]
+    unknown = set(pipelines) - set(RUNNERS)
+    if unknown:
+        parser.error(f"unknown pipeline(s): {', '.join(sorted(unknown))}")
+    scales = [float(s) for s in args.scales.split(",") if s.strip()]
+    work = args.work.resolve()
+
+    results = run_bench(scales, pipelines, work, args.seed, args.repeat, args.workers)
+    print("[INFO] Scaling exponent (seconds ~ bytes^k):")
+    for name, curve in results["curves"].items():
+        k = curve["exponent"]
+        print(f"  {name:<12} k = {k if k is not None else 'n/a'}")
+    dest = work / RESULTS_NAME
+    dest.write_text(json.dumps(results, indent=4), encoding="utf-8")
+    print(f"[OK] Wrote {dest}")
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -16,112 +16,203 @@ Outputs:
     flame_passages.jsonl
     glyphs.jsonl
     codex_graph_edges.jsonl
+    codex_graph_index.npz + codex_graph_nodes.json   (CSR index of the edges, see graph_index.py)
     metadata_index.jsonl
     version.json
     CHANGELOG_<version>.md
 
+Files are parsed independently (in a process pool with --jobs N) and their
+records merged in file-name order, so every output except the timestamps
+in version.json and the changelog is byte-identical for any --jobs.
+
+Usage:
+    python build_codex_datasets_v3_1.py --version v3 [--raw codex_raw] [--out data/processed]
+                                        [--jobs 4]
+
 Author: Hollow House Institute (HHI)
 """
 
 import argparse
 import json
-import hashlib
-import re
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import repeat
 from pathlib import Path
+from typing import Any, Dict, List, Tuple
 
-# ----------------------------
-# CLI ARGUMENTS
-# ----------------------------
-parser = argparse.ArgumentParser(description="HHI Dataset Builder v3.1 with versioning")
-parser.add_argument("--version", required=True, help="Dataset version label, e.g. v1, v2, v3")
-args = parser.parse_args()
-
-dataset_version = args.version.strip().lower()
+from codex_extract import BUCKETS, checksum, extract_file
+from graph_index import INDEX_NAME, NODES_NAME, write_graph_index
+from instrumentation import Instrumentation
+from jsonl_frames import CODECS, write_jsonl as write_framed_jsonl
+from license_rules import DEFAULT_RULES, LicenseClassifier, load_classifier
 
 # ----------------------------
 # PATHS
 # ----------------------------
 ROOT = Path(__file__).resolve().parents[1]
-RAW = ROOT / "codex_raw"
-OUT_ROOT = ROOT / "data" / "processed" / dataset_version
-OUT_ROOT.mkdir(parents=True, exist_ok=True)
+RAW_DIR = ROOT / "codex_raw"
+OUT_ROOT = ROOT / "data" / "processed"
 
-# ----------------------------
-# Helper Functions
-# ----------------------------
-def write_jsonl(name, rows):
-    """Write list of dicts to JSONL."""
-    path = OUT_ROOT / name
-    with path.open("w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-    print(f"[OK] {name} — {len(rows)} records")
-
-def checksum(text):
-    """Short stable hash for IDs."""
-    return hashlib.md5(text.encode()).hexdigest()[:10]
-
-def normalize(text):
-    """Clean whitespace."""
-    return re.sub(r"\s+", " ", text.strip())
+BUILDER_VERSION = "3.1"
+
+# Bucket -> output file, in the order they are written.
+OUTPUT_NAMES = {
+    "ops": "ops_ledger.jsonl",
+    "laws": "temple_laws.jsonl",
+    "serpent": "serpent_ops.jsonl",
+    "teachings": "teachings.jsonl",
+    "rituals": "rituals.jsonl",
+    "lineage": "lineage_refs.jsonl",
+    "flame": "flame_passages.jsonl",
+    "glyphs": "glyphs.jsonl",
+    "edges": "codex_graph_edges.jsonl",
+}
+METADATA_NAME = "metadata_index.jsonl"
+
+Buckets = Dict[str, List[Dict[str, Any]]]
 
-# ----------------------------
-# Dataset Buckets
-# ----------------------------
-ops = []
-laws = []
-serpent = []
-teachings = []
-rituals = []
-lineage = []
-flame = []
-glyphs = []
-edges = []
-metadata = []
 
 # ----------------------------
-# PATTERNS
+# CLI ARGUMENTS
 # ----------------------------
-OPS_PATTERN = re.compile(r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)(.*?)(?=■\s*Op\s+\d+|$)", re.S)
-LAW_PATTERN = re.compile(r"(Article\s+([IVXLC0-9]+)\s+—\s+(.+?))\n(.*?)(?=Article\s+[IVXLC0-9]+\s+—|$)", re.S)
-TEACH_PATTERN = re.compile(r"Op\s*#?(\d+)\s*—\s*Teaching:\s*(.+?)\s*Summary:\s*(.*?)(?=Op\s*#?\d+\s*—\s*Teaching:|$)", re.S)
-GLYPH_PATTERN = re.compile(r"(?:⟦(.+?)⟧|〈(.+?)〉|【(.+?)】)", re.S)
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HHI Dataset Builder v3.1 with versioning")
+    parser.add_argument("--version", required=True, help="Dataset version label, e.g. v1, v2, v3")
+    parser.add_argument("--compress", choices=CODECS, default="none",
+                        help="Write JSONL in compressed, seekable frames "
+                             "(gzip, or zstd if installed)")
+    parser.add_argument("--raw", type=Path, default=None,
+                        help="codex_raw folder (default: <repo>/codex_raw)")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="Parent of the version folder (default: <repo>/data/processed)")
+    parser.add_argument("--license-rules", type=Path, default=DEFAULT_RULES,
+                        help="License rule table (default: <repo>/license_rules.json)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Processes for parsing (0 = all cores). "
+                             "Output is identical for any value.")
+    return parser.parse_args(argv)
+
 
 # ----------------------------
-# LICENSE CLASSIFICATION
+# PARSING
 # ----------------------------
-def classify_license(text):
-    t = text.lower()
-    if any(k in t for k in ["temple", "codex", "glyph", "flame", "article"]):
-        return "TCDPL-4.4 + 444-A"
-    if any(k in t for k in ["jealousy", "scarcity", "attachment", "relational"]):
-        return "RAP-DL 1.0"
-    if any(k in t for k in ["somatic", "field", "resonance", "body", "nervous system"]):
-        return "FBCR-1"
-    return "Extended Terms (CC BY-NC-SA)"
+def process_file(path: Path,
+                 rules: Path = DEFAULT_RULES) -> Tuple[Buckets, Dict[str, Any], Dict[str, int]]:
+    """Buckets, metadata row and license rule counts of one source file (runs in a worker)."""
+    text = path.read_text(encoding="utf-8", errors="ignore")
+    classifier = load_classifier(rules)
+    classifier.stats = Instrumentation()
+    buckets = extract_file(path.name, text, classifier)
+    meta = {
+        "source_file": path.name,
+        "chars": len(text),
+        "lines": len(text.splitlines()),
+        "hash": checksum(text),
+    }
+    return buckets, meta, classifier.stats.counters
+
+
+def build_buckets(files: List[Path], rules: Path = DEFAULT_RULES,
+                  jobs: int = 1) -> Tuple[Buckets, List[Dict[str, Any]], Dict[str, int]]:
+    """Every file's records merged in `files` order, whichever worker parsed them."""
+    buckets: Buckets = {b: [] for b in BUCKETS}
+    metadata: List[Dict[str, Any]] = []
+    counters: Dict[str, int] = {}
+    if jobs > 1 and len(files) > 1:
+        print(f"[INFO] Parsing {len(files)} files with {jobs} workers")
+        with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as pool:
+            results = list(pool.map(process_file, files, repeat(rules)))
+    else:
+        results = map(process_file, files, repeat(rules))
+    for file_buckets, meta, file_counters in results:
+        for bucket, rows in file_buckets.items():
+            buckets[bucket].extend(rows)
+        metadata.append(meta)
+        for name, n in file_counters.items():
+            counters[name] = counters.get(name, 0) + n
+    return buckets, metadata, counters
+
 
 # ----------------------------
-# MAIN PARSING LOOP
+# OUTPUTS
 # ----------------------------
-for f in RAW.glob("*.txt"):
-    text = f.read_text(encoding="utf-8", errors="ignore")
-    lines = text.splitlines()
-
-    # OPS
-    for m in OPS_PATTERN.finditer(text):
-        op_id, op_num, block = m.group(1), m.group(2), normalize(m.group(3))
-        uid = checksum(block + op_id)
-        ops.append({
-            "uid": uid,
-            "source": f.name,
-            "op_id": op_id,
-            "op_number": op_num,
-            "block": block,
-            "license": classify_license(block),
-        })
-
-    # Laws
-    for m in LAW_PATTERN.finditer(text):
-        header, code, title, body = normalize(m.group(1)), m.group(2), normalize(m.group(3)), normalize(m.group(4))
-        uid = checksum(header)
+def write_jsonl(out_dir: Path, name: str, rows: List[Dict[str, Any]],
+                compress: str = "none") -> None:
+    """Write list of dicts to JSONL (compressed per --compress)."""
+    path = write_framed_jsonl(out_dir / name, rows, compress)
+    print(f"[OK] {path.name} — {len(rows)} records")
+
+
+def print_license_counts(classifier: LicenseClassifier, counters: Dict[str, int]) -> None:
+    for rule in classifier.rules + [classifier.default]:
+        n = counters.get(f"license.{rule.id}", 0)
+        top = sorted(((c, k.rsplit(".", 1)[1]) for k, c in counters.items()
+                      if k.startswith(f"license.{rule.id}.")), reverse=True)[:3]
+        detail = f"  ({', '.join(f'{k} {c}' for c, k in top)})" if top else ""
+        print(f"[INFO]   {rule.id:<14} {n:>7}  {rule.license}{detail}")
+
+
+def write_version(out_dir: Path, dataset_version: str, buckets: Buckets,
+                  metadata: List[Dict[str, Any]], classifier: LicenseClassifier,
+                  compress: str = "none") -> None:
+    """Dataset files, graph index, version.json and changelog of one version folder."""
+    for bucket, name in OUTPUT_NAMES.items():
+        write_jsonl(out_dir, name, buckets[bucket], compress)
+    rows = [dict(m, included_in_version=dataset_version) for m in metadata]
+    write_jsonl(out_dir, METADATA_NAME, rows, compress)
+    graph = write_graph_index(out_dir, buckets["edges"])
+    print(f"[OK] {INDEX_NAME} + {NODES_NAME} — {len(graph.nodes)} nodes, {graph.edge_count} edges")
+    outputs = list(OUTPUT_NAMES.values()) + [METADATA_NAME, INDEX_NAME, NODES_NAME]
+
+    generated_on = datetime.now().isoformat()
+    version_info = {
+        "dataset_version": dataset_version,
+        "builder_version": BUILDER_VERSION,
+        "generated_on": generated_on,
+        "file_count": len(metadata),
+        "license_rules": classifier.fingerprint(),
+    }
+    (out_dir / "version.json").write_text(json.dumps(version_info, indent=2), encoding="utf-8")
+    print("[OK] version.json")
+
+    changelog = [
+        "",
+        f"# HHI Dataset Changelog — {dataset_version}",
+        "",
+        f"Generated on: {generated_on}",
+        "",
+        "## Included Datasets",
+        *[f"- {name}" for name in outputs],
+        "",
+        "## Notes",
+        f"This version was generated using HHI Dataset Builder v{BUILDER_VERSION}.",
+        "",
+    ]
+    (out_dir / f"CHANGELOG_{dataset_version}.md").write_text("\n".join(changelog), encoding="utf-8")
+    print(f"[OK] CHANGELOG_{dataset_version}.md")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    dataset_version = args.version.strip().lower()
+    raw_dir = args.raw or RAW_DIR
+    out_dir = (args.out or OUT_ROOT) / dataset_version
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    classifier = load_classifier(args.license_rules)
+    print(f"[INFO] License rules: {args.license_rules.name} ({len(classifier.rules)} rules, "
+          f"{len(classifier.keywords)} keywords)")
+
+    # One pass per file: codex_extract.extract_file emits every bucket together.
+    files = sorted(raw_dir.glob("*.txt"))
+    buckets, metadata, counters = build_buckets(files, args.license_rules, jobs)
+    print_license_counts(classifier, counters)
+
+    write_version(out_dir, dataset_version, buckets, metadata, classifier, args.compress)
+    print(f"[DONE] Dataset {dataset_version} written to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+codex_extract.py
+Record extraction for build_codex_datasets_v3_1.py: one pass per file.
+
+The builder sorts every source file into buckets:
+
+    ops             ■ Op N — Operation N ledger entries (ops_parser.py)
+    laws            Article <roman> — <title> ... up to the next Article header
+    teachings       Op #N — Teaching: <title> Summary: <text>
+    rituals         Ritual|Protocol|Rite: <name> ... up to the next such header
+    serpent         lines mentioning "serpent"
+    lineage         lines with the words lineage / bloodline / ancestor / descendant
+    flame           lines mentioning "flame" (or "ember")
+    glyphs          ⟦...⟧, 〈...〉, 【...】
+    edges           op -> Article it applies, op -> glyph it carries
+
+It used to take one full-text regex scan per bucket (lazy DOTALL bodies
+closed by a lookahead for the next header, which backtracks over the
+whole remaining text on every match), plus a line loop per keyword
+bucket. extract_file() walks the text once instead:
+
+* one line loop; a cheap prefix/substring test decides which header
+  patterns to try on a line (dispatch on "■", "Article", "Teaching:",
+  "Ritual"/"Protocol"/"Rite", glyph brackets), and the keyword buckets
+  are tested on the same lowercased line;
+* a header closes the open record of its kind, so bodies are slices
+  between header offsets, never re-scanned.
+
+Licenses come from the rule table in license_rules.py, one batch per file.
+
+extract_file_multipass() keeps the old regexes as the reference; the two
+produce identical buckets (bench_codex_extract.py checks and times both).
+Header lines are matched one line at a time, so a header split across
+lines ("Article\\nIV — ...") no longer counts; no source does that.
+
+Author: Hollow House Institute (HHI)
+"""
+
+import hashlib
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from license_rules import LicenseClassifier, load_classifier
+from ops_parser import iter_ops
+
+BUCKETS = ("ops", "laws", "teachings", "rituals", "serpent", "lineage", "flame", "glyphs", "edges")
+
+SUMMARY_CHARS = 350
+FLAME_LICENSE = "444-A (Flame Stewardship)"
+SERPENT_KEYWORDS = ("serpent",)
+FLAME_KEYWORDS = ("flame", "ember")
+
+# Reference patterns (one full-text scan each).
+LAW_PATTERN = re.compile(
+    r"(Article\s+([IVXLC0-9]+)\s+—\s+(.+?))\n(.*?)(?=Article\s+[IVXLC0-9]+\s+—|$)", re.S)
+TEACH_PATTERN = re.compile(
+    r"Op\s*#?(\d+)\s*—\s*Teaching:\s*(.+?)\s*Summary:\s*(.*?)"
+    r"(?=Op\s*#?\d+\s*—\s*Teaching:|$)", re.S)
+RITUAL_PATTERN = re.compile(
+    r"(Ritual|Protocol|Rite)\s*:\s*(.+?)\n(.*?)(?=(?:Ritual|Protocol|Rite)\s*:|$)", re.S)
+GLYPH_PATTERN = re.compile(r"(?:⟦(.+?)⟧|〈(.+?)〉|【(.+?)】)", re.S)
+LINEAGE_PATTERN = re.compile(r"\b(?:lineage|bloodline|ancestor|descendant)\b", re.I)
+ARTICLE_REF_PATTERN = re.compile(r"Article\s+([IVXLC]+)\b")
+CODE_GLYPH_PATTERN = re.compile(r"■([0-9A-F]{6})■")
+
+
+def checksum(text: str) -> str:
+    """Short stable hash for IDs."""
+    return hashlib.md5(text.encode()).hexdigest()[:10]
+
+
+def normalize(text: str) -> str:
+    """Clean whitespace."""
+    return " ".join(text.split())
+
+
+def classify_license(text: str) -> str:
+    """License tier of one text under the default rules (license_rules.json)."""
+    return load_classifier().classify(text)
+
+
+# Records waiting for a license, with the text that decides it.
+Pending = List[Tuple[Dict[str, Any], str]]
+
+
+def _apply_licenses(pending: Pending, classifier: Optional[LicenseClassifier]) -> None:
+    """Classify a file's records in one batch."""
+    classifier = classifier or load_classifier()
+    for (rec, _), license in zip(pending, classifier.classify_many([text for _, text in pending])):
+        rec["license"] = license
+
+
+# ----------------------------
+# Record builders (shared by both extractors)
+# ----------------------------
+
+def _op_record(pending: Pending, source: str, op_id: str, op_num: str, body: str) -> Dict[str, Any]:
+    block = normalize(body)
+    rec = {"uid": checksum(block + op_id), "source": source, "op_id": op_id, "op_number": op_num,
+           "block": block, "license": None}
+    pending.append((rec, block))
+    return rec
+
+
+def _op_edges(source: str, op_id: str, body: str) -> List[Dict[str, Any]]:
+    edges = []
+    for code in dict.fromkeys(ARTICLE_REF_PATTERN.findall(body)):
+        edges.append({"source": source, "from": f"op:{op_id}", "to": f"law:{code}",
+                      "relation": "applies_law"})
+    for code in dict.fromkeys(CODE_GLYPH_PATTERN.findall(body)):
+        edges.append({"source": source, "from": f"op:{op_id}", "to": f"glyph:{code}",
+                      "relation": "carries_glyph"})
+    return edges
+
+
+def _law_record(pending: Pending, source: str, header: str, code: str, title: str,
+                body: str) -> Dict[str, Any]:
+    header, title, body = normalize(header), normalize(title), normalize(body)
+    rec = {"uid": checksum(header), "source": source, "article_code": code, "title": title,
+           "body": body, "summary": body[:SUMMARY_CHARS], "license": None}
+    pending.append((rec, header + " " + body))
+    return rec
+
+
+def _teaching_record(pending: Pending, source: str, num: str, title: str,
+                     summary: str) -> Dict[str, Any]:
+    title, summary = normalize(title), normalize(summary)
+    rec = {"uid": checksum(title), "source": source, "op_number": num, "title": title,
+           "summary": summary, "license": None}
+    pending.append((rec, title + " " + summary))
+    return rec
+
+
+def _ritual_record(pending: Pending, source: str, kind: str, name: str,
+                   body: str) -> Dict[str, Any]:
+    name, body = normalize(name), normalize(body)
+    rec = {"uid": checksum(name), "source": source, "type": kind, "name": name, "body": body,
+           "license": None}
+    pending.append((rec, name + " " + body))
+    return rec
+
+
+def _line_record(pending: Pending, source: str, line_number: int, line: str,
+                 license: str = None) -> Dict[str, Any]:
+    rec = {"uid": checksum(line), "source": source, "line_number": line_number, "text": line,
+           "license": license}
+    if license is None:
+        pending.append((rec, line))
+    return rec
+
+
+def _glyph_record(pending: Pending, source: str, glyph: str) -> Dict[str, Any]:
+    rec = {"uid": checksum(glyph), "source": source, "glyph": normalize(glyph), "license": None}
+    pending.append((rec, glyph))
+    return rec
+
+
+def _empty() -> Dict[str, List[Dict[str, Any]]]:
+    return {b: [] for b in BUCKETS}
+
+
+# ----------------------------
+# Reference: one scan per bucket
+# ----------------------------
+
+def extract_file_multipass(source: str, text: str, classifier: Optional[LicenseClassifier] = None
+                           ) -> Dict[str, List[Dict[str, Any]]]:
+    """Buckets for one file, the old way (kept as the reference)."""
+    out = _empty()
+    pending: Pending = []
+    for op in iter_ops(text, fields=False, midline=True):
+        out["ops"].append(_op_record(pending, source, op.op_id, op.op_number, op.body))
+        out["edges"].extend(_op_edges(source, op.op_id, op.body))
+    for m in LAW_PATTERN.finditer(text):
+        out["laws"].append(_law_record(pending, source, *m.group(1, 2, 3, 4)))
+    for m in TEACH_PATTERN.finditer(text):
+        out["teachings"].append(_teaching_record(pending, source, *m.group(1, 2, 3)))
+    for m in RITUAL_PATTERN.finditer(text):
+        out["rituals"].append(_ritual_record(pending, source, m.group(1), m.group(2), m.group(3)))
+    for m in GLYPH_PATTERN.finditer(text):
+        out["glyphs"].append(_glyph_record(pending, source, m.group(1) or m.group(2) or m.group(3)))
+    for i, line in enumerate(text.splitlines(), 1):
+        if any(k in line.lower() for k in SERPENT_KEYWORDS):
+            out["serpent"].append(_line_record(pending, source, i, line))
+    for i, line in enumerate(text.splitlines(), 1):
+        if LINEAGE_PATTERN.search(line):
+            out["lineage"].append(_line_record(pending, source, i, line))
+    for line in text.splitlines():
+        if any(k in line.lower() for k in FLAME_KEYWORDS):
+            rec = _line_record(pending, source, 0, line, FLAME_LICENSE)
+            del rec["line_number"]
+            out["flame"].append(rec)
+    _apply_licenses(pending, classifier)
+    return out
+
+
+# ----------------------------
+# Single pass
+# ----------------------------
+
+def _boundary(pattern: str) -> "re.Pattern":
+    """Line-local form of a header prefix (\\s without newlines)."""
+    return re.compile(pattern.replace(r"\s", r"[^\S\n]"))
+
+
+OP_LINE = _boundary(r"■\s*Op\s+\d+")
+LAW_LINE = _boundary(r"Article\s+[IVXLC0-9]+\s+—")
+TEACH_LINE = _boundary(r"Op\s*#?\d+\s*—\s*Teaching:")
+RITUAL_LINE = _boundary(r"(?:Ritual|Protocol|Rite)\s*:")
+OP_HEAD = re.compile(r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)")
+LAW_HEAD = re.compile(r"(Article\s+([IVXLC0-9]+)\s+—\s+(.+?))\n", re.S)
+TEACH_HEAD = re.compile(r"Op\s*#?(\d+)\s*—\s*Teaching:\s*(.+?)\s*Summary:\s*", re.S)
+RITUAL_HEAD = re.compile(r"(Ritual|Protocol|Rite)\s*:\s*(.+?)\n", re.S)
+GLYPH_CLOSE = {"⟦": "⟧", "〈": "〉", "【": "】"}
+# Line terminators of str.splitlines().
+_EOL = "\r\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def _sections(text: str, starts: List[int], head: "re.Pattern"):
+    """(header match, body end) per record, the way `head` + lazy body + lookahead matched.
+
+    A body runs to the first boundary at or after its header's end; boundaries
+    inside a header (a Teaching title running past the next header) are skipped.
+    """
+    resume = 0
+    for i, b in enumerate(starts):
+        if b < resume:
+            continue
+        m = head.match(text, b)
+        if m is None:
+            continue
+        j = bisect_left(starts, m.end(), i + 1)
+        end = starts[j] if j < len(starts) else len(text)
+        yield m, end
+        resume = end
+
+
+def extract_file(source: str, text: str,
+                 classifier: Optional[LicenseClassifier] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Buckets for one file, in one walk over its lines."""
+    out = _empty()
+    pending: Pending = []
+    serpent, lineage, flame = out["serpent"], out["lineage"], out["flame"]
+    op_starts: List[int] = []
+    law_starts: List[int] = []
+    teach_starts: List[int] = []
+    ritual_starts: List[int] = []
+    glyph_opens: List[int] = []
+
+    pos = 0
+    for i, raw in enumerate(text.splitlines(True), 1):
+        line = raw.rstrip(_EOL)
+        # Every "■ Op <n>", even mid-line, ends an op; the full headers among
+        # them start one (ops_parser.iter_ops(midline=True)).
+        if "■" in line:
+            op_starts.extend(pos + m.start() for m in OP_LINE.finditer(line))
+        if "Article" in line:
+            law_starts.extend(pos + m.start() for m in LAW_LINE.finditer(line))
+        if "Teaching:" in line:
+            teach_starts.extend(pos + m.start() for m in TEACH_LINE.finditer(line))
+        if ":" in line and ("Ritual" in line or "Protocol" in line or "Rite" in line):
+            ritual_starts.extend(pos + m.start() for m in RITUAL_LINE.finditer(line))
+        if "⟦" in line or "〈" in line or "【" in line:
+            glyph_opens.extend(pos + k for k, ch in enumerate(line) if ch in GLYPH_CLOSE)
+
+        low = line.lower()
+        if "serpent" in low:
+            serpent.append(_line_record(pending, source, i, line))
+        if ("lineage" in low or "bloodline" in low or "ancestor" in low or "descendant" in low) \
+                and LINEAGE_PATTERN.search(line):
+            lineage.append(_line_record(pending, source, i, line))
+        if "flame" in low or "ember" in low:
+            rec = _line_record(pending, source, i, line, FLAME_LICENSE)
+            del rec["line_number"]
+            flame.append(rec)
+        pos += len(raw)
+
+    for m, end in _sections(text, op_starts, OP_HEAD):
+        body = text[m.end():end]
+        out["ops"].append(_op_record(pending, source, m.group(1), m.group(2), body))
+        out["edges"].extend(_op_edges(source, m.group(1), body))
+    for m, end in _sections(text, law_starts, LAW_HEAD):
+        out["laws"].append(_law_record(pending, source, *m.group(1, 2, 3), text[m.end():end]))
+    for m, end in _sections(text, teach_starts, TEACH_HEAD):
+        out["teachings"].append(_teaching_record(pending, source, *m.group(1, 2),
+                                                 text[m.end():end]))
+    for m, end in _sections(text, ritual_starts, RITUAL_HEAD):
+        out["rituals"].append(_ritual_record(pending, source, *m.group(1, 2), text[m.end():end]))
+    resume = 0
+    for start in glyph_opens:
+        if start < resume:
+            continue
+        close = text.find(GLYPH_CLOSE[text[start]], start + 2)
+        if close < 0:
+            continue
+        out["glyphs"].append(_glyph_record(pending, source, text[start + 1:close]))
+        resume = close + 1
+    _apply_licenses(pending, classifier)
+    return out
@@ -0,0 +1,277 @@
+"""
+columnar_export.py
+Columnar (Parquet / Arrow IPC) export of ops_ledger_anon and blocks_anon.
+
+Two streaming passes over a JSONL file (plain or compressed, see
+jsonl_frames.py):
+
+1. Infer the schema: the union of all record keys in first-seen order, a
+   type per field (int64 / float64 when every value converts losslessly,
+   otherwise string), which string fields are low-cardinality (stored
+   dictionary-encoded with one dictionary for the whole file) and which are
+   long text (block_raw, text_anon, ...).
+2. Write row groups of BATCH_ROWS records. Long text fields are placed
+   after the short ones as plain, non-dictionary columns, so a job reading
+   `status` and `planetary_tag` never touches them.
+
+Needs the optional `pyarrow` package.
+
+Usage:
+    python columnar_export.py <version_dir> [--format parquet|arrow] [--out DIR]
+    python columnar_export.py <file.jsonl[.gz]> [...]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from jsonl_frames import iter_jsonl
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed when exporting
+    pa = None
+
+EXPORT_NAMES = ("ops_ledger_anon", "blocks_anon")
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+BATCH_ROWS = 8192
+# A string field is dictionary-encoded when it has at most this many distinct
+# values and they repeat (distinct <= rows * DICT_MAX_RATIO).
+DICT_MAX_DISTINCT = 4096
+DICT_MAX_RATIO = 0.5
+# Long text: these known fields, plus any string field averaging LONG_TEXT_CHARS.
+LONG_TEXT_FIELDS = {"block_raw", "block_normalized", "block_anon", "text", "text_anon"}
+LONG_TEXT_CHARS = 200
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("Columnar export needs the 'pyarrow' package (pip install pyarrow)")
+
+
+def _lossless_int(v: Any) -> bool:
+    if isinstance(v, bool):
+        return False
+    if isinstance(v, int):
+        return True
+    if not isinstance(v, str) or not v.isascii():
+        return False
+    try:
+        return str(int(v)) == v
+    except ValueError:
+        return False
+
+
+def _lossless_float(v: Any) -> bool:
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return True
+    if not isinstance(v, str):
+        return False
+    try:
+        return repr(float(v)) == v
+    except ValueError:
+        return False
+
+
+class _FieldStats:
+    __slots__ = ("count", "chars", "is_int", "is_float", "is_scalar", "distinct")
+
+    def __init__(self):
+        self.count = 0
+        self.chars = 0
+        self.is_int = True
+        self.is_float = True
+        self.is_scalar = True
+        self.distinct: Optional[set] = set()
+
+    def add(self, v: Any) -> None:
+        if v is None:
+            return
+        self.count += 1
+        if isinstance(v, (dict, list)):
+            self.is_scalar = False
+            v = str(v)
+        if self.is_int and not _lossless_int(v):
+            self.is_int = False
+        if self.is_float and not _lossless_float(v):
+            self.is_float = False
+        self.chars += len(str(v))
+        if self.distinct is not None:
+            self.distinct.add(v if isinstance(v, str) else str(v))
+            if len(self.distinct) > DICT_MAX_DISTINCT:
+                self.distinct = None
+
+
+def infer_schema(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return {"rows", "fields": [{"name", "type", "dictionary"?, "long_text"}]}."""
+    stats: Dict[str, _FieldStats] = {}
+    rows = 0
+    for rec in records:
+        rows += 1
+        for k, v in rec.items():
+            st = stats.get(k)
+            if st is None:
+                st = stats[k] = _FieldStats()
+            st.add(v)
+
+    fields = []
+    for name, st in stats.items():
+        field: Dict[str, Any] = {"name": name, "long_text": False}
+        if not st.is_scalar:
+            field["type"] = "json"
+        elif st.count and st.is_int:
+            field["type"] = "int64"
+        elif st.count and st.is_float:
+            field["type"] = "float64"
+        else:
+            field["type"] = "string"
+            avg = st.chars / st.count if st.count else 0
+            if name in LONG_TEXT_FIELDS or avg >= LONG_TEXT_CHARS:
+                field["long_text"] = True
+            elif st.distinct is not None and len(st.distinct) <= max(1, rows * DICT_MAX_RATIO):
+                field["dictionary"] = sorted(st.distinct)
+        fields.append(field)
+    # Short columns first; long text last.
+    fields.sort(key=lambda f: f["long_text"])
+    return {"rows": rows, "fields": fields}
+
+
+def arrow_schema(schema: Dict[str, Any]) -> "pa.Schema":
+    _require_pyarrow()
+    types = {"int64": pa.int64(), "float64": pa.float64(), "json": pa.string()}
+    out = []
+    for f in schema["fields"]:
+        if "dictionary" in f:
+            t = pa.dictionary(pa.int32(), pa.string())
+        elif f["long_text"]:
+            t = pa.large_string()
+        else:
+            t = types.get(f["type"], pa.string())
+        out.append(pa.field(f["name"], t, nullable=True))
+    return pa.schema(out)
+
+
+def _column(field: Dict[str, Any], values: List[Any], arrow_type, dictionary) -> "pa.Array":
+    kind = field["type"]
+    if kind == "int64":
+        values = [None if v is None else int(v) for v in values]
+    elif kind == "float64":
+        values = [None if v is None else float(v) for v in values]
+    elif kind == "json":
+        values = [None if v is None else json.dumps(v, ensure_ascii=False) for v in values]
+    else:
+        values = [None if v is None else str(v) for v in values]
+
+    if dictionary is not None:
+        codes, lookup = dictionary
+        indices = pa.array([None if v is None else lookup[v] for v in values], type=pa.int32())
+        return pa.DictionaryArray.from_arrays(indices, codes)
+    return pa.array(values, type=arrow_type)
+
+
+def export_jsonl(src: Path, dest: Path, fmt: str = "parquet") -> Dict[str, Any]:
+    """Export one JSONL file to Parquet or Arrow IPC; returns the inferred schema."""
+    _require_pyarrow()
+    schema = infer_schema(iter_jsonl(src))
+    a_schema = arrow_schema(schema)
+    dictionaries = {
+        f["name"]: (pa.array(f["dictionary"], type=pa.string()),
+                    {v: i for i, v in enumerate(f["dictionary"])})
+        for f in schema["fields"] if "dictionary" in f
+    }
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".tmp")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(
+            str(tmp), a_schema, compression="zstd",
+            use_dictionary=list(dictionaries),
+        )
+        write = writer.write_table
+    else:
+        sink = pa.OSFile(str(tmp), "wb")
+        writer = pa.ipc.new_file(sink, a_schema)
+        write = writer.write_table
+
+    def flush(batch: List[Dict[str, Any]]) -> None:
+        cols = [
+            _column(f, [r.get(f["name"]) for r in batch], a_schema.field(f["name"]).type,
+                    dictionaries.get(f["name"]))
+            for f in schema["fields"]
+        ]
+        write(pa.Table.from_arrays(cols, schema=a_schema))
+
+    try:
+        batch: List[Dict[str, Any]] = []
+        for rec in iter_jsonl(src):
+            batch.append(rec)
+            if len(batch) >= BATCH_ROWS:
+                flush(batch)
+                batch = []
+        if batch or schema["rows"] == 0:
+            flush(batch)
+    finally:
+        writer.close()
+        if fmt != "parquet":
+            sink.close()
+    tmp.replace(dest)
+    return schema
+
+
+def find_exportable(version_dir: Path) -> List[Path]:
+    """The ops/blocks JSONL files of a version, whatever their codec."""
+    found = []
+    for name in EXPORT_NAMES:
+        for suffix in (".jsonl", ".jsonl.gz", ".jsonl.zst"):
+            p = version_dir / (name + suffix)
+            if p.exists():
+                found.append(p)
+                break
+    return found
+
+
+def export_version(version_dir: Path, fmt: str = "parquet",
+                   out_dir: Optional[Path] = None) -> List[Path]:
+    out_dir = out_dir or version_dir
+    written = []
+    for src in find_exportable(version_dir):
+        stem = src.name.split(".jsonl")[0]
+        dest = out_dir / (stem + FORMATS[fmt])
+        schema = export_jsonl(src, dest, fmt)
+        dict_cols = sum(1 for f in schema["fields"] if "dictionary" in f)
+        long_cols = sum(1 for f in schema["fields"] if f["long_text"])
+        print(f"[OK] {dest.name} — {schema['rows']} rows, {len(schema['fields'])} columns "
+              f"({dict_cols} dictionary, {long_cols} long text)")
+        written.append(dest)
+    return written
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar export of HHI ops/blocks datasets")
+    parser.add_argument("inputs", type=Path, nargs="+", help="Version folders or JSONL files")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="Output folder (default: next to the input)")
+    args = parser.parse_args(argv)
+
+    for src in args.inputs:
+        if src.is_dir():
+            export_version(src, args.format, args.out)
+        else:
+            stem = src.name.split(".jsonl")[0]
+            dest = (args.out or src.parent) / (stem + FORMATS[args.format])
+            schema = export_jsonl(src, dest, args.format)
+            print(f"[OK] {dest.name} — {schema['rows']} rows, {len(schema['fields'])} columns")
+
+
+if __name__ == "__main__":
+    main()
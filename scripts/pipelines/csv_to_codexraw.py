@@ -3,6 +3,8 @@ import re
 import json
 from pathlib import Path
 
+from anon_engine import AnonEngine, Gazetteer, Replace, Tokenize
+
 # =============================
 # CONFIG
 # =============================
@@ -10,8 +12,6 @@ ROOT = Path(r"C:\Users\amy\Documents\HHI")
 CSV_DIR = ROOT / "csv_raw"       # where you put CSV files
 OUT_DIR = ROOT / "codex_raw"     # where processed .txt goes for Codex pipeline
 
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
 # =============================
 # ANON HARD MODE (same rules)
 # =============================
@@ -29,47 +29,31 @@ MONTH_DATE_PATTERN = re.compile(
     r"Dec(?:ember)?)(?:\s+\d{1,2})(?:,\s*\d{2,4})?\b", re.I
 )
 
-def anonymize(text: str, anon_map: dict) -> str:
+PRONOUN_RULES = [
+    (r"\bI'm\b", "the subject is"),
+    (r"\bI’ve\b", "the subject has"),
+    (r"\bI'd\b", "the subject would"),
+    (r"\bI\b", "the subject"),
+    (r"\bmy\b", "the subject's"),
+    (r"\bmine\b", "the subject's"),
+]
+
+# Same engine as the full pipeline; tokens here share one counter per CSV file.
+ANON_ENGINE = AnonEngine(
+    [
+        Replace(EMAIL_PATTERN, "CONTACT_EMAIL"),
+        Replace(PHONE_PATTERN, "CONTACT_PHONE"),
+        Tokenize(DATE_PATTERN, "DATE"),
+        Tokenize(MONTH_DATE_PATTERN, "DATE"),
+        Gazetteer(CUSTOM_NAMES, "NAME"),
+        Gazetteer(CUSTOM_LOCATIONS, "LOC", escape=True),
+        *(Replace(re.compile(p, re.I), r) for p, r in PRONOUN_RULES),
+    ],
+    counter="shared",
+)
 
-    text = EMAIL_PATTERN.sub("CONTACT_EMAIL", text)
-    text = PHONE_PATTERN.sub("CONTACT_PHONE", text)
-
-    # Dates
-    def date_repl(m):
-        val = m.group(0)
-        key = "DATE::" + val
-        if key not in anon_map:
-            anon_map[key] = f"DATE_{len(anon_map)+1:03d}"
-        return anon_map[key]
-
-    text = DATE_PATTERN.sub(date_repl, text)
-    text = MONTH_DATE_PATTERN.sub(date_repl, text)
-
-    # Names
-    for name in CUSTOM_NAMES:
-        pattern = re.compile(rf"\b{name}\b", re.I)
-        key = "NAME::" + name
-        if key not in anon_map:
-            anon_map[key] = f"NAME_{len(anon_map)+1:03d}"
-        text = pattern.sub(anon_map[key], text)
-
-    # Locations
-    for loc in CUSTOM_LOCATIONS:
-        pattern = re.compile(rf"\b{re.escape(loc)}\b", re.I)
-        key = "LOC::" + loc
-        if key not in anon_map:
-            anon_map[key] = f"LOC_{len(anon_map)+1:03d}"
-        text = pattern.sub(anon_map[key], text)
-
-    # Pronouns
-    text = re.sub(r"\bI'm\b", "the subject is", text, flags=re.I)
-    text = re.sub(r"\bI’ve\b", "the subject has", text, flags=re.I)
-    text = re.sub(r"\bI'd\b", "the subject would", text, flags=re.I)
-    text = re.sub(r"\bI\b", "the subject", text, flags=re.I)
-    text = re.sub(r"\bmy\b", "the subject's", text, flags=re.I)
-    text = re.sub(r"\bmine\b", "the subject's", text, flags=re.I)
-
-    return text
+def anonymize(text: str, anon_map: dict) -> str:
+    return ANON_ENGINE.anonymize(text, anon_map)
 
 
 # =============================
@@ -102,6 +86,7 @@ def process_csv(path: Path):
 
 def main():
     CSV_DIR.mkdir(parents=True, exist_ok=True)
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
     files = list(CSV_DIR.glob("*.csv"))
 
     if not files:
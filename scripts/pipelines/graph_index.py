@@ -0,0 +1,421 @@
+"""
+graph_index.py
+Compressed sparse row (CSR) index of codex_graph_edges.jsonl.
+
+build_codex_datasets_v3_1.py writes, next to the edge list:
+
+    codex_graph_index.npz     int32 arrays, one .npy member each
+                                  out_offsets, out_neighbors, out_relations
+                                  in_offsets,  in_neighbors,  in_relations
+    codex_graph_nodes.json    {"nodes": [label, ...], "relations": [name, ...]}
+
+A node's ID is its position in `nodes` ("glyph:7A3F00", "law:IV",
+"op:ledger_03.txt#017"), which is sorted, so every node of one kind is a
+contiguous ID range. Every ledger numbers its ops from 1, so an op node is
+qualified with the edge's `source` file; glyphs and laws are shared across
+files. The out-neighbors of node u are
+out_neighbors[out_offsets[u]:out_offsets[u + 1]] (with the relation of each
+edge at the same positions); the in_* arrays are the same for reversed
+edges ("which ops carry this glyph"). Duplicate edges are stored once.
+
+With NumPy installed the arrays load as ndarrays and neighborhoods, degree
+rankings and components are computed with array operations, never one
+Python object per edge. Without it the same files load into array.array and
+the queries fall back to plain loops. The .npz is written without NumPy and
+is byte-identical either way.
+
+Usage:
+    python graph_index.py build      <version_dir>
+    python graph_index.py neighbors  <version_dir> <node> [--hops 2] [--direction both]
+                                     (node: "glyph:7A3F00", "op:<source>#017", ...)
+    python graph_index.py top        <version_dir> [--kind glyph] [--direction in] [-n 10]
+    python graph_index.py components <version_dir> [-n 10]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import ast
+import json
+import struct
+import sys
+import zipfile
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from jsonl_frames import SUFFIXES, iter_jsonl
+
+try:
+    import numpy as np
+except ImportError:  # optional: queries fall back to array.array
+    np = None
+
+EDGES_NAME = "codex_graph_edges.jsonl"
+INDEX_NAME = "codex_graph_index.npz"
+NODES_NAME = "codex_graph_nodes.json"
+ARRAY_NAMES = ("out_offsets", "out_neighbors", "out_relations",
+               "in_offsets", "in_neighbors", "in_relations")
+DIRECTIONS = ("out", "in", "both")
+
+# .npy format 1.0, little-endian int32
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_NPY_DESCR = "<i4"
+_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+# =========================================================
+# .NPZ I/O (no NumPy needed)
+# =========================================================
+
+def _npy_bytes(values: array) -> bytes:
+    header = f"{{'descr': '{_NPY_DESCR}', 'fortran_order': False, 'shape': ({len(values)},), }}"
+    pad = 64 - (len(_NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + " " * pad + "\n").encode("latin1")
+    data = array("i", values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return _NPY_MAGIC + struct.pack("<H", len(header)) + header + data.tobytes()
+
+
+def _npy_array(raw: bytes) -> array:
+    if raw[:6] != _NPY_MAGIC[:6]:
+        raise ValueError("not a .npy member")
+    if raw[6] == 1:
+        (hlen,), start = struct.unpack_from("<H", raw, 8), 10
+    else:
+        (hlen,), start = struct.unpack_from("<I", raw, 8), 12
+    header = ast.literal_eval(raw[start:start + hlen].decode("latin1"))
+    if header["descr"] != _NPY_DESCR or header["fortran_order"]:
+        raise ValueError(f"unsupported array layout {header}")
+    out = array("i")
+    out.frombytes(raw[start + hlen:])
+    if sys.byteorder == "big":
+        out.byteswap()
+    return out
+
+
+def _write_npz(path: Path, arrays: Dict[str, array]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as zf:
+        for name in ARRAY_NAMES:
+            info = zipfile.ZipInfo(name + ".npy", date_time=_ZIP_DATE)
+            zf.writestr(info, _npy_bytes(arrays[name]))
+    tmp.replace(path)
+
+
+def _read_npz(path: Path) -> Dict[str, Any]:
+    if np is not None:
+        with np.load(path) as npz:
+            return {name: npz[name] for name in ARRAY_NAMES}
+    with zipfile.ZipFile(path) as zf:
+        return {name: _npy_array(zf.read(name + ".npy")) for name in ARRAY_NAMES}
+
+
+# =========================================================
+# BUILD
+# =========================================================
+
+def _offsets(n: int, rows: array) -> array:
+    """CSR offsets of n rows from the row of every entry."""
+    offsets = array("i", bytes(4 * (n + 1)))
+    for u in rows:
+        offsets[u + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    return offsets
+
+
+def node_label(label: str, source: Optional[str]) -> str:
+    """Graph node of an edge endpoint: "op:017" of ledger_03.txt -> "op:ledger_03.txt#017"."""
+    if source and label.startswith("op:"):
+        return f"op:{source}#{label[3:]}"
+    return label
+
+
+def build_graph(edges: Iterable[Dict[str, Any]]) -> "GraphIndex":
+    """CSR index of codex_graph_edges rows ({"source", "from", "to", "relation"})."""
+    triples = {(node_label(e["from"], e.get("source")), node_label(e["to"], e.get("source")),
+                e["relation"]) for e in edges}
+    nodes = sorted({t[0] for t in triples} | {t[1] for t in triples})
+    relations = sorted({t[2] for t in triples})
+    ids = {label: i for i, label in enumerate(nodes)}
+    rel_ids = {name: i for i, name in enumerate(relations)}
+    n, nrel = len(nodes), max(len(relations), 1)
+
+    # One int per edge, sorted = edges in (from, to, relation) order.
+    src, dst, rel = array("i"), array("i"), array("i")
+    for key in sorted((ids[a] * n + ids[b]) * nrel + rel_ids[r] for a, b, r in triples):
+        uv, r = divmod(key, nrel)
+        u, v = divmod(uv, n)
+        src.append(u)
+        dst.append(v)
+        rel.append(r)
+
+    # Reverse edges by a stable counting sort on `to`, so each row stays in (from, relation) order.
+    in_offsets = _offsets(n, dst)
+    in_neighbors, in_relations = array("i", bytes(4 * len(dst))), array("i", bytes(4 * len(dst)))
+    fill = array("i", in_offsets)
+    for u, v, r in zip(src, dst, rel):
+        in_neighbors[fill[v]] = u
+        in_relations[fill[v]] = r
+        fill[v] += 1
+
+    arrays = {"out_offsets": _offsets(n, src), "out_neighbors": dst, "out_relations": rel,
+              "in_offsets": in_offsets, "in_neighbors": in_neighbors, "in_relations": in_relations}
+    return GraphIndex(nodes, relations, arrays)
+
+
+def find_edges_file(version_dir: Path) -> Path:
+    """codex_graph_edges.jsonl of a version folder, whatever its codec."""
+    for suffix in SUFFIXES.values():
+        p = Path(version_dir) / (EDGES_NAME + suffix)
+        if p.exists():
+            return p
+    raise FileNotFoundError(f"no {EDGES_NAME}[.gz|.zst] in {version_dir}")
+
+
+def read_edges(version_dir: Path) -> Iterable[Dict[str, Any]]:
+    """Edge rows of a version folder (plain or --compress output), streamed."""
+    return iter_jsonl(find_edges_file(version_dir))
+
+
+# =========================================================
+# QUERIES
+# =========================================================
+
+class GraphIndex:
+    """Node dictionary plus CSR arrays in both directions."""
+
+    def __init__(self, nodes: List[str], relations: List[str], arrays: Dict[str, Any]):
+        self.nodes = nodes
+        self.ids = {label: i for i, label in enumerate(nodes)}
+        self.relations = relations
+        self._raw = arrays
+        if np is not None:
+            arrays = {k: np.asarray(v, dtype=np.int32) for k, v in arrays.items()}
+        self.out_offsets = arrays["out_offsets"]
+        self.out_neighbors = arrays["out_neighbors"]
+        self.out_relations = arrays["out_relations"]
+        self.in_offsets = arrays["in_offsets"]
+        self.in_neighbors = arrays["in_neighbors"]
+        self.in_relations = arrays["in_relations"]
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.out_neighbors)
+
+    def save(self, version_dir: Path) -> Tuple[Path, Path]:
+        version_dir = Path(version_dir)
+        index_path, nodes_path = version_dir / INDEX_NAME, version_dir / NODES_NAME
+        raw = {k: v if isinstance(v, array) else array("i", v.tolist())
+               for k, v in self._raw.items()}
+        _write_npz(index_path, raw)
+        meta = {"nodes": self.nodes, "relations": self.relations}
+        nodes_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        return index_path, nodes_path
+
+    @classmethod
+    def load(cls, version_dir: Path) -> "GraphIndex":
+        version_dir = Path(version_dir)
+        meta = json.loads((version_dir / NODES_NAME).read_text(encoding="utf-8"))
+        return cls(meta["nodes"], meta["relations"], _read_npz(version_dir / INDEX_NAME))
+
+    def node_id(self, label: str) -> int:
+        try:
+            return self.ids[label]
+        except KeyError:
+            raise KeyError(f"unknown node {label!r}") from None
+
+    def kind_range(self, kind: str) -> Tuple[int, int]:
+        """ID range [lo, hi) of the nodes labelled "<kind>:..."."""
+        # ";" sorts right after ":", so this is the first label past the kind.
+        return bisect_left(self.nodes, kind + ":"), bisect_left(self.nodes, kind + ";")
+
+    def _adjacency(self, direction: str) -> List[Tuple[Any, Any]]:
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        adj = []
+        if direction in ("out", "both"):
+            adj.append((self.out_offsets, self.out_neighbors))
+        if direction in ("in", "both"):
+            adj.append((self.in_offsets, self.in_neighbors))
+        return adj
+
+    def neighbors(self, node: int, direction: str = "out") -> Any:
+        """Neighbor IDs of one node (array slices; "both" concatenates out and in)."""
+        parts = [nbr[off[node]:off[node + 1]] for off, nbr in self._adjacency(direction)]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if np is not None else parts[0] + parts[1]
+
+    def k_hop(self, node: int, hops: int, direction: str = "both") -> List[Any]:
+        """Nodes first reached at 1, 2, ..., `hops` steps from `node`, one ID array per hop."""
+        adj = self._adjacency(direction)
+        layers: List[Any] = []
+        if np is not None:
+            seen = np.zeros(len(self.nodes), dtype=bool)
+            seen[node] = True
+            frontier = np.array([node], dtype=np.int32)
+            for _ in range(hops):
+                reached = np.unique(np.concatenate([_gather(off, nbr, frontier)
+                                                    for off, nbr in adj]))
+                frontier = reached[~seen[reached]]
+                if not len(frontier):
+                    break
+                seen[frontier] = True
+                layers.append(frontier)
+            return layers
+        seen_b = bytearray(len(self.nodes))
+        seen_b[node] = 1
+        frontier_l = [node]
+        for _ in range(hops):
+            nxt = array("i")
+            for u in frontier_l:
+                for off, nbr in adj:
+                    for v in nbr[off[u]:off[u + 1]]:
+                        if not seen_b[v]:
+                            seen_b[v] = 1
+                            nxt.append(v)
+            if not nxt:
+                break
+            layers.append(array("i", sorted(nxt)))
+            frontier_l = nxt
+        return layers
+
+    def degrees(self, direction: str = "both") -> Any:
+        """Degree of every node (distinct edges)."""
+        total = None
+        for off, _ in self._adjacency(direction):
+            if np is not None:
+                d = np.diff(off)
+                total = d if total is None else total + d
+            else:
+                d = array("i", (off[i + 1] - off[i] for i in range(len(off) - 1)))
+                total = d if total is None else array("i", map(int.__add__, total, d))
+        return total
+
+    def top_degree(self, n: int = 10, direction: str = "in",
+                   kind: Optional[str] = None) -> List[Tuple[str, int]]:
+        """The `n` highest-degree nodes (optionally of one kind), ties by node ID."""
+        lo, hi = self.kind_range(kind) if kind else (0, len(self.nodes))
+        deg = self.degrees(direction)[lo:hi]
+        if np is not None:
+            order = np.argsort(-deg, kind="stable")[:n]
+            return [(self.nodes[lo + int(i)], int(deg[i])) for i in order]
+        order = sorted(range(len(deg)), key=lambda i: -deg[i])[:n]
+        return [(self.nodes[lo + i], deg[i]) for i in order]
+
+    def components(self) -> Any:
+        """Weakly connected components: per node, the smallest node ID in its component."""
+        n = len(self.nodes)
+        if np is not None:
+            src = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.out_offsets))
+            dst = self.out_neighbors
+            label = np.arange(n, dtype=np.int32)
+            while True:
+                low = np.minimum(label[src], label[dst])
+                new = label.copy()
+                np.minimum.at(new, src, low)
+                np.minimum.at(new, dst, low)
+                new = new[new]  # pointer jumping
+                if np.array_equal(new, label):
+                    return label
+                label = new
+        parent = array("i", range(n))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        off, nbr = self.out_offsets, self.out_neighbors
+        for u in range(n):
+            for v in nbr[off[u]:off[u + 1]]:
+                a, b = find(u), find(v)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+        return array("i", (find(x) for x in range(n)))
+
+    def component_sizes(self) -> List[Tuple[int, int]]:
+        """(size, representative node ID) per component, largest first."""
+        label = self.components()
+        if np is not None:
+            reps, sizes = np.unique(label, return_counts=True)
+            order = np.lexsort((reps, -sizes))
+            return [(int(sizes[i]), int(reps[i])) for i in order]
+        sizes: Dict[int, int] = {}
+        for rep in label:
+            sizes[rep] = sizes.get(rep, 0) + 1
+        return sorted(((s, r) for r, s in sizes.items()), key=lambda sr: (-sr[0], sr[1]))
+
+
+def _gather(offsets: Any, neighbors: Any, frontier: Any) -> Any:
+    """Concatenated neighbor slices of every node in `frontier` (NumPy)."""
+    starts, ends = offsets[frontier], offsets[frontier + 1]
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if not total:
+        return neighbors[:0]
+    shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return neighbors[np.arange(total) + shift]
+
+
+def write_graph_index(version_dir: Path, edges: Iterable[Dict[str, Any]]) -> "GraphIndex":
+    """Build the index for a version's edge rows and save it next to them."""
+    graph = build_graph(edges)
+    graph.save(version_dir)
+    return graph
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSR index of codex_graph_edges.jsonl")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build", help="(Re)build the index of a version folder")
+    p.add_argument("version_dir", type=Path)
+    p = sub.add_parser("neighbors", help="k-hop neighborhood of a node")
+    p.add_argument("version_dir", type=Path)
+    p.add_argument("node",
+                   help='Node label, e.g. "glyph:7A3F00", "law:IV" or "op:ledger_03.txt#017"')
+    p.add_argument("--hops", type=int, default=1)
+    p.add_argument("--direction", choices=DIRECTIONS, default="both")
+    p = sub.add_parser("top", help="Highest-degree nodes")
+    p.add_argument("version_dir", type=Path)
+    p.add_argument("--kind", default=None, help="Node kind: op, law, glyph")
+    p.add_argument("--direction", choices=DIRECTIONS, default="in")
+    p.add_argument("-n", type=int, default=10)
+    p = sub.add_parser("components", help="Connected components, largest first")
+    p.add_argument("version_dir", type=Path)
+    p.add_argument("-n", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        graph = write_graph_index(args.version_dir, read_edges(args.version_dir))
+        print(f"[OK] {INDEX_NAME} — {len(graph.nodes)} nodes, {graph.edge_count} edges")
+        return
+
+    graph = GraphIndex.load(args.version_dir)
+    if args.cmd == "neighbors":
+        layers = graph.k_hop(graph.node_id(args.node), args.hops, args.direction)
+        for hop, layer in enumerate(layers, 1):
+            print(f"[INFO] hop {hop}: {len(layer)} nodes")
+            for i in layer:
+                print(f"  {graph.nodes[int(i)]}")
+    elif args.cmd == "top":
+        for label, degree in graph.top_degree(args.n, args.direction, args.kind):
+            print(f"  {degree:>7}  {label}")
+    else:
+        sizes = graph.component_sizes()
+        print(f"[INFO] {len(sizes)} components over {len(graph.nodes)} nodes")
+        for size, rep in sizes[:args.n]:
+            print(f"  {size:>7}  {graph.nodes[rep]}")
+
+
+if __name__ == "__main__":
+    main()
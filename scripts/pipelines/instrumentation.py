@@ -0,0 +1,245 @@
+"""
+instrumentation.py
+Stage timers, regex counters, byte counts and peak RSS for the HHI pipelines.
+
+One collector per process, STATS. Pipelines wrap their steps in stages and
+their regexes in counting patterns, then store STATS.summary() in the
+version's metadata.json:
+
+    with STATS.stage("parse"):
+        ops = parse_ops_from_text(text)
+
+    SPACES = STATS.pattern("normalize.spaces", re.compile(r"[ \\t]+"))
+    SPACES.sub(" ", text)              # counted: matches, calls, seconds
+
+    STATS.add_bytes("read", n)
+
+Stage times are inclusive wall seconds summed over calls (and over
+processes: worker snapshots are merged into the parent with merge()), so a
+parallel run can report more stage time than elapsed time.
+
+With tracing on, every stage call is also kept as a Chrome trace event;
+write_trace() saves them for chrome://tracing or https://ui.perfetto.dev.
+
+Author: Hollow House Institute (HHI)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STATS_FORMAT = "hhi-stats-1"
+
+
+def peak_rss_bytes(children: bool = False) -> Optional[int]:
+    """Peak resident set size of this process (or of its finished children)."""
+    if resource is not None:
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        rss = resource.getrusage(who).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+    if children:
+        return None
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss)
+
+
+class CountingPattern:
+    """A compiled pattern that reports matches, calls and time to a collector.
+
+    Supports the calls the pipelines use (sub, subn, finditer, search, match,
+    findall); anything else (.pattern, .flags, ...) passes through.
+    """
+
+    def __init__(self, stats: "Instrumentation", name: str, pattern):
+        self._stats = stats
+        self._name = name
+        self._pattern = pattern
+
+    def __getattr__(self, attr):
+        return getattr(self._pattern, attr)
+
+    def _record(self, matches: int, seconds: float) -> None:
+        self._stats.add_regex(self._name, matches, seconds)
+
+    def subn(self, repl, string, count=0):
+        t0 = time.perf_counter()
+        out, n = self._pattern.subn(repl, string, count)
+        self._record(n, time.perf_counter() - t0)
+        return out, n
+
+    def sub(self, repl, string, count=0):
+        return self.subn(repl, string, count)[0]
+
+    def finditer(self, string, *args):
+        t0 = time.perf_counter()
+        n = 0
+        elapsed = 0.0
+        try:
+            for m in self._pattern.finditer(string, *args):
+                elapsed += time.perf_counter() - t0
+                n += 1
+                yield m
+                t0 = time.perf_counter()
+            elapsed += time.perf_counter() - t0
+        finally:
+            self._record(n, elapsed)
+
+    def findall(self, string, *args):
+        t0 = time.perf_counter()
+        out = self._pattern.findall(string, *args)
+        self._record(len(out), time.perf_counter() - t0)
+        return out
+
+    def search(self, string, *args):
+        t0 = time.perf_counter()
+        m = self._pattern.search(string, *args)
+        self._record(m is not None, time.perf_counter() - t0)
+        return m
+
+    def match(self, string, *args):
+        t0 = time.perf_counter()
+        m = self._pattern.match(string, *args)
+        self._record(m is not None, time.perf_counter() - t0)
+        return m
+
+
+class Instrumentation:
+    """Accumulates stage/regex/byte/counter totals for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tracing = False
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}      # name -> [seconds, calls]
+        self.regex: Dict[str, List[float]] = {}       # name -> [matches, calls, seconds]
+        self.counters: Dict[str, int] = {}
+        self.bytes = {"read": 0, "written": 0}
+        self.events: List[Dict[str, Any]] = []
+
+    # ---------------- recording ----------------
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            self.add_stage(name, t1 - t0)
+            if self.tracing:
+                self.events.append({"name": name, "ph": "X", "ts": int(t0 * 1e6),
+                                    "dur": int((t1 - t0) * 1e6),
+                                    "pid": os.getpid(), "tid": threading.get_ident()})
+
+    def add_stage(self, name: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            s = self.stages.setdefault(name, [0.0, 0])
+            s[0] += seconds
+            s[1] += calls
+
+    def add_regex(self, name: str, matches: int, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            r = self.regex.setdefault(name, [0, 0, 0.0])
+            r[0] += matches
+            r[1] += calls
+            r[2] += seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_bytes(self, kind: str, n: int) -> None:
+        with self._lock:
+            self.bytes[kind] = self.bytes.get(kind, 0) + n
+
+    def pattern(self, name: str, pattern) -> CountingPattern:
+        return CountingPattern(self, name, pattern)
+
+    # ---------------- workers ----------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Picklable raw totals, for merge() in another process."""
+        with self._lock:
+            return {
+                "stages": {k: list(v) for k, v in self.stages.items()},
+                "regex": {k: list(v) for k, v in self.regex.items()},
+                "counters": dict(self.counters),
+                "bytes": dict(self.bytes),
+                "events": list(self.events),
+            }
+
+    def drain(self) -> Dict[str, Any]:
+        """snapshot() and reset (a worker reports each task once)."""
+        snap = self.snapshot()
+        tracing = self.tracing
+        self.reset()
+        self.tracing = tracing
+        return snap
+
+    def merge(self, snap: Dict[str, Any]) -> None:
+        for name, (seconds, calls) in snap["stages"].items():
+            self.add_stage(name, seconds, calls)
+        for name, (matches, calls, seconds) in snap["regex"].items():
+            self.add_regex(name, matches, seconds, calls)
+        for name, n in snap["counters"].items():
+            self.count(name, n)
+        for kind, n in snap["bytes"].items():
+            self.add_bytes(kind, n)
+        if self.tracing:
+            self.events.extend(snap["events"])
+
+    # ---------------- output ----------------
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals for metadata.json."""
+        with self._lock:
+            return {
+                "format": STATS_FORMAT,
+                "wall_seconds": round(time.perf_counter() - self.started, 4),
+                "stages": {k: {"seconds": round(s, 4), "calls": c}
+                           for k, (s, c) in self.stages.items()},
+                "regex": {k: {"matches": int(m), "calls": c, "seconds": round(s, 4)}
+                          for k, (m, c, s) in sorted(self.regex.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "bytes_read": self.bytes.get("read", 0),
+                "bytes_written": self.bytes.get("written", 0),
+                "peak_rss_bytes": peak_rss_bytes(),
+                "peak_rss_children_bytes": peak_rss_bytes(children=True),
+            }
+
+    def write_trace(self, path: Path) -> Path:
+        """Chrome trace event file of every recorded stage call."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        base = min((e["ts"] for e in self.events), default=0)
+        events = [dict(e, ts=e["ts"] - base) for e in sorted(self.events, key=lambda e: e["ts"])]
+        path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}),
+                        encoding="utf-8")
+        return path
+
+    def report(self) -> str:
+        """One-line-per-stage text summary for the console."""
+        lines = []
+        for name, (seconds, calls) in sorted(self.stages.items(), key=lambda kv: -kv[1][0]):
+            lines.append(f"  {name:<12} {seconds:9.3f}s  ({calls} calls)")
+        return "\n".join(lines)
+
+
+STATS = Instrumentation()
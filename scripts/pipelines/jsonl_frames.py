@@ -0,0 +1,313 @@
+"""
+jsonl_frames.py
+Shared JSONL output layer: plain, or compressed in independent frames.
+
+With a codec, records are buffered into frames of about FRAME_BYTES; each
+frame is compressed on its own (a gzip member or a zstd frame) and appended
+to the file. Concatenated members are still a valid .gz / .zst stream, so
+`zcat`, `gzip.open` and `zstd -d` read the whole file as usual. Next to it a
+small index (<file>.idx.json) records, per frame, the first record number,
+byte offset and compressed length, so a reader seeks to record N by
+decompressing a single frame.
+
+Without a codec ("none") output is the same plain JSONL every writer
+produced before, and no index is written.
+
+zstd needs the optional `zstandard` package; gzip is always available.
+
+Usage:
+    python jsonl_frames.py compress <file.jsonl> [--codec gzip|zstd]
+    python jsonl_frames.py get <file.jsonl.gz> <record_number>
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import bisect
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for codec="zstd"
+    zstandard = None
+
+CODECS = ("none", "gzip", "zstd")
+SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+INDEX_SUFFIX = ".idx.json"
+INDEX_FORMAT = "jsonl-frames-1"
+# Uncompressed bytes per frame: larger compresses better, smaller seeks faster.
+FRAME_BYTES = 256 * 1024
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 10}
+
+
+def _require_codec(codec: str) -> None:
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}; expected one of {CODECS}")
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("codec 'zstd' needs the 'zstandard' package (pip install zstandard)")
+
+
+def output_path(path: Path, codec: str) -> Path:
+    """`path` with the codec's suffix appended (data.jsonl -> data.jsonl.gz)."""
+    return path.with_name(path.name + SUFFIXES[codec])
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def _compress(codec: str, data: bytes, level: int) -> bytes:
+    if codec == "gzip":
+        # mtime=0 keeps output byte-identical across runs (content hashing, dedup).
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip":
+        return gzip.decompress(data)
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+class FramedJsonlWriter:
+    """Write JSONL records to `path`, optionally compressed in seekable frames.
+
+    Writes go to a temporary file that replaces `path` (and its index) on
+    close, so readers never see a partial file.
+    """
+
+    def __init__(self, path: Path, codec: str = "none", level: Optional[int] = None,
+                 frame_bytes: int = FRAME_BYTES):
+        _require_codec(codec)
+        self.path = Path(path)
+        self.codec = codec
+        self.level = DEFAULT_LEVELS.get(codec) if level is None else level
+        self.frame_bytes = frame_bytes
+        self.count = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._frames: List[List[int]] = []
+        self._buf: List[bytes] = []
+        self._buf_size = 0
+        self._buf_first = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._f = self._tmp.open("wb")
+
+    @property
+    def frame_count(self) -> int:
+        return len(self._frames)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.write_line(json.dumps(record, ensure_ascii=False))
+
+    def write_line(self, line: str) -> None:
+        data = (line + "\n").encode("utf-8")
+        self.count += 1
+        self.bytes_in += len(data)
+        if self.codec == "none":
+            self._f.write(data)
+            self.bytes_out += len(data)
+            return
+        self._buf.append(data)
+        self._buf_size += len(data)
+        if self._buf_size >= self.frame_bytes:
+            self._flush_frame()
+
+    def _flush_frame(self) -> None:
+        if not self._buf:
+            return
+        frame = _compress(self.codec, b"".join(self._buf), self.level)
+        self._frames.append([self._buf_first, self.bytes_out, len(frame)])
+        self._f.write(frame)
+        self.bytes_out += len(frame)
+        self._buf, self._buf_size, self._buf_first = [], 0, self.count
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self._flush_frame()
+        self._f.close()
+        self._tmp.replace(self.path)
+        if self.codec != "none":
+            index = {
+                "format": INDEX_FORMAT,
+                "codec": self.codec,
+                "records": self.count,
+                "frames": self._frames,
+            }
+            idx = index_path(self.path)
+            tmp = idx.with_name(idx.name + ".tmp")
+            tmp.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+            tmp.replace(idx)
+
+    def abort(self) -> None:
+        self._f.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "FramedJsonlWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_jsonl(path: Path, rows: Iterable[Dict[str, Any]], codec: str = "none") -> Path:
+    """Write `rows` to `path` (+ codec suffix); returns the file written."""
+    target = output_path(Path(path), codec)
+    with FramedJsonlWriter(target, codec) as w:
+        for r in rows:
+            w.write(r)
+    return target
+
+
+def open_binary(path: Path) -> BinaryIO:
+    """Open plain, .gz or .zst JSONL as an uncompressed binary stream."""
+    path = Path(path)
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.name.endswith(".zst"):
+        _require_codec("zstd")
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(path.open("rb"), read_across_frames=True))
+    return path.open("rb")
+
+
+class _ChunkStream(io.RawIOBase):
+    """Read-only raw stream over an iterator of byte strings."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buf = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buf = memoryview(chunk)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def open_chunks(name: str, chunks: Iterable[bytes]) -> BinaryIO:
+    """open_binary for a file named `name` given as a stream of byte chunks."""
+    raw = io.BufferedReader(_ChunkStream(chunks))
+    if name.endswith(".gz"):
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if name.endswith(".zst"):
+        _require_codec("zstd")
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True))
+    return raw
+
+
+def _iter_lines_json(f: BinaryIO) -> Iterator[Dict[str, Any]]:
+    with io.TextIOWrapper(f, encoding="utf-8") as text:
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream records from plain, .gz or .zst JSONL (framed or not)."""
+    yield from _iter_lines_json(open_binary(path))
+
+
+def iter_jsonl_chunks(name: str, chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """iter_jsonl for a file given as a stream of byte chunks (object store, delta replay)."""
+    yield from _iter_lines_json(open_chunks(name, chunks))
+
+
+class FramedJsonlReader:
+    """Random access to a framed JSONL file through its index."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        index = json.loads(index_path(self.path).read_text(encoding="utf-8"))
+        if index.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported index format in {index_path(self.path)}")
+        self.codec = index["codec"]
+        _require_codec(self.codec)
+        self.records = index["records"]
+        self.frames = index["frames"]
+        self._starts = [f[0] for f in self.frames]
+        self._cache_frame = -1
+        self._cache_lines: List[bytes] = []
+
+    def __len__(self) -> int:
+        return self.records
+
+    def _frame_lines(self, i: int) -> List[bytes]:
+        if i != self._cache_frame:
+            _, offset, length = self.frames[i]
+            with self.path.open("rb") as f:
+                f.seek(offset)
+                data = _decompress(self.codec, f.read(length))
+            self._cache_lines = data.split(b"\n")[:-1]
+            self._cache_frame = i
+        return self._cache_lines
+
+    def get_line(self, n: int) -> str:
+        if not 0 <= n < self.records:
+            raise IndexError(n)
+        i = bisect.bisect_right(self._starts, n) - 1
+        return self._frame_lines(i)[n - self.frames[i][0]].decode("utf-8")
+
+    def get(self, n: int) -> Dict[str, Any]:
+        return json.loads(self.get_line(n))
+
+    def iter_records(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        if start >= self.records:
+            return
+        i = bisect.bisect_right(self._starts, start) - 1
+        skip = start - self.frames[i][0]
+        for j in range(i, len(self.frames)):
+            for line in self._frame_lines(j)[skip:]:
+                yield json.loads(line)
+            skip = 0
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Framed, seekable JSONL compression")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("compress", help="Re-write a plain JSONL file in compressed frames")
+    p.add_argument("path", type=Path)
+    p.add_argument("--codec", choices=CODECS[1:], default="gzip")
+
+    p = sub.add_parser("get", help="Print record N of a framed file")
+    p.add_argument("path", type=Path)
+    p.add_argument("n", type=int)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "compress":
+        target = output_path(args.path, args.codec)
+        with args.path.open("r", encoding="utf-8") as src, \
+             FramedJsonlWriter(target, args.codec) as w:
+            for line in src:
+                w.write_line(line.rstrip("\n"))
+        print(f"[OK] {target} — {w.count} records, {w.bytes_in} -> {w.bytes_out} bytes "
+              f"({w.bytes_in / max(w.bytes_out, 1):.1f}x, {w.frame_count} frames)")
+    elif args.cmd == "get":
+        print(FramedJsonlReader(args.path).get_line(args.n))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+license_rules.py
+Table-driven license classifier for the HHI dataset builders.
+
+Rules live in a JSON file (license_rules.json at the repo root by default):
+
+    {"rules": [{"id": "temple_codex", "license": "TCDPL-4.4 + 444-A",
+                "keywords": ["temple", "codex", ...]},
+               ...],
+     "default": {"id": "extended", "license": "Extended Terms (CC BY-NC-SA)"}}
+
+A record gets the first rule, in file order, any of whose keywords occurs
+in its lowercased text (plain substring, so "body" also hits "somebody");
+records that match no rule get the default. Adding a tier is a new entry
+in the file.
+
+All keywords are compiled into one prefix-trie alternation (the one
+anon_engine.py builds for gazetteers), so a record is scanned once however
+many keywords there are, instead of once per keyword:
+
+  * the leftmost keyword hit fixes a candidate rule; the scan then goes on
+    with the keywords of the higher-priority rules only, and stops at the
+    end of the record or at a hit on the first rule;
+  * the trie takes the longest keyword at a position, so a keyword stands
+    for the best rule of every keyword it starts with.
+
+match() / match_many() return the license with the rule and the keyword
+that decided it, for audit; classify() / classify_many() return the
+license alone. Set `classifier.stats` to an instrumentation.Instrumentation
+to count decisions per rule ("license.<rule>") and keyword
+("license.<rule>.<keyword>").
+
+Usage:
+    python license_rules.py [--rules license_rules.json] "text to classify" ...
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from anon_engine import trie_regex
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_RULES = REPO_ROOT / "license_rules.json"
+
+
+# =========================================================
+# RULES
+# =========================================================
+
+@dataclass(frozen=True)
+class LicenseRule:
+    """One tier: `license` applies when any of `keywords` occurs."""
+    id: str
+    license: str
+    keywords: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class LicenseMatch:
+    """Outcome for one record; `keyword` is None for the default."""
+    license: str
+    rule: str
+    keyword: Optional[str] = None
+
+
+def _rule(spec: dict, where: str) -> LicenseRule:
+    if not isinstance(spec, dict) or not spec.get("id") or not spec.get("license"):
+        raise ValueError(f"{where}: a rule needs an 'id' and a 'license'")
+    keywords = spec.get("keywords", [])
+    if isinstance(keywords, str) or not all(isinstance(k, str) for k in keywords):
+        raise ValueError(f"{where}: 'keywords' of rule {spec['id']!r} must be a list of strings")
+    return LicenseRule(str(spec["id"]), str(spec["license"]),
+                       tuple(k.lower() for k in keywords if k))
+
+
+# =========================================================
+# CLASSIFIER
+# =========================================================
+
+class LicenseClassifier:
+    """Ordered keyword rules compiled into one scanner."""
+
+    def __init__(self, rules: Sequence[LicenseRule], default: LicenseRule):
+        self.rules = list(rules)
+        self.default = default
+        self.stats = None
+        ids = [r.id for r in self.rules] + [default.id]
+        if len(set(ids)) != len(ids):
+            raise ValueError("license rule ids must be unique")
+
+        # keyword -> index of the first rule listing it
+        first: Dict[str, int] = {}
+        for i, rule in enumerate(self.rules):
+            for kw in rule.keywords:
+                first.setdefault(kw, i)
+        self._first = first
+        self.keywords = list(first)
+        # keyword matched -> (rule index, keyword to report). Every keyword it
+        # starts with matched too; the best rule among them wins.
+        self._hit: Dict[str, Tuple[int, str]] = {}
+        for kw in first:
+            prefixes = [kw[:n] for n in range(len(kw), 0, -1) if kw[:n] in first]
+            best = min(prefixes, key=first.__getitem__)
+            self._hit[kw] = (first[best], best)
+        self._outcomes = [LicenseMatch(r.license, r.id) for r in self.rules + [default]]
+        self._patterns: Dict[int, Optional[re.Pattern]] = {}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "LicenseClassifier":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if not isinstance(data.get("rules"), list) or "default" not in data:
+            raise ValueError(f"{path}: expected 'rules' (a list) and 'default'")
+        rules = [_rule(spec, f"{path} rule {i}") for i, spec in enumerate(data["rules"])]
+        default = _rule(data["default"], f"{path} default")
+        if default.keywords:
+            raise ValueError(f"{path}: the default rule takes no keywords")
+        return cls(rules, default)
+
+    def fingerprint(self) -> str:
+        """Hash of the rule table (changes when any rule, keyword or order does)."""
+        table = [[r.id, r.license, list(r.keywords)] for r in self.rules]
+        table.append([self.default.id, self.default.license])
+        return hashlib.sha256(json.dumps(table).encode("utf-8")).hexdigest()[:16]
+
+    def _pattern(self, before: int) -> Optional[re.Pattern]:
+        """Scanner for the keywords of rules [0, before), compiled on first use."""
+        if before not in self._patterns:
+            words = [kw for kw, i in self._first.items() if i < before]
+            self._patterns[before] = re.compile(trie_regex(words)) if words else None
+        return self._patterns[before]
+
+    def _decide(self, low: str) -> Tuple[int, Optional[str]]:
+        best, keyword = len(self.rules), None
+        pattern, pos = self._pattern(best), 0
+        while pattern is not None:
+            m = pattern.search(low, pos)
+            if m is None:
+                break
+            best, keyword = self._hit[m.group()]
+            pattern, pos = self._pattern(best), m.start() + 1
+        return best, keyword
+
+    def _record(self, rule: int, keyword: Optional[str]) -> None:
+        name = self._outcomes[rule].rule
+        self.stats.count(f"license.{name}")
+        if keyword is not None:
+            self.stats.count(f"license.{name}.{keyword}")
+
+    def match(self, text: str) -> LicenseMatch:
+        return self.match_many([text])[0]
+
+    def match_many(self, texts: Sequence[str]) -> List[LicenseMatch]:
+        """Rule, keyword and license for every text, in order."""
+        out = []
+        for text in texts:
+            rule, keyword = self._decide(text.lower())
+            if self.stats is not None:
+                self._record(rule, keyword)
+            outcome = self._outcomes[rule]
+            if keyword is not None:
+                outcome = LicenseMatch(outcome.license, outcome.rule, keyword)
+            out.append(outcome)
+        return out
+
+    def classify(self, text: str) -> str:
+        return self.classify_many([text])[0]
+
+    def classify_many(self, texts: Sequence[str]) -> List[str]:
+        """License for every text, in order."""
+        out = []
+        for text in texts:
+            rule, keyword = self._decide(text.lower())
+            if self.stats is not None:
+                self._record(rule, keyword)
+            out.append(self._outcomes[rule].license)
+        return out
+
+
+@lru_cache(maxsize=None)
+def load_classifier(path: Path = DEFAULT_RULES) -> LicenseClassifier:
+    """Classifier for a rules file, built once per process."""
+    return LicenseClassifier.from_file(Path(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify text with the HHI license rules")
+    parser.add_argument("text", nargs="+")
+    parser.add_argument("--rules", type=Path, default=DEFAULT_RULES)
+    args = parser.parse_args(argv)
+
+    classifier = load_classifier(args.rules)
+    print(f"[INFO] {args.rules}: {len(classifier.rules)} rules, "
+          f"{len(classifier.keywords)} keywords ({classifier.fingerprint()})")
+    for text, m in zip(args.text, classifier.match_many(args.text)):
+        print(f"  {m.license:<32} {m.rule:<14} {m.keyword or '-':<16} {text[:60]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+near_dedup.py
+Near-duplicate detection for blocks and source files (MinHash + LSH).
+
+Exact hashing only catches byte-identical text; Master_OPS_Ledger_434.txt
+and OPS_001_433_Ami_Node7.txt differ by a few thousand characters and both
+survive it. Here every text gets a MinHash signature of its character
+5-gram shingles, and signatures are split into LSH bands:
+
+    NUM_PERM = 128 values = BANDS (16) x 8 rows
+
+Two texts become candidates only when one full band agrees, so each new
+text is compared with a handful of candidates instead of everything seen
+so far (sub-quadratic). A candidate joins a cluster when the estimated
+Jaccard similarity reaches THRESHOLD (0.8 by default). A pair shares a
+band with probability 1 - (1 - J^8)^16: 0.95 at J = 0.8, 0.994 at 0.85,
+0.9999 at 0.9. The first text of a cluster, in input order, is its
+representative; later texts are compared only with representatives.
+
+Signatures use one-permutation hashing (one hash per shingle, binned into
+NUM_PERM buckets) with rotation densification for empty bins, so the cost
+is linear in text length.
+
+Inputs are version folders, in order (compacted/delta versions are read
+through the object store). Records from all of them are clustered
+together, so a block repeated across files or versions lands in one
+cluster. --by-source clusters whole source files instead of blocks.
+
+Outputs (in --out):
+
+    near_duplicates.json        summary + one entry per cluster of 2 or more
+    <file>.dedup.jsonl          with --write-deduped: representatives only
+
+Usage:
+    python near_dedup.py <version_dir> [<version_dir> ...] [--file blocks_anon.jsonl]
+                         [--field text_anon] [--threshold 0.8] [--by-source]
+                         [--store DIR] [--out DIR] [--write-deduped]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import hashlib
+import json
+import operator
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+NUM_PERM = 128
+BANDS = 16
+SHINGLE = 5
+THRESHOLD = 0.8
+REPORT_NAME = "near_duplicates.json"
+
+_VALUE_BITS = 56
+_EMPTY = 1 << _VALUE_BITS
+_WS = re.compile(r"\s+")
+
+
+def shingle_hashes(text: str, k: int = SHINGLE) -> set:
+    """64-bit hashes of the character k-grams of lower-cased, space-collapsed text."""
+    t = _WS.sub(" ", text.lower()).strip()
+    if len(t) <= k:
+        grams = {t}
+    else:
+        grams = {t[i:i + k] for i in range(len(t) - k + 1)}
+    return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big")
+            for g in grams}
+
+
+def minhash(text: str, num_perm: int = NUM_PERM) -> Tuple[int, ...]:
+    """One-permutation MinHash signature with rotation densification."""
+    sig = [_EMPTY] * num_perm
+    for h in shingle_hashes(text):
+        b = h % num_perm
+        v = (h // num_perm) & (_EMPTY - 1)
+        if v < sig[b]:
+            sig[b] = v
+    if _EMPTY in sig and any(v != _EMPTY for v in sig):
+        # Empty bin j borrows the next non-empty bin to its right, offset by
+        # the distance so borrowed values stay distinguishable.
+        dense = list(sig)
+        for j in range(num_perm):
+            if sig[j] == _EMPTY:
+                d = 1
+                while sig[(j + d) % num_perm] == _EMPTY:
+                    d += 1
+                dense[j] = sig[(j + d) % num_perm] + d * _EMPTY
+        sig = dense
+    return tuple(sig)
+
+
+def estimate_jaccard(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(map(operator.eq, a, b)) / len(a)
+
+
+class NearDuplicateIndex:
+    """Streaming LSH index: add() each text once, in input order.
+
+    Returns None when the text starts a new cluster (it becomes the
+    representative), else (representative key, estimated similarity).
+    """
+
+    def __init__(self, threshold: float = THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [
+            defaultdict(list) for _ in range(bands)]
+        self._keys: List[Any] = []
+        self._sigs: List[Tuple[int, ...]] = []
+        self.comparisons = 0
+
+    def _bands(self, sig: Tuple[int, ...]) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+        r = self.rows
+        for i in range(len(self._buckets)):
+            yield i, sig[i * r:(i + 1) * r]
+
+    def add(self, key: Any, text: str) -> Optional[Tuple[Any, float]]:
+        sig = minhash(text, self.num_perm)
+        seen = set()
+        best, best_sim = -1, 0.0
+        for i, band in self._bands(sig):
+            for rep in self._buckets[i].get(band, ()):
+                if rep in seen:
+                    continue
+                seen.add(rep)
+                self.comparisons += 1
+                sim = estimate_jaccard(sig, self._sigs[rep])
+                if sim > best_sim or (sim == best_sim and rep < best):
+                    best, best_sim = rep, sim
+        if best >= 0 and best_sim >= self.threshold:
+            return self._keys[best], best_sim
+        rep = len(self._keys)
+        self._keys.append(key)
+        self._sigs.append(sig)
+        for i, band in self._bands(sig):
+            self._buckets[i][band].append(rep)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# =========================================================
+# Version folders
+# =========================================================
+
+def iter_texts(version_dirs: List[Path], file: str, field: str, by_source: bool,
+               store_dir: Optional[Path] = None) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """(location, text) for every record (or, with by_source, every source file)."""
+    from version_catalog import is_record_file, iter_file_records, plain_name
+    from version_delta import VersionReader
+
+    for vdir in version_dirs:
+        reader = VersionReader(vdir.parent, store_dir)
+        stored = next((n for n in reader.file_names(vdir.name)
+                       if is_record_file(n) and plain_name(n) == file), None)
+        if stored is None:
+            print(f"[WARN] {vdir.name}: no {file}")
+            continue
+        docs: Dict[str, List[str]] = {}
+        for line, rec in enumerate(iter_file_records(reader, vdir, stored)):
+            text = rec.get(field)
+            if not isinstance(text, str) or not text.strip():
+                continue
+            source = str(rec.get("source") or rec.get("source_id") or "")
+            if by_source:
+                docs.setdefault(source, []).append(text)
+            else:
+                yield {"version": vdir.name, "line": line, "source": source}, text
+        for source, parts in docs.items():
+            yield {"version": vdir.name, "source": source, "records": len(parts)}, "\n".join(parts)
+
+
+def find_near_duplicates(items: Iterator[Tuple[Dict[str, Any], str]],
+                         threshold: float = THRESHOLD) -> Dict[str, Any]:
+    """Cluster (location, text) items; returns the report dict."""
+    index = NearDuplicateIndex(threshold)
+    locations: List[Dict[str, Any]] = []
+    members: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for n, (loc, text) in enumerate(items):
+        locations.append(loc)
+        hit = index.add(n, text)
+        if hit is not None:
+            rep, sim = hit
+            members[rep].append(dict(loc, similarity=round(sim, 4)))
+
+    clusters = []
+    cross_source: Counter = Counter()
+    cross_version = 0
+    for rep, dups in sorted(members.items()):
+        head = locations[rep]
+        for d in dups:
+            if d["source"] != head["source"]:
+                cross_source[" ~ ".join(sorted((head["source"], d["source"])))] += 1
+            if d["version"] != head["version"]:
+                cross_version += 1
+        clusters.append({"representative": head, "size": len(dups) + 1, "duplicates": dups})
+    clusters.sort(key=lambda c: -c["size"])
+
+    duplicates = sum(c["size"] - 1 for c in clusters)
+    return {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "params": {"num_perm": NUM_PERM, "bands": BANDS, "shingle": SHINGLE,
+                   "threshold": threshold},
+        "items": len(locations),
+        "kept": len(locations) - duplicates,
+        "duplicates": duplicates,
+        "clusters_count": len(clusters),
+        "comparisons": index.comparisons,
+        "cross_version_duplicates": cross_version,
+        "cross_source_pairs": dict(cross_source.most_common()),
+        "clusters": clusters,
+    }
+
+
+def write_deduped(version_dirs: List[Path], file: str, dropped: set, out_dir: Path,
+                  store_dir: Optional[Path] = None) -> List[Path]:
+    """Copy `file` of each version without the non-representative records."""
+    from jsonl_frames import FramedJsonlWriter
+    from version_catalog import is_record_file, iter_file_records, plain_name
+    from version_delta import VersionReader
+
+    written = []
+    for vdir in version_dirs:
+        reader = VersionReader(vdir.parent, store_dir)
+        stored = next((n for n in reader.file_names(vdir.name)
+                       if is_record_file(n) and plain_name(n) == file), None)
+        if stored is None:
+            continue
+        name = f"{vdir.name}_" + file.replace(".jsonl", ".dedup.jsonl") if len(version_dirs) > 1 \
+            else file.replace(".jsonl", ".dedup.jsonl")
+        dest = out_dir / name
+        with FramedJsonlWriter(dest) as w:
+            for line, rec in enumerate(iter_file_records(reader, vdir, stored)):
+                if (vdir.name, line) not in dropped:
+                    w.write(rec)
+        print(f"[OK] {dest.name}: {w.count} records")
+        written.append(dest)
+    return written
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="MinHash/LSH near-duplicate clusters for HHI versions")
+    parser.add_argument("versions", type=Path, nargs="+", help="Version folders, oldest first")
+    parser.add_argument("--file", default="blocks_anon.jsonl", help="Record file to cluster")
+    parser.add_argument("--field", default="text_anon", help="Text field to compare")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Min. estimated Jaccard similarity")
+    parser.add_argument("--by-source", action="store_true",
+                        help="Cluster whole source files, not records")
+    parser.add_argument("--store", type=Path, default=None,
+                        help="Object store for compacted versions")
+    parser.add_argument("--out", type=Path, default=Path("."), help="Where to write the report")
+    parser.add_argument("--write-deduped", action="store_true",
+                        help="Also write representatives-only files")
+    args = parser.parse_args(argv)
+
+    items = iter_texts(args.versions, args.file, args.field, args.by_source, args.store)
+    report = find_near_duplicates(items, args.threshold)
+    dropped = {(m["version"], m.get("line")) for c in report["clusters"] for m in c["duplicates"]}
+    report.update({"versions": [v.name for v in args.versions], "file": args.file,
+                   "field": args.field, "by_source": args.by_source})
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    (args.out / REPORT_NAME).write_text(json.dumps(report, indent=4, ensure_ascii=False),
+                                        encoding="utf-8")
+    print(f"[OK] {report['items']} items, {report['clusters_count']} clusters, "
+          f"{report['duplicates']} near-duplicates ({report['comparisons']} comparisons)")
+    for pair, n in list(report["cross_source_pairs"].items())[:10]:
+        print(f"  {n:>6}  {pair}")
+    print(f"[OK] Wrote {args.out / REPORT_NAME}")
+
+    if args.write_deduped:
+        if args.by_source:
+            print("[WARN] --write-deduped applies to record clustering only; skipped")
+        else:
+            write_deduped(args.versions, args.file, dropped, args.out, args.store)
+
+
+if __name__ == "__main__":
+    main()
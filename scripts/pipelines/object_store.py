@@ -0,0 +1,224 @@
+"""
+object_store.py
+Content-addressed object store for versioned HHI outputs.
+
+A version folder (versions/v003, data/processed/v1, ...) is described by a
+store manifest listing its files; each file is a list of chunks addressed by
+SHA-256 and kept once under `objects/`. Chunks end on line boundaries chosen
+from the line content itself, so a JSONL file that only changed in a few
+records shares every other chunk with the previous version, and identical
+files cost nothing at all.
+
+A compacted version keeps only metadata.json and store_manifest.json on disk;
+`materialize` rebuilds the original files byte for byte.
+
+Usage:
+    python object_store.py compact   <store_dir> <version_dir> [...]
+    python object_store.py materialize <store_dir> <version_dir> [--dest DIR]
+    python object_store.py gc        <store_dir> <versions_root> [...]
+    python object_store.py stats     <store_dir>
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import hashlib
+import json
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Set
+
+STORE_MANIFEST_NAME = "store_manifest.json"
+# Files that stay on disk in a compacted version (read by list/prev-hash logic).
+KEEP_MATERIALIZED = ("metadata.json", STORE_MANIFEST_NAME)
+
+# A chunk ends after a line whose CRC has CHUNK_BITS low zero bits (~64 lines
+# on average), or once it reaches CHUNK_MAX_BYTES.
+CHUNK_BITS = 6
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+CHUNK_MAX_BYTES = 4 * 1024 * 1024
+
+
+def iter_chunks(path: Path) -> Iterator[bytes]:
+    """Split a file into content-defined chunks on line boundaries."""
+    buf: List[bytes] = []
+    size = 0
+    with path.open("rb") as f:
+        for line in f:
+            buf.append(line)
+            size += len(line)
+            if (zlib.crc32(line) & CHUNK_MASK) == 0 or size >= CHUNK_MAX_BYTES:
+                yield b"".join(buf)
+                buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+class ObjectStore:
+    """SHA-256 addressed chunks under `root/objects/ab/cdef...`."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.objects = root / "objects"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def has(self, digest: str) -> bool:
+        return self._object_path(digest).exists()
+
+    def put(self, data: bytes) -> str:
+        """Store `data` (once) and return its SHA-256."""
+        digest = hashlib.sha256(data).hexdigest()
+        target = self._object_path(digest)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(target)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return self._object_path(digest).read_bytes()
+
+    # ---------------- files & versions ----------------
+
+    def store_file(self, path: Path) -> Dict[str, Any]:
+        """Store one file's chunks; returns its manifest entry."""
+        whole = hashlib.sha256()
+        chunks = []
+        size = 0
+        for chunk in iter_chunks(path):
+            whole.update(chunk)
+            size += len(chunk)
+            chunks.append(self.put(chunk))
+        return {"size": size, "sha256": whole.hexdigest(), "chunks": chunks}
+
+    def store_tree(self, version_dir: Path) -> Dict[str, Any]:
+        """Store every file of a (flat or nested) version folder; returns its manifest."""
+        files = {}
+        for p in sorted(version_dir.rglob("*")):
+            if p.is_file() and p.name != STORE_MANIFEST_NAME:
+                files[p.relative_to(version_dir).as_posix()] = self.store_file(p)
+        return {"files": files}
+
+    def write_file(self, entry: Dict[str, Any], dest: Path) -> None:
+        """Rebuild one file from its chunks, checking the whole-file hash."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        whole = hashlib.sha256()
+        tmp = dest.with_name(dest.name + ".tmp")
+        try:
+            with tmp.open("wb") as f:
+                for digest in entry["chunks"]:
+                    data = self.get(digest)
+                    whole.update(data)
+                    f.write(data)
+            if whole.hexdigest() != entry["sha256"]:
+                raise ValueError(f"Checksum mismatch rebuilding {dest}")
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            raise
+        tmp.replace(dest)
+
+    def materialize(self, version_dir: Path, dest: Path | None = None) -> Path:
+        """Rebuild a compacted version into `dest` (default: in place)."""
+        manifest = load_store_manifest(version_dir)
+        dest = dest or version_dir
+        for name, entry in manifest["files"].items():
+            target = dest / name
+            if dest == version_dir and target.exists():
+                continue
+            self.write_file(entry, target)
+        return dest
+
+    def compact(self, version_dir: Path) -> Dict[str, int]:
+        """Move a version's files into the store, keeping only KEEP_MATERIALIZED.
+
+        Safe to repeat: files already compacted are left alone.
+        """
+        manifest_path = version_dir / STORE_MANIFEST_NAME
+        manifest = load_store_manifest(version_dir) if manifest_path.exists() else {"files": {}}
+        stored = self.store_tree(version_dir)
+        manifest["files"].update(stored["files"])
+        tmp = manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, indent=4, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(manifest_path)
+
+        freed = 0
+        for name, entry in stored["files"].items():
+            if name not in KEEP_MATERIALIZED:
+                (version_dir / name).unlink()
+                freed += entry["size"]
+        return {"files": len(stored["files"]), "bytes_freed": freed}
+
+    def gc(self, manifests: Iterable[Dict[str, Any]]) -> int:
+        """Delete objects no manifest references; returns how many were removed."""
+        live: Set[str] = set()
+        for manifest in manifests:
+            for entry in manifest["files"].values():
+                live.update(entry["chunks"])
+        removed = 0
+        for p in self.objects.glob("*/*"):
+            if p.suffix != ".tmp" and p.parent.name + p.name not in live:
+                p.unlink()
+                removed += 1
+        return removed
+
+
+def load_store_manifest(version_dir: Path) -> Dict[str, Any]:
+    return json.loads((version_dir / STORE_MANIFEST_NAME).read_text(encoding="utf-8"))
+
+
+def is_compacted(version_dir: Path) -> bool:
+    return (version_dir / STORE_MANIFEST_NAME).exists()
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HHI content-addressed version store")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("compact", help="Move version folders into the store")
+    p.add_argument("store", type=Path)
+    p.add_argument("versions", type=Path, nargs="+")
+
+    p = sub.add_parser("materialize", help="Rebuild a compacted version")
+    p.add_argument("store", type=Path)
+    p.add_argument("version", type=Path)
+    p.add_argument("--dest", type=Path, default=None)
+
+    p = sub.add_parser("gc", help="Remove objects no version under the given roots references")
+    p.add_argument("store", type=Path)
+    p.add_argument("roots", type=Path, nargs="+")
+
+    p = sub.add_parser("stats", help="Show object count and size")
+    p.add_argument("store", type=Path)
+
+    args = parser.parse_args(argv)
+    store = ObjectStore(args.store)
+
+    if args.cmd == "compact":
+        for v in args.versions:
+            result = store.compact(v)
+            print(f"[OK] Compacted {v} — {result['files']} files, "
+                  f"{result['bytes_freed']} bytes freed")
+    elif args.cmd == "materialize":
+        dest = store.materialize(args.version, args.dest)
+        print(f"[OK] Materialized {args.version} -> {dest}")
+    elif args.cmd == "gc":
+        manifests = [
+            load_store_manifest(p.parent)
+            for root in args.roots
+            for p in root.glob(f"*/{STORE_MANIFEST_NAME}")
+        ]
+        print(f"[OK] Removed {store.gc(manifests)} unreferenced objects")
+    elif args.cmd == "stats":
+        objs = [p for p in store.objects.glob("*/*") if p.suffix != ".tmp"]
+        print(f"[INFO] Objects: {len(objs)}  Bytes: {sum(p.stat().st_size for p in objs)}")
+
+
+if __name__ == "__main__":
+    main()
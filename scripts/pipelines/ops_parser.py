@@ -0,0 +1,139 @@
+"""
+ops_parser.py
+Single OPS block parser shared by the HHI pipelines.
+
+An op starts at a header
+
+    ■ Op 434 — Operation 434
+
+and runs until the next header that starts a line, or the end of the text;
+the last op in a file is kept. Only the first header may sit mid-line (text
+before the ledger starts), as the full pipeline's old OPS_PATTERN behaved.
+
+With midline=True an op instead ends at the next "■ Op <n>" anywhere, even
+mid-line or not followed by "— Operation <n>", and the next op starts at
+the next full header anywhere: the OPS_PATTERN of build_codex_datasets_v3_1
+and process_codex_raw, whose callers keep that mode. For
+
+    ■ Op 1 — Operation 1
+    see also ■ Op 2 — Operation 2 body
+    ■ Op 3 — Operation 3
+
+the default mode yields ops 1 and 3 (op 1's body holds the second line),
+midline=True yields 1, 2 and 3.
+
+The scan is one left-to-right pass with two states: before the first op it
+searches for a header anywhere; inside an op it only looks at line starts,
+or at "■ Op <n>" anywhere with midline=True (no lazy `.*?`, no lookahead).
+Each block is split into lines once for field extraction ("Planetary Tag:
+Pluto" -> planetary_tag), and UTF-8 byte offsets are carried along so each
+op can be located in the parsed text.
+
+Author: Hollow House Institute (HHI)
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+HEADER = r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)"
+FIRST_HEADER_PATTERN = re.compile(HEADER)
+HEADER_PATTERN = re.compile("^" + HEADER, re.M)
+# Where an op ends in midline mode.
+BREAK_PATTERN = re.compile(r"■\s*Op\s+\d+")
+FIELD_PATTERN = re.compile(r"([A-Za-z ]+):\s*(.+)")
+# Bump when parsing behaviour changes (part of pipeline cache fingerprints).
+PARSER_VERSION = 1
+# Ledger lines repeat heavily ("Mode: Ami Node 7"); parsed lines are memoized
+# up to this many distinct lines, then the cache starts over.
+FIELD_CACHE_SIZE = 65536
+
+_field_cache: Dict[str, Optional[Tuple[str, str]]] = {}
+
+
+@dataclass
+class OpBlock:
+    """One parsed op; `body` is everything after the header numbers, unstripped."""
+    op_id: str
+    op_number: str
+    body: str
+    fields: Dict[str, str] = field(default_factory=dict)
+    offset: int = 0   # UTF-8 byte offset of the header line in the parsed text
+    length: int = 0   # UTF-8 byte length of header + body
+
+
+def _parse_line(line: str) -> Optional[Tuple[str, str]]:
+    fm = FIELD_PATTERN.match(line.strip().lstrip("\u007f"))
+    if not fm:
+        return None
+    return fm.group(1).strip().lower().replace(" ", "_"), fm.group(2).strip()
+
+
+def parse_fields(body: str) -> Dict[str, str]:
+    """Extract `Label: value` lines; repeated labels keep their first position, last value."""
+    fields: Dict[str, str] = {}
+    cache = _field_cache
+    for line in body.splitlines():
+        kv = cache.get(line, False)
+        if kv is False:
+            if len(cache) >= FIELD_CACHE_SIZE:
+                cache.clear()
+            kv = cache[line] = _parse_line(line)
+        if kv is not None:
+            fields[kv[0]] = kv[1]
+    return fields
+
+
+def iter_ops(text: str, fields: bool = True, midline: bool = False) -> Iterator[OpBlock]:
+    """Yield every op in `text`, in order, in one linear pass.
+
+    With fields=False, `OpBlock.fields` is left empty (callers that parse
+    their own normalized block). midline=True splits the way the v3.1 /
+    process_codex_raw regex did (see the module docstring).
+    """
+    if text.isascii():
+        nbytes = len
+    else:
+        def nbytes(s: str) -> int:
+            return len(s.encode("utf-8"))
+
+    prev = FIRST_HEADER_PATTERN.search(text)
+    if prev is None:
+        return
+    byte_pos = 0   # byte offset of text[char_pos]
+    char_pos = 0
+    if midline:
+        # The old pattern's `$` (no re.M) also stops before a final newline.
+        text_end = len(text) - 1 if text.endswith("\n") else len(text)
+        while prev is not None:
+            brk = BREAK_PATTERN.search(text, prev.end())
+            end = brk.start() if brk else text_end
+            op, byte_pos, char_pos = _finish(text, prev, end, byte_pos, char_pos, nbytes, fields)
+            yield op
+            prev = FIRST_HEADER_PATTERN.search(text, end)
+        return
+    for m in HEADER_PATTERN.finditer(text, prev.end()):
+        op, byte_pos, char_pos = _finish(text, prev, m.start(), byte_pos, char_pos, nbytes, fields)
+        yield op
+        prev = m
+    yield _finish(text, prev, len(text), byte_pos, char_pos, nbytes, fields)[0]
+
+
+def parse_ops(text: str, fields: bool = True, midline: bool = False) -> List[OpBlock]:
+    return list(iter_ops(text, fields, midline))
+
+
+def _finish(text: str, m: "re.Match", end: int, byte_pos: int, char_pos: int, nbytes, fields: bool):
+    start = m.start()
+    offset = byte_pos + nbytes(text[char_pos:start])
+    length = nbytes(text[start:end])
+    body = text[m.end():end]
+    op = OpBlock(
+        op_id=m.group(1),
+        op_number=m.group(2),
+        body=body,
+        fields=parse_fields(body) if fields else {},
+        offset=offset,
+        length=length,
+    )
+    return op, offset + length, end
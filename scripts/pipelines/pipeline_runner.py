@@ -0,0 +1,499 @@
+"""
+pipeline_runner.py
+Run the HHI pipeline scripts as a DAG of memoized stages.
+
+Stages are declared in a JSON config (pipeline_config.json at the repo
+root, in the spirit of v005_config.json):
+
+    {
+      "root": "C:\\\\Users\\\\amy\\\\Documents\\\\HHI",
+      "cache_dir": "{root}/runner_cache",
+      "max_workers": 3,
+      "stages": {
+        "process_codex_raw": {
+          "script": "process_codex_raw.py",        # in scripts/pipelines unless absolute
+          "entry": "process_codex_raw",            # function to call; omitted = run as __main__
+          "argv": [],                              # entry(argv) / sys.argv[1:]
+          "set": {"RAW_DIR": "{root}/codex_raw"},  # module constants to override
+          "inputs": ["{root}/codex_raw/*.txt"],    # globs; "**" recurses
+          "outputs": ["{root}/processed/*"],
+          "after": [],                             # extra ordering, rarely needed
+          "restore": true                          # rebuild missing outputs from the cache
+        }
+      }
+    }
+
+Placeholders: {root}, {repo} (the repository) and {pipelines} (this
+folder); relative globs are taken from root. Setting ROOT also moves
+every Path constant the module derived from its old ROOT (OUT_ROOT,
+CACHE_DIR, ...). A stage depends on every stage whose outputs overlap its
+inputs (plus "after").
+
+Memoization: a stage's key hashes its spec, the source of its script and
+of every local module the script imports, and the content of its input
+files. When the key matches a previous run and the outputs on disk still
+match what that run produced, the stage is skipped; if they were deleted
+or changed they are restored from the cache (an object_store.ObjectStore
+under cache_dir) instead of re-running. Because downstream keys hash the
+actual upstream files, a stage re-run that reproduces the same outputs
+does not invalidate anything below it.
+
+Stages whose dependencies are done run concurrently in separate
+processes (max_workers); each stage's console output goes to
+cache_dir/logs/<stage>.log.
+
+Usage:
+    python pipeline_runner.py [--config pipeline_config.json] [--only STAGE ...]
+                              [--force STAGE ...] [--jobs N] [--dry-run]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import ast
+import glob
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import runpy
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from object_store import ObjectStore
+
+PIPELINES_DIR = Path(__file__).resolve().parent
+REPO_ROOT = PIPELINES_DIR.parents[1]
+DEFAULT_CONFIG = REPO_ROOT / "pipeline_config.json"
+RUNNER_VERSION = 1
+# Memoized runs kept per stage (oldest dropped first).
+KEEP_RUNS = 5
+
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+class Stage:
+    """One resolved stage of the config."""
+
+    def __init__(self, name: str, spec: Dict[str, Any], expand):
+        self.name = name
+        self.spec = spec
+        script = Path(expand(spec["script"]))
+        self.script = script if script.is_absolute() else PIPELINES_DIR / script
+        self.entry: Optional[str] = spec.get("entry")
+        self.argv: List[str] = [expand(a) for a in spec.get("argv", [])]
+        self.settings: Dict[str, Any] = {k: expand(v) if isinstance(v, str) else v
+                                         for k, v in spec.get("set", {}).items()}
+        self.inputs: List[str] = [expand(p, path=True) for p in spec.get("inputs", [])]
+        self.outputs: List[str] = [expand(p, path=True) for p in spec.get("outputs", [])]
+        self.after: List[str] = list(spec.get("after", []))
+        self.restore: bool = spec.get("restore", True)
+        self.deps: Set[str] = set(self.after)
+
+
+def _static_prefix(pattern: str) -> Path:
+    """Part of a glob before its first wildcard."""
+    parts = []
+    for part in Path(pattern).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return Path(*parts)
+
+
+def _overlaps(a: str, b: str) -> bool:
+    pa, pb = _static_prefix(a), _static_prefix(b)
+    return pa == pb or pa in pb.parents or pb in pa.parents
+
+
+def load_config(path: Path) -> Tuple[Dict[str, Any], Dict[str, Stage]]:
+    config = json.loads(Path(path).read_text(encoding="utf-8"))
+    root = Path(config["root"])
+    values = {"root": str(root), "repo": str(REPO_ROOT), "pipelines": str(PIPELINES_DIR)}
+
+    def expand(value: str, path: bool = False) -> str:
+        value = value.format(**values)
+        if path and not Path(value).is_absolute():
+            value = str(root / value)
+        return value
+
+    config["cache_dir"] = Path(expand(config.get("cache_dir", "{root}/runner_cache"), path=True))
+    stages = {name: Stage(name, spec, expand) for name, spec in config["stages"].items()}
+    for stage in stages.values():
+        unknown = stage.deps - set(stages)
+        if unknown:
+            raise ValueError(f"Stage {stage.name}: unknown 'after' stage(s) {sorted(unknown)}")
+        for other in stages.values():
+            if other is not stage and any(_overlaps(o, i)
+                                          for o in other.outputs for i in stage.inputs):
+                stage.deps.add(other.name)
+    topo_order(stages)  # raises on cycles
+    return config, stages
+
+
+def topo_order(stages: Dict[str, Stage]) -> List[str]:
+    order: List[str] = []
+    state: Dict[str, int] = {}
+
+    def visit(name: str, path: List[str]) -> None:
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            raise ValueError("Stage cycle: " + " -> ".join(path + [name]))
+        state[name] = 1
+        for dep in sorted(stages[name].deps):
+            visit(dep, path + [name])
+        state[name] = 2
+        order.append(name)
+
+    for name in stages:
+        visit(name, [])
+    return order
+
+
+# =========================================================
+# HASHING
+# =========================================================
+
+class FileHashes:
+    """sha256 of files, re-read only when size or mtime changed."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, List[Any]] = {}
+        if path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"[WARN] Ignoring unreadable hash cache {path}: {e}")
+
+    def sha256(self, p: Path) -> str:
+        st = p.stat()
+        key = str(p)
+        entry = self.entries.get(key)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        h = hashlib.sha256()
+        with p.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.entries[key] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+def expand_globs(patterns: List[str]) -> List[Path]:
+    found = set()
+    for pattern in patterns:
+        for name in glob.glob(pattern, recursive=True):
+            p = Path(name)
+            if p.is_file():
+                found.add(p)
+    return sorted(found)
+
+
+def local_sources(script: Path) -> List[Path]:
+    """The script plus every module it (transitively) imports from its own folder."""
+    seen: Dict[Path, None] = {}
+    todo = [script]
+    while todo:
+        path = todo.pop()
+        if path in seen or not path.exists():
+            continue
+        seen[path] = None
+        try:
+            tree = ast.parse(path.read_text(encoding="utf-8"))
+        except SyntaxError:
+            continue
+        for node in ast.walk(tree):
+            names = []
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            for name in names:
+                candidate = PIPELINES_DIR / (name.split(".")[0] + ".py")
+                if candidate.exists():
+                    todo.append(candidate)
+    return sorted(seen)
+
+
+def stage_key(stage: Stage, hashes: FileHashes) -> Tuple[str, Dict[str, str]]:
+    """Memo key of a stage, plus the input file hashes it covers."""
+    inputs = {str(p): hashes.sha256(p) for p in expand_globs(stage.inputs)}
+    code = {p.name: hashes.sha256(p) for p in local_sources(stage.script)}
+    desc = {
+        "runner": RUNNER_VERSION,
+        "script": str(stage.script),
+        "entry": stage.entry,
+        "argv": stage.argv,
+        "set": stage.settings,
+        "outputs": stage.outputs,
+        "code": code,
+        "inputs": inputs,
+    }
+    return hashlib.sha256(json.dumps(desc, sort_keys=True).encode("utf-8")).hexdigest(), inputs
+
+
+# =========================================================
+# EXECUTION (worker process)
+# =========================================================
+
+def _load_module(script: Path):
+    if script.parent == PIPELINES_DIR:
+        return importlib.import_module(script.stem)
+    spec = importlib.util.spec_from_file_location(script.stem.replace(" ", "_"), script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _coerce(module, name: str, value: Any) -> Any:
+    current = getattr(module, name, None)
+    if isinstance(current, Path) and isinstance(value, str):
+        return Path(value)
+    return value
+
+
+def execute_stage(script: str, entry: Optional[str], argv: List[str], settings: Dict[str, Any],
+                  log_path: str) -> float:
+    """Run one stage in this process, output to `log_path`; returns seconds."""
+    if str(PIPELINES_DIR) not in sys.path:
+        sys.path.insert(0, str(PIPELINES_DIR))
+    script_path = Path(script)
+    t0 = time.perf_counter()
+    # Entry functions that parse sys.argv themselves see the stage's argv, not the runner's.
+    sys.argv = [script] + argv
+    with open(log_path, "w", encoding="utf-8") as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            _run_entry(script, script_path, entry, argv, settings)
+        except SystemExit as e:
+            # argparse errors and sys.exit() in a script end the stage, not the runner.
+            if e.code not in (0, None):
+                raise RuntimeError(f"{script_path.name} exited with {e.code!r}") from None
+    return time.perf_counter() - t0
+
+
+def _run_entry(script: str, script_path: Path, entry: Optional[str], argv: List[str],
+               settings: Dict[str, Any]) -> None:
+    if entry is None:
+        runpy.run_path(script, run_name="__main__")
+    else:
+        module = _load_module(script_path)
+        if "ROOT" in settings and isinstance(getattr(module, "ROOT", None), Path):
+            # Constants derived from ROOT (OUT_ROOT, CACHE_DIR, ...) follow it.
+            old_root, new_root = module.ROOT, Path(settings["ROOT"])
+            for name, value in list(vars(module).items()):
+                if name.isupper() and isinstance(value, Path) and value.is_relative_to(old_root):
+                    setattr(module, name, new_root / value.relative_to(old_root))
+        for name, value in settings.items():
+            setattr(module, name, _coerce(module, name, value))
+        fn = getattr(module, entry)
+        fn(argv) if argv else fn()
+
+
+# =========================================================
+# RUNNER
+# =========================================================
+
+class PipelineRunner:
+    """Plans and runs the stages of one config."""
+
+    def __init__(self, config: Dict[str, Any], stages: Dict[str, Stage]):
+        self.config = config
+        self.stages = stages
+        self.cache_dir: Path = config["cache_dir"]
+        self.store = ObjectStore(self.cache_dir / "store")
+        self.hashes = FileHashes(self.cache_dir / "file_hashes.json")
+        (self.cache_dir / "stages").mkdir(parents=True, exist_ok=True)
+        (self.cache_dir / "logs").mkdir(parents=True, exist_ok=True)
+
+    def _record_path(self, name: str) -> Path:
+        return self.cache_dir / "stages" / f"{name}.json"
+
+    def _load_record(self, name: str) -> Dict[str, Any]:
+        p = self._record_path(name)
+        if p.exists():
+            return json.loads(p.read_text(encoding="utf-8"))
+        return {"runs": {}}
+
+    def _save_record(self, name: str, record: Dict[str, Any]) -> None:
+        runs = record["runs"]
+        while len(runs) > KEEP_RUNS:
+            runs.pop(min(runs, key=lambda k: runs[k]["finished_at"]))
+        tmp = self._record_path(name).with_suffix(".tmp")
+        tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+        tmp.replace(self._record_path(name))
+
+    def _outputs_match(self, stage: Stage, outputs: Dict[str, Any]) -> bool:
+        for name, entry in outputs.items():
+            p = Path(name)
+            if not p.is_file() or self.hashes.sha256(p) != entry["sha256"]:
+                return False
+        return True
+
+    def check(self, stage: Stage, force: bool = False) -> Tuple[str, str]:
+        """("fresh" | "restore" | "run", key)."""
+        key, _ = stage_key(stage, self.hashes)
+        run = self._load_record(stage.name)["runs"].get(key)
+        if force or run is None:
+            return "run", key
+        if self._outputs_match(stage, run["outputs"]):
+            return "fresh", key
+        return ("restore" if stage.restore else "run"), key
+
+    def restore(self, stage: Stage, key: str) -> int:
+        run = self._load_record(stage.name)["runs"][key]
+        n = 0
+        for name, entry in run["outputs"].items():
+            p = Path(name)
+            if not p.is_file() or self.hashes.sha256(p) != entry["sha256"]:
+                self.store.write_file(entry, p)
+                n += 1
+        return n
+
+    def memoize(self, stage: Stage, key: str, seconds: float) -> int:
+        record = self._load_record(stage.name)
+        outputs = {}
+        for p in expand_globs(stage.outputs):
+            entry = self.store.store_file(p)
+            self.hashes.entries[str(p)] = [p.stat().st_size, p.stat().st_mtime_ns, entry["sha256"]]
+            outputs[str(p)] = entry
+        record["runs"][key] = {
+            "finished_at": datetime.utcnow().isoformat() + "Z",
+            "seconds": round(seconds, 3),
+            "outputs": outputs,
+        }
+        self._save_record(stage.name, record)
+        return len(outputs)
+
+    def selected(self, only: Optional[List[str]]) -> List[str]:
+        """`only` plus everything upstream of it, in dependency order."""
+        order = topo_order(self.stages)
+        if not only:
+            return order
+        unknown = set(only) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {sorted(unknown)}")
+        needed: Set[str] = set()
+        todo = list(only)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.stages[name].deps)
+        return [n for n in order if n in needed]
+
+    def plan(self, only: Optional[List[str]] = None,
+             force: Set[str] = frozenset()) -> Dict[str, str]:
+        """What run() would do now, without running anything."""
+        result: Dict[str, str] = {}
+        for name in self.selected(only):
+            stage = self.stages[name]
+            if any(result[d] in ("run", "pending") for d in stage.deps if d in result):
+                result[name] = "pending"  # depends on what upstream produces
+            else:
+                result[name] = self.check(stage, name in force)[0]
+        return result
+
+    def run(self, only: Optional[List[str]] = None, force: Set[str] = frozenset(),
+            jobs: Optional[int] = None) -> Dict[str, str]:
+        names = self.selected(only)
+        status: Dict[str, str] = {}
+        running: Dict[Any, Tuple[str, str]] = {}
+        jobs = jobs or self.config.get("max_workers") or os.cpu_count() or 1
+        t_start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as pool:
+            while len(status) < len(names):
+                for name in names:
+                    if name in status or any(name == n for n, _ in running.values()):
+                        continue
+                    stage = self.stages[name]
+                    deps = [d for d in stage.deps if d in names]
+                    if any(status.get(d) == "failed" or status.get(d) == "skipped" for d in deps):
+                        status[name] = "skipped"
+                        print(f"[WARN] {name}: skipped (upstream failed)")
+                        continue
+                    if not all(d in status for d in deps):
+                        continue
+                    action, key = self.check(stage, name in force)
+                    if action == "fresh":
+                        status[name] = "fresh"
+                        print(f"[OK] {name}: up to date")
+                    elif action == "restore":
+                        n = self.restore(stage, key)
+                        status[name] = "restored"
+                        print(f"[OK] {name}: restored {n} output file(s) from cache")
+                    else:
+                        log = self.cache_dir / "logs" / f"{name}.log"
+                        print(f"[INFO] {name}: running (log: {log})")
+                        fut = pool.submit(execute_stage, str(stage.script), stage.entry, stage.argv,
+                                          stage.settings, str(log))
+                        running[fut] = (name, key)
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name, key = running.pop(fut)
+                    try:
+                        seconds = fut.result()
+                    except Exception as e:
+                        status[name] = "failed"
+                        log = self.cache_dir / "logs" / f"{name}.log"
+                        print(f"[WARN] {name}: failed: {e!r} (see {log})")
+                        continue
+                    n = self.memoize(self.stages[name], key, seconds)
+                    status[name] = "ran"
+                    print(f"[OK] {name}: done in {seconds:.2f}s ({n} output file(s) cached)")
+
+        self.hashes.save()
+        print(f"[DONE] {len(names)} stage(s) in {time.perf_counter() - t_start:.2f}s: "
+              + ", ".join(f"{n}={s}" for n, s in status.items()))
+        return status
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run HHI pipeline stages with memoized outputs")
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG)
+    parser.add_argument("--only", nargs="+", default=None,
+                        help="Run these stages (and what they need)")
+    parser.add_argument("--force", nargs="+", default=[], help="Re-run these stages even if cached")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Concurrent stages (default: config max_workers)")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would run")
+    args = parser.parse_args(argv)
+
+    config, stages = load_config(args.config)
+    runner = PipelineRunner(config, stages)
+    if args.dry_run:
+        for name, action in runner.plan(args.only, set(args.force)).items():
+            deps = ", ".join(sorted(stages[name].deps)) or "-"
+            print(f"  {name:<24} {action:<8} after: {deps}")
+        runner.hashes.save()
+        return
+    status = runner.run(args.only, set(args.force), args.jobs)
+    if "failed" in status.values():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
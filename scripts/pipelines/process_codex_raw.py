@@ -1,9 +1,11 @@
 import os
-import re
 import json
 from pathlib import Path
 from datetime import datetime
 
+from instrumentation import STATS
+from ops_parser import iter_ops, parse_fields
+
 # ---------------------------------------------------------
 # CONFIG
 # ---------------------------------------------------------
@@ -11,13 +13,6 @@ from datetime import datetime
 RAW_DIR = r"C:\Users\amy\Documents\HHI\codex_raw"
 OUT_DIR = r"C:\Users\amy\Documents\HHI\processed"
 
-OPS_PATTERN = re.compile(
-    r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)(.*?)(?=■\s*Op\s+\d+|$)",
-    re.S
-)
-
-FIELD_PATTERN = re.compile(r"([A-Za-z ]+):\s*(.+)")
-
 # ---------------------------------------------------------
 # HELPERS
 # ---------------------------------------------------------
@@ -28,19 +23,6 @@ def normalize(text: str) -> str:
     text = text.replace("\r", "")
     return text.strip()
 
-def parse_fields(block: str) -> dict:
-    """Extract field:value pairs inside an OPS block."""
-    fields = {}
-    for line in block.splitlines():
-        line = line.strip()
-        m = FIELD_PATTERN.match(line)
-        if m:
-            label = m.group(1).strip()
-            value = m.group(2).strip()
-            key = label.lower().replace(" ", "_")
-            fields[key] = value
-    return fields
-
 def load_all_text(raw_dir: str) -> str:
     """Read all .txt and .md files in codex_raw."""
     root = Path(raw_dir)
@@ -49,6 +31,7 @@ def load_all_text(raw_dir: str) -> str:
         if f.is_file() and f.suffix.lower() in [".txt", ".md"]:
             try:
                 buff.append(f.read_text(encoding="utf-8", errors="ignore"))
+                STATS.add_bytes("read", f.stat().st_size)
             except:
                 print(f"[WARN] Could not read: {f}")
     return "\n\n".join(buff)
@@ -59,26 +42,31 @@ def load_all_text(raw_dir: str) -> str:
 
 def process_codex_raw():
     print(f"[INFO] Reading raw files from: {RAW_DIR}")
+    STATS.reset()
 
-    text = load_all_text(RAW_DIR)
-    text = normalize(text)
+    with STATS.stage("load"):
+        text = load_all_text(RAW_DIR)
+    with STATS.stage("normalize"):
+        text = normalize(text)
 
     print("[INFO] Extracting OPS blocks...")
     ops = []
 
-    for match in OPS_PATTERN.finditer(text):
-        op_id = match.group(1)
-        op_number = match.group(2)
-        block = normalize(match.group(3))
+    with STATS.stage("parse"):
+        # An op ends at the next "■ Op <n>", even mid-line (see ops_parser.py).
+        for op in iter_ops(text, fields=False, midline=True):
+            op_id = op.op_id
+            op_number = op.op_number
+            block = normalize(op.body)
 
-        fields = parse_fields(block)
+            fields = parse_fields(block)
 
-        ops.append({
-            "op_id": op_id,
-            "op_number": op_number,
-            "block": block,
-            **fields
-        })
+            ops.append({
+                "op_id": op_id,
+                "op_number": op_number,
+                "block": block,
+                **fields
+            })
 
     print(f"[OK] Found {len(ops)} OPS entries")
 
@@ -92,21 +80,24 @@ def process_codex_raw():
     json_path = os.path.join(OUT_DIR, "ops_ledger.json")
     metadata_path = os.path.join(OUT_DIR, "metadata.json")
 
-    # JSONL
-    with open(jsonl_path, "w", encoding="utf-8") as f:
-        for entry in ops:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    with STATS.stage("write"):
+        # JSONL
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for entry in ops:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
 
-    # JSON
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(ops, f, indent=4, ensure_ascii=False)
+        # JSON
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(ops, f, indent=4, ensure_ascii=False)
+    STATS.add_bytes("written", os.path.getsize(jsonl_path) + os.path.getsize(json_path))
 
     # Metadata
     metadata = {
         "generated_at": datetime.utcnow().isoformat() + "Z",
         "source_folder": RAW_DIR,
         "ops_count": len(ops),
-        "files_processed": len(list(Path(RAW_DIR).rglob("*")))
+        "files_processed": len(list(Path(RAW_DIR).rglob("*"))),
+        "stats": STATS.summary(),
     }
 
     with open(metadata_path, "w", encoding="utf-8") as f:
@@ -0,0 +1,218 @@
+"""
+raw_watcher.py
+Wait for changes to the source files under codex_raw.
+
+    watcher = RawWatcher(RAW_DIR, {".txt", ".md"})
+    while True:
+        changed = watcher.wait()        # blocks; returns the changed paths
+        ...
+
+Two backends:
+
+    inotify     Linux. The kernel wakes the process when a file is closed
+                after writing, moved or deleted; no CPU is used while idle.
+                Called through ctypes, nothing to install.
+    poll        Everywhere else (Windows, network shares, or inotify
+                unavailable): the tree is stat()ed every POLL_SECONDS.
+                Cheap for a folder of ledgers, but not instant.
+
+Bursts are debounced: after the first change, wait() keeps collecting
+until the tree has been quiet for DEBOUNCE_SECONDS (at most MAX_WAIT_SECONDS
+after the first change, so a file that is written to continuously still
+gets picked up). The result is then checked against a stat snapshot, so
+events that left a file as it was (editor swap files, a save that changed
+nothing) do not wake the caller.
+
+Author: Hollow House Institute (HHI)
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+DEBOUNCE_SECONDS = 1.0
+MAX_WAIT_SECONDS = 10.0
+POLL_SECONDS = 2.0
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT = struct.Struct("iIII")
+
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def snapshot(root: Path, suffixes: Iterable[str]) -> Snapshot:
+    """path -> (size, mtime_ns) of every source file under root."""
+    suffixes = {s.lower() for s in suffixes}
+    out: Snapshot = {}
+    stack = [str(root)]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for e in entries:
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.is_file() and os.path.splitext(e.name)[1].lower() in suffixes:
+                    st = e.stat()
+                    out[e.path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+    return out
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> Set[str]:
+    """Paths added, removed or changed between two snapshots."""
+    return {p for p in old.keys() | new.keys() if old.get(p) != new.get(p)}
+
+
+class _Inotify:
+    """Recursive inotify watch on a directory tree (Linux)."""
+
+    def __init__(self, root: Path):
+        libc_name = ctypes.util.find_library("c")
+        if sys.platform != "linux" or libc_name is None:
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        self.overflowed = False
+        self._add_tree(str(root))
+
+    def _add_tree(self, top: str) -> None:
+        for dirpath, _, _ in os.walk(top):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if dirpath == top and not self._dirs:
+                    raise OSError(err, f"inotify_add_watch failed for {dirpath}")
+                continue
+            self._dirs[wd] = dirpath
+
+    def read(self, timeout: Optional[float]) -> Set[str]:
+        """Paths named by events within `timeout` seconds (None = block)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        paths: Set[str] = set()
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = data[pos:pos + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            pos += length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            base = self._dirs.get(wd)
+            if base is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._dirs[wd]
+                continue
+            path = os.path.join(base, name) if name else base
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+            paths.add(path)
+        return paths
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class RawWatcher:
+    """Blocking, debounced change notification for a source folder."""
+
+    def __init__(self, root: Path, suffixes: Iterable[str], debounce: float = DEBOUNCE_SECONDS,
+                 poll: float = POLL_SECONDS, force_poll: bool = False):
+        self.root = Path(root)
+        self.suffixes = {s.lower() for s in suffixes}
+        self.debounce = debounce
+        self.poll = poll
+        self._inotify: Optional[_Inotify] = None
+        if not force_poll:
+            try:
+                self._inotify = _Inotify(self.root)
+            except (OSError, AttributeError) as e:
+                print(f"[WARN] inotify unavailable ({e}); polling every {poll:g}s")
+        self.backend = "inotify" if self._inotify else "poll"
+        self._snap = snapshot(self.root, self.suffixes)
+        self._poll_last = self._snap
+
+    def _relevant(self, paths: Set[str]) -> bool:
+        if self._inotify is not None and self._inotify.overflowed:
+            self._inotify.overflowed = False
+            return True
+        return any(os.path.splitext(p)[1].lower() in self.suffixes or os.path.isdir(p)
+                   or not os.path.splitext(p)[1] for p in paths)
+
+    def _next_activity(self, timeout: Optional[float]) -> bool:
+        """True once something may have changed, False after `timeout` of quiet."""
+        if self._inotify is not None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                left = None if deadline is None else max(0.0, deadline - time.monotonic())
+                paths = self._inotify.read(left)
+                if self._relevant(paths):
+                    return True
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+        # Polling: one snapshot per interval, compared with the last one seen.
+        waited = 0.0
+        while timeout is None or waited < timeout:
+            step = self.poll if timeout is None else min(self.poll, timeout - waited)
+            time.sleep(step)
+            waited += step
+            current = snapshot(self.root, self.suffixes)
+            if current != self._poll_last:
+                self._poll_last = current
+                return True
+        return False
+
+    def wait(self) -> Set[Path]:
+        """Block until source files changed and then settled; returns them."""
+        while True:
+            self._poll_last = self._snap
+            self._next_activity(None)
+            first = time.monotonic()
+            while time.monotonic() - first < MAX_WAIT_SECONDS:
+                if not self._next_activity(self.debounce):
+                    break
+            current = snapshot(self.root, self.suffixes)
+            changed = diff_snapshots(self._snap, current)
+            self._snap = current
+            if changed:
+                return {Path(p) for p in sorted(changed)}
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
@@ -0,0 +1,249 @@
+"""
+record_index.py
+Byte-offset sidecar indexes for the pipeline's JSONL outputs.
+
+v005_config.json names two index files per version:
+
+    <version>_block_index.jsonl   block "index" -> its line in blocks_anon.jsonl
+    <version>_ops_index.jsonl     "op_id"       -> its line(s) in ops_ledger_anon.jsonl
+
+One entry per record, in file order:
+
+    {"op_id": "017", "line": 16, "offset": 48213, "length": 2911}
+
+`offset`/`length` are bytes in the uncompressed JSONL. For plain output the
+reader mmaps the data file and slices the record out directly; for gzip/zstd
+output (see jsonl_frames.py) it fetches `line` through the frame index. op_id
+is not unique (every ledger file numbers its ops from 1), so lookups return
+all matching records.
+
+The pipeline writes the indexes while it writes the data; `build` adds them
+to any existing version folder.
+
+Usage:
+    python record_index.py build <version_dir>
+    python record_index.py get   <version_dir> ops_index|block_index <key>
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import json
+import mmap
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from jsonl_frames import FramedJsonlReader, FramedJsonlWriter, open_binary
+
+# index kind -> (data file, key field)
+INDEX_FILES = {
+    "block_index": ("blocks_anon.jsonl", "index"),
+    "ops_index": ("ops_ledger_anon.jsonl", "op_id"),
+}
+DATA_SUFFIXES = ("", ".gz", ".zst")
+
+
+def index_name(version: str, kind: str) -> str:
+    """File name of an index, as declared in v005_config.json (v005_block_index.jsonl)."""
+    return f"{version}_{kind}.jsonl"
+
+
+def find_data_file(version_dir: Path, kind: str) -> Optional[Path]:
+    """The data file an index points into, whatever its codec."""
+    name = INDEX_FILES[kind][0]
+    for suffix in DATA_SUFFIXES:
+        p = version_dir / (name + suffix)
+        if p.exists():
+            return p
+    return None
+
+
+def version_of(version_dir: Path) -> str:
+    """Version name from metadata.json, else the (resolved) folder name."""
+    meta = version_dir / "metadata.json"
+    if meta.exists():
+        version = json.loads(meta.read_text(encoding="utf-8")).get("version")
+        if version:
+            return version
+    return version_dir.resolve().name
+
+
+def find_index_file(version_dir: Path, kind: str) -> Optional[Path]:
+    p = version_dir / index_name(version_of(version_dir), kind)
+    if p.exists():
+        return p
+    found = sorted(version_dir.glob(f"*_{kind}.jsonl"))
+    return found[-1] if found else None
+
+
+class RecordIndexWriter:
+    """Write records through a FramedJsonlWriter and index each one.
+
+    Use as a context manager nested inside the data writer's, so the index
+    is only published when the data file is.
+    """
+
+    def __init__(self, path: Path, data: FramedJsonlWriter, key: str):
+        self.data = data
+        self.key = key
+        self._out = FramedJsonlWriter(path)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        offset = self.data.bytes_in
+        self.data.write(record)
+        self._out.write({
+            self.key: record.get(self.key),
+            "line": self.data.count - 1,
+            "offset": offset,
+            "length": self.data.bytes_in - offset,
+        })
+
+    def close(self) -> None:
+        self._out.close()
+
+    def __enter__(self) -> "RecordIndexWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._out.__exit__(exc_type, exc, tb)
+
+
+class RecordIndex:
+    """O(1) record lookup by key through a sidecar index.
+
+    The index is loaded once into a dict; each lookup is a dict hit plus one
+    slice of the mmapped data file (or one frame read for compressed data).
+    """
+
+    def __init__(self, data_path: Path, index_file: Path):
+        self.data_path = Path(data_path)
+        self.key = None
+        self._by_key: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._entries: List[Tuple[int, int]] = []
+        with Path(index_file).open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                e = json.loads(line)
+                if self.key is None:
+                    self.key = next(iter(e))
+                entry = (e["line"], e["offset"], e["length"])
+                self._by_key.setdefault(str(e[self.key]), []).append(entry)
+                self._entries.append((e["offset"], e["length"]))
+
+        self._mm: Optional[mmap.mmap] = None
+        self._frames: Optional[FramedJsonlReader] = None
+        self._file = None
+        if self.data_path.name.endswith(".jsonl"):
+            self._file = self.data_path.open("rb")
+            if self.data_path.stat().st_size:
+                self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._frames = FramedJsonlReader(self.data_path)
+
+    @classmethod
+    def open(cls, version_dir: Path, kind: str) -> "RecordIndex":
+        data = find_data_file(version_dir, kind)
+        idx = find_index_file(version_dir, kind)
+        if data is None or idx is None:
+            raise FileNotFoundError(
+                f"No {kind} data/index in {version_dir} (run: record_index.py build)")
+        return cls(data, idx)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Any) -> bool:
+        return str(key) in self._by_key
+
+    def keys(self) -> List[str]:
+        return list(self._by_key)
+
+    def _read(self, line: int, offset: int, length: int) -> bytes:
+        if self._frames is not None:
+            return self._frames.get_line(line).encode("utf-8")
+        return self._mm[offset:offset + length] if self._mm is not None else b""
+
+    def get_line(self, line: int) -> Dict[str, Any]:
+        """Record number `line` (0-based) of the data file."""
+        offset, length = self._entries[line]
+        return json.loads(self._read(line, offset, length))
+
+    def get(self, key: Any) -> List[Dict[str, Any]]:
+        """All records whose key field equals `key` (empty list when none)."""
+        return [json.loads(self._read(*e)) for e in self._by_key.get(str(key), ())]
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self) -> "RecordIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def build_index(data_path: Path, dest: Path, key: str) -> int:
+    """Index an existing JSONL file in one pass; returns the record count."""
+    offset = line_no = 0
+    with open_binary(data_path) as src, FramedJsonlWriter(dest) as out:
+        for raw in src:
+            if raw.strip():
+                out.write({
+                    key: json.loads(raw).get(key),
+                    "line": line_no,
+                    "offset": offset,
+                    "length": len(raw),
+                })
+                line_no += 1
+            offset += len(raw)
+    return line_no
+
+
+def build_version_indexes(version_dir: Path) -> List[Path]:
+    written = []
+    version = version_of(version_dir)
+    for kind, (_, key) in INDEX_FILES.items():
+        data = find_data_file(version_dir, kind)
+        if data is None:
+            continue
+        dest = version_dir / index_name(version, kind)
+        count = build_index(data, dest, key)
+        print(f"[OK] {dest.name} — {count} records")
+        written.append(dest)
+    return written
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Byte-offset indexes for HHI JSONL outputs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("build", help="Write the block/ops indexes of a version folder")
+    p.add_argument("version_dir", type=Path)
+
+    p = sub.add_parser("get", help="Print the records with a given op_id / block index")
+    p.add_argument("version_dir", type=Path)
+    p.add_argument("kind", choices=sorted(INDEX_FILES))
+    p.add_argument("key")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "build":
+        build_version_indexes(args.version_dir)
+    elif args.cmd == "get":
+        with RecordIndex.open(args.version_dir, args.kind) as idx:
+            records = idx.get(args.key)
+        if not records:
+            print(f"[WARN] No record with {INDEX_FILES[args.kind][1]} = {args.key}")
+        for rec in records:
+            print(json.dumps(rec, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+release_profile.py
+Record layouts for the two release profiles of the full pipeline.
+
+    full      Every record as parsed: blocks carry `text` (raw) next to
+              `text_anon` plus `source` and `path`; OPS entries carry
+              `block_raw`, `block_normalized` and `block_anon` plus the
+              parsed fields, un-anonymized, and their file's `source`. anonymization_map.json (raw
+              surface form -> token) ships in the version folder.
+
+    compact   Only anonymized text goes into the release:
+
+                  blocks_anon.jsonl       {"source_id", "index", "text_anon"}
+                  ops_ledger_anon.jsonl   {"op_id", "op_number", "source_id",
+                                           <fields, anonymized>, "block_anon"}
+
+              `path`/`source` become a short source ID ("s" + 8 hex of the
+              path relative to codex_raw, stable across versions). Raw text,
+              the source ID -> path table, the absolute root/raw_dir paths
+              and anonymization_map.json go to a restricted sidecar outside
+              the versions folder (or nowhere); metadata.json leaves them out:
+
+                  <restricted>/<version>/
+                      blocks_raw.jsonl        {"index", "source", "path", "text"}
+                      ops_ledger_raw.jsonl    {"op_id", "source", "block_raw",
+                                               "block_normalized", <fields, raw>}
+                      sources.json            source_id -> path
+                      paths.json              {"version", "root", "raw_dir"}
+                      anonymization_map.json
+
+Field values are anonymized with the same engine and registry as the
+blocks, in document order, so tokens are consistent across files.
+
+Author: Hollow House Institute (HHI)
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+PROFILES = ("full", "compact")
+RAW_SIDECAR_MODES = ("restricted", "none")
+
+RAW_BLOCKS_NAME = "blocks_raw.jsonl"
+RAW_OPS_NAME = "ops_ledger_raw.jsonl"
+SOURCES_NAME = "sources.json"
+PATHS_NAME = "paths.json"
+
+# OPS keys that are not parsed fields.
+OP_TEXT_KEYS = ("block_raw", "block_normalized", "block_anon")
+OP_ID_KEYS = ("op_id", "op_number")
+
+
+def source_id(path: str, raw_dir: Path) -> str:
+    """Short, stable ID for a source file: hash of its path relative to raw_dir."""
+    p = Path(path)
+    try:
+        rel = p.relative_to(raw_dir).as_posix()
+    except ValueError:
+        rel = p.name
+    return "s" + hashlib.sha1(rel.encode("utf-8")).hexdigest()[:8]
+
+
+def compact_block(block: Dict[str, Any], sid: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(release record, raw sidecar record) for one block."""
+    compact = {"source_id": sid, "index": block["index"], "text_anon": block["text_anon"]}
+    raw = {"index": block["index"], "source": block["source"], "path": block["path"],
+           "text": block["text"]}
+    return compact, raw
+
+
+def compact_op(op: Dict[str, Any], sid: str,
+               anonymize: Callable[[str], str]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(release record, raw sidecar record) for one OPS entry of source `sid`.
+
+    Field values go through `anonymize`.
+    """
+    compact = {k: op[k] for k in OP_ID_KEYS if k in op}
+    compact["source_id"] = sid
+    raw = {"op_id": op.get("op_id"), "source": op.get("source"),
+           "block_raw": op.get("block_raw"), "block_normalized": op.get("block_normalized")}
+    for key, value in op.items():
+        if key in OP_ID_KEYS or key in OP_TEXT_KEYS or key == "source":
+            continue
+        compact[key] = anonymize(value) if isinstance(value, str) else value
+        raw[key] = value
+    compact["block_anon"] = op["block_anon"]
+    return compact, raw
@@ -0,0 +1,212 @@
+"""
+search_index.py
+Full-text search over the anonymized text of a version.
+
+Each version gets a search_index.sqlite holding an SQLite FTS5 table with
+one row per record:
+
+    blocks_anon.jsonl      -> text_anon   (id: block "index")
+    ops_ledger_anon.jsonl  -> block_anon  (id: "op_id" + line)
+
+Only those anonymized fields are ever written to the index: raw text
+(`text`, `block_raw`, `block_normalized`, `path`, ...) never reaches it, so
+no query or snippet can surface a raw identifier.
+
+Tokens keep underscores ("LOC_003" is one token); glyph brackets and other
+symbols separate tokens, so "■C626EB■" finds the glyph. Results are ranked
+by BM25 and come with a highlighted snippet.
+
+Usage:
+    python search_index.py build  <version_dir>
+    python search_index.py search <version_dir> "Serpent Check"
+                           [--kind block|op] [--limit 20] [--fts]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from jsonl_frames import iter_jsonl
+from record_index import find_data_file
+
+SEARCH_INDEX_NAME = "search_index.sqlite"
+# kind -> (record_index kind of the data file, anonymized text field, id field)
+SEARCH_SOURCES = {
+    "block": ("block_index", "text_anon", "index"),
+    "op": ("ops_index", "block_anon", "op_id"),
+}
+TOKENIZER = "unicode61 tokenchars '_'"
+SNIPPET_TOKENS = 12
+
+
+def _require_fts5(conn: sqlite3.Connection) -> None:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+    except sqlite3.OperationalError:
+        raise RuntimeError("Search index needs an SQLite build with FTS5 (sqlite3.sqlite_version "
+                           f"{sqlite3.sqlite_version})")
+
+
+class SearchIndexWriter:
+    """Stream anonymized text into a new search index; published on close."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.count = 0
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._tmp.unlink(missing_ok=True)
+        self.conn = sqlite3.connect(str(self._tmp))
+        _require_fts5(self.conn)
+        # A throwaway file until close(): no journal needed.
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute(
+            f"CREATE VIRTUAL TABLE docs USING fts5("
+            f"text, kind UNINDEXED, line UNINDEXED, key UNINDEXED, tokenize = \"{TOKENIZER}\")"
+        )
+
+    def add(self, kind: str, line: int, record: Dict[str, Any]) -> None:
+        """Index the anonymized field of one ops/blocks record."""
+        _, field, key = SEARCH_SOURCES[kind]
+        text = record.get(field)
+        if text:
+            self.conn.execute("INSERT INTO docs VALUES (?,?,?,?)",
+                              (text, kind, line, record.get(key)))
+            self.count += 1
+
+    def close(self) -> None:
+        if self.conn is None:
+            return
+        self.conn.execute("INSERT INTO docs (docs) VALUES ('optimize')")
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
+        self._tmp.replace(self.path)
+
+    def abort(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "SearchIndexWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def build_search_index(version_dir: Path) -> Path:
+    """(Re)build a version's search index from its ops/blocks files."""
+    dest = version_dir / SEARCH_INDEX_NAME
+    with SearchIndexWriter(dest) as w:
+        for kind, (data_kind, _, _) in SEARCH_SOURCES.items():
+            src = find_data_file(version_dir, data_kind)
+            if src is None:
+                continue
+            for line, rec in enumerate(iter_jsonl(src)):
+                w.add(kind, line, rec)
+    print(f"[OK] {dest} — {w.count} records indexed")
+    return dest
+
+
+def phrase_query(text: str) -> str:
+    """Quote user text as one FTS5 phrase (no query syntax)."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class SearchIndex:
+    """Ranked search over one version's search_index.sqlite."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"{self.path} not found (run: search_index.py build)")
+        self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    @classmethod
+    def open(cls, version_dir: Path) -> "SearchIndex":
+        return cls(version_dir / SEARCH_INDEX_NAME)
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None,
+               fts_syntax: bool = False) -> List[Dict[str, Any]]:
+        """Best matches first: [{"kind", "line", "id", "score", "snippet"}].
+
+        `query` is matched as a phrase unless fts_syntax=True (then FTS5
+        syntax: AND/OR/NOT, prefix*, NEAR(...)).
+        """
+        match = query if fts_syntax else phrase_query(query)
+        sql = ("SELECT kind, line, key, bm25(docs), "
+               f"snippet(docs, 0, '[', ']', '…', {SNIPPET_TOKENS}) "
+               "FROM docs WHERE docs MATCH ?")
+        params: List[Any] = [match]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY bm25(docs) LIMIT ?"
+        params.append(limit)
+        return [
+            {"kind": k, "line": line, "id": key, "score": round(-score, 4), "snippet": snip}
+            for k, line, key, score, snip in self.conn.execute(sql, params)
+        ]
+
+    def count(self, query: str, kind: Optional[str] = None, fts_syntax: bool = False) -> int:
+        match = query if fts_syntax else phrase_query(query)
+        sql = "SELECT count(*) FROM docs WHERE docs MATCH ?"
+        params: List[Any] = [match]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search over anonymized HHI outputs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("build", help="Build the search index of a version folder")
+    p.add_argument("version_dir", type=Path)
+
+    p = sub.add_parser("search", help="Ranked search with snippets")
+    p.add_argument("version_dir", type=Path)
+    p.add_argument("query")
+    p.add_argument("--kind", choices=sorted(SEARCH_SOURCES), default=None)
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--fts", action="store_true", help="Use FTS5 query syntax instead of a phrase")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "build":
+        build_search_index(args.version_dir)
+    elif args.cmd == "search":
+        with SearchIndex.open(args.version_dir) as idx:
+            total = idx.count(args.query, args.kind, args.fts)
+            hits = idx.search(args.query, args.limit, args.kind, args.fts)
+        print(f"[INFO] {total} matching records; showing {len(hits)}")
+        for h in hits:
+            snippet = h["snippet"].replace("\n", " ")
+            print(f"  {h['kind']:<5} {str(h['id']):>6} (line {h['line']})  "
+                  f"{h['score']:8.3f}  {snippet}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+source_manifest.py
+Per-file source manifest and result cache for incremental pipeline runs.
+
+For every source file the manifest records path, size, mtime and a SHA-256 of
+its text, next to a cached payload holding whatever the pipeline derived from
+that file (parsed OPS, anonymized blocks, ...). A file whose size and mtime
+are unchanged is trusted without being read; a file that was only touched is
+re-hashed and still served from cache. The whole cache is dropped when the
+pipeline's `fingerprint` (rules, patterns, cache layout) changes.
+
+Author: Hollow House Institute (HHI)
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+MANIFEST_NAME = "manifest.json"
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SourceManifest:
+    """Manifest of source files plus one cached payload per file under `cache_dir`."""
+
+    def __init__(self, cache_dir: Path, fingerprint: str):
+        self.cache_dir = cache_dir
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.extra: Dict[str, Any] = {}
+        self.changed = 0
+
+        path = cache_dir / MANIFEST_NAME
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"[WARN] Ignoring unreadable manifest {path}: {e}")
+                data = {}
+            if data.get("fingerprint") == fingerprint:
+                self.entries = data.get("files", {})
+                self.extra = data.get("extra", {})
+
+    def _payload_path(self, key: str) -> Path:
+        return self.cache_dir / "files" / (hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_payload(self, key: str) -> Optional[Any]:
+        try:
+            return json.loads(self._payload_path(key).read_text(encoding="utf-8"))
+        except Exception:
+            return None
+
+    def up_to_date(self, paths: Iterable[Path]) -> bool:
+        """True if `paths` is exactly the recorded file set with unchanged size and mtime."""
+        paths = list(paths)
+        if len(paths) != len(self.entries):
+            return False
+        for path in paths:
+            entry = self.entries.get(str(path))
+            if entry is None:
+                return False
+            st = path.stat()
+            if entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+                return False
+        return True
+
+    def lookup(self, path: Path, read) -> Tuple[Optional[Any], Optional[str]]:
+        """Return (cached payload, None) if `path` is unchanged, else (None, text).
+
+        `read(path)` is only called when the stat check is inconclusive; it returns
+        the file's text or None if the file cannot be read.
+        """
+        key = str(path)
+        st = path.stat()
+        entry = self.entries.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            payload = self._load_payload(key)
+            if payload is not None:
+                return payload, None
+
+        text = read(path)
+        if text is None:
+            return None, None
+        if entry and entry["sha256"] == text_sha256(text):
+            payload = self._load_payload(key)
+            if payload is not None:
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                return payload, None
+        return None, text
+
+    def store(self, path: Path, text: str, payload: Any) -> None:
+        """Cache `payload` as the result of processing `text` read from `path`."""
+        key = str(path)
+        st = path.stat()
+        target = self._payload_path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(target)
+        self.entries[key] = {
+            "path": key,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": text_sha256(text),
+        }
+        self.changed += 1
+
+    def prune(self, seen: Iterable[str]) -> int:
+        """Forget files that no longer exist; returns how many were dropped."""
+        keep = set(seen)
+        gone = [k for k in self.entries if k not in keep]
+        for key in gone:
+            del self.entries[key]
+            self._payload_path(key).unlink(missing_ok=True)
+        self.changed += len(gone)
+        return len(gone)
+
+    def save(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.cache_dir / MANIFEST_NAME
+        tmp = path.with_suffix(".tmp")
+        payload = {"fingerprint": self.fingerprint, "files": self.entries, "extra": self.extra}
+        tmp.write_text(json.dumps(payload, indent=4, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
@@ -0,0 +1,228 @@
+"""
+synth_codex_raw.py
+Seeded generator of synthetic codex_raw trees for benchmarks.
+
+Files look like the real sources: OPS ledgers ("■ Op N — Operation N" with
+field lines), Article laws ("Article IV — Law of ..."), teachings
+("Op #12 — Teaching: ... Summary: ..."), glyphs (■C626EB■, ⟦...⟧, 〈...〉,
+【...】) and prose paragraphs carrying PII the anonymizer targets (names,
+places, dates, phones, emails, pronouns, relations). A share of the files
+are lightly edited copies of earlier ones, the way the real corpus holds
+several exports of one ledger.
+
+Scale 1 is about the size of the real corpus (~550 KB); the tree for
+scale S holds S times as many bytes, rounded up to whole files. File i
+depends only on (seed, i), so a larger tree extends a smaller one with the
+same seed.
+
+    codex_raw/
+        synth_manifest.json     seed, scale, files, bytes (skip regeneration)
+        ledger_00000.txt ...
+
+Usage:
+    python synth_codex_raw.py <out_dir> [--scale 10] [--seed 17] [--file-kb 60]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+SEED = 17
+BASE_BYTES = 550_000        # scale 1 ~ the real codex_raw
+FILE_BYTES = 60_000
+DUPLICATE_RATE = 0.1        # share of files that are edited copies
+MANIFEST_NAME = "synth_manifest.json"
+GENERATOR_VERSION = 1
+
+FIELDS = {
+    "Planetary Tag": ["Pluto", "Venus", "Uranus", "Saturn", "Mars", "Neptune", "Moon", "Mercury"],
+    "Mode": ["Ami Node 7", "Mirror Node 3", "Flame Seat", "Grid Walker"],
+    "Type": ["Auto-Tagged", "Manual", "Witnessed"],
+    "Status": ["Collapsed & Witnessed", "Sealed", "Open", "Pending Witness"],
+    "System": ["Decoded via Symbolic Vector", "Mirror Scan", "Flame Ledger"],
+    "Phase": ["Running", "Complete", "Dormant"],
+    "Entry Style": ["Ledger Pulse", "Field Note", "Mirror Verdict"],
+    "Witness Layer": ["Mirror", "Flame", "Serpent", "Ancestor"],
+    "Node Check": ["Pre-Cleared", "Cleared", "Flagged"],
+    "Tag Density": ["High", "Medium", "Low"],
+    "Arc Lock": ["Affirmed", "Released", "Held"],
+    "Serpent Check": ["Engaged", "Passed", "Bypassed"],
+    "Numerology Gate": ["Active", "Closed"],
+    "Symbol Path": ["Spiral", "Grid", "Triangle", "Circle"],
+    "Flame Lock": ["Sealed", "Open", "Witnessed"],
+}
+NAMES = ["Amy", "Tez", "Montez", "Rex", "Brenda", "Floyd", "Eddie", "Justin", "Marisol", "Dana"]
+PLACES = ["Albuquerque", "Llano River", "Houston", "Lincoln", "Nebraska", "Texas", "New Mexico",
+          "Kansas City", "Arlington", "Bowen"]
+RELATIONS = ["mother", "father", "son", "daughter", "husband", "wife", "partner", "ex-husband"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+          "October", "November", "December"]
+ROMAN = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII", "XIII", "XIV",
+         "XV"]
+WORDS = ("flame witness mirror serpent ledger spiral grid node seal thread bloodline field body "
+         "sovereign collapse contract timeline ancestor hearth rest law glyph arc gate echo vector "
+         "release anchor pulse prophecy ritual temple codex resonance somatic lineage").split()
+TITLES = ["Witness Flame", "True Speech", "Body Sovereignty", "Right to Rest", "Line Sovereignty",
+          "Release", "Mirror Return", "Serpent Gate", "Timeline Spiral", "Hearth Keeping"]
+
+
+def _sentence(rng: random.Random, n: int = 0) -> str:
+    words = [rng.choice(WORDS) for _ in range(n or rng.randint(6, 16))]
+    return " ".join(words).capitalize() + "."
+
+
+def _pii_sentence(rng: random.Random) -> str:
+    name, place, rel = rng.choice(NAMES), rng.choice(PLACES), rng.choice(RELATIONS)
+    options = [
+        f"I met {name} in {place} on {rng.choice(MONTHS)} {rng.randint(1, 28)}, "
+        f"{rng.randint(1950, 2024)}.",
+        f"My {rel} {name} called from ({rng.randint(200, 999)}) {rng.randint(200, 999)}-"
+        f"{rng.randint(0, 9999):04d}.",
+        f"Logged {rng.randint(2000, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+        f"near {place}; I'm sure {name} saw it.",
+        f"Write to {name.lower()}.{rng.randint(1, 99)}@example.org before "
+        f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(1990, 2024)}.",
+        f"{name} and my {rel} crossed the {place} line; I've kept the record as mine.",
+    ]
+    return rng.choice(options)
+
+
+def _glyph(rng: random.Random) -> str:
+    code = "".join(rng.choice("0123456789ABCDEF") for _ in range(6))
+    return rng.choice([f"■{code}■", f"⟦{rng.choice(WORDS)} {code}⟧", f"〈{rng.choice(TITLES)}〉",
+                       f"【{rng.choice(WORDS)}】"])
+
+
+def _op(rng: random.Random, n: int) -> str:
+    lines = [f"■ Op {n:03d} — Operation {n:03d}", f" Glyph: {_glyph(rng)}",
+             f" Numeric Code: {n:03d}-{n * 7 % 1000:03d}"]
+    for label in rng.sample(sorted(FIELDS), rng.randint(6, len(FIELDS))):
+        lines.append(f" {label}: {rng.choice(FIELDS[label])}")
+    if rng.random() < 0.3:
+        lines.append(f" Summary: {_sentence(rng)} {_pii_sentence(rng)}")
+        lines.append(f" Codex Laws Applied: Article {rng.choice(ROMAN)} ({rng.choice(TITLES)})")
+    return "\n".join(lines)
+
+
+def _law(rng: random.Random, roman: str) -> str:
+    body = " ".join(_sentence(rng) for _ in range(rng.randint(2, 5)))
+    return f"Article {roman} — Law of {rng.choice(TITLES)}\n{body}"
+
+
+def _teaching(rng: random.Random, n: int) -> str:
+    return (f"Op #{n} — Teaching: {rng.choice(TITLES)} {rng.choice(WORDS).capitalize()}\n"
+            f"Summary: {_sentence(rng)}")
+
+
+def _paragraph(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(2, 6)):
+        r = rng.random()
+        if r < 0.25:
+            parts.append(_pii_sentence(rng))
+        elif r < 0.35:
+            parts.append(f"The {rng.choice(WORDS)} {_glyph(rng)} holds.")
+        else:
+            parts.append(_sentence(rng))
+    return " ".join(parts)
+
+
+def generate_file(seed: int, i: int, size: int = FILE_BYTES) -> str:
+    """Text of file i: runs of ops, laws, teachings and prose until ~size bytes."""
+    rng = random.Random(f"{seed}:{i}")
+    sections: List[str] = []
+    total = 0
+    op = rng.randint(1, 50)
+    while total < size:
+        kind = rng.random()
+        if kind < 0.45:
+            count = rng.randint(3, 20)
+            section = "\n".join(_op(rng, op + k) for k in range(count))
+            op += count
+        elif kind < 0.6:
+            start = rng.randrange(len(ROMAN))
+            section = "\n\n".join(_law(rng, r) for r in ROMAN[start:start + rng.randint(2, 6)])
+        elif kind < 0.7:
+            section = "\n".join(_teaching(rng, op + k) for k in range(rng.randint(2, 8)))
+        else:
+            section = "\n\n".join(_paragraph(rng) for _ in range(rng.randint(2, 8)))
+        sections.append(section)
+        total += len(section.encode("utf-8")) + 2
+    return "\n\n".join(sections) + "\n"
+
+
+def _edited_copy(text: str, rng: random.Random) -> str:
+    """Near-duplicate: a few paragraphs dropped or rewritten."""
+    paras = text.split("\n\n")
+    for _ in range(max(1, len(paras) // 50)):
+        j = rng.randrange(len(paras))
+        if rng.random() < 0.5:
+            paras[j] = _paragraph(rng)
+        else:
+            del paras[j]
+    return "\n\n".join(paras)
+
+
+def file_name(i: int) -> str:
+    return f"ledger_{i:05d}.txt"
+
+
+def generate_tree(out_dir: Path, scale: float = 1.0, seed: int = SEED,
+                  file_bytes: int = FILE_BYTES) -> Dict[str, Any]:
+    """Write a codex_raw tree of about scale * BASE_BYTES; reuse it if already generated."""
+    out_dir = Path(out_dir)
+    manifest_path = out_dir / MANIFEST_NAME
+    target = int(scale * BASE_BYTES)
+    wanted = {"generator": GENERATOR_VERSION, "seed": seed, "scale": scale,
+              "file_bytes": file_bytes}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if all(manifest.get(k) == v for k, v in wanted.items()):
+            return manifest
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for p in out_dir.glob("ledger_*.txt"):
+        p.unlink()
+    total = files = 0
+    while total < target:
+        rng = random.Random(f"{seed}:dup:{files}")
+        if files and rng.random() < DUPLICATE_RATE:
+            src = rng.randrange(files)
+            text = _edited_copy(generate_file(seed, src, file_bytes), rng)
+        else:
+            text = generate_file(seed, files, file_bytes)
+        data = text.encode("utf-8")
+        (out_dir / file_name(files)).write_bytes(data)
+        total += len(data)
+        files += 1
+
+    manifest = dict(wanted, files=files, bytes=total)
+    manifest_path.write_text(json.dumps(manifest, indent=4), encoding="utf-8")
+    return manifest
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic codex_raw tree")
+    parser.add_argument("out_dir", type=Path, help="codex_raw folder to write")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Size relative to the real corpus (~550 KB)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--file-kb", type=int, default=FILE_BYTES // 1000,
+                        help="Approximate size of each file")
+    args = parser.parse_args(argv)
+
+    m = generate_tree(args.out_dir, args.scale, args.seed, args.file_kb * 1000)
+    print(f"[OK] {args.out_dir}: {m['files']} files, {m['bytes'] / 1e6:.1f} MB "
+          f"(seed {m['seed']}, scale {m['scale']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+version_catalog.py
+SQLite catalog of every record in every HHI dataset version.
+
+One row per JSONL record of each version folder (data/processed/versions/v00*,
+the builder's data/processed/v1, v2, ...), keyed by (version, file, line) and
+carrying op_id, block index, uid, source and a record hash. Indexes on op_id,
+index and hash answer "op 434 in every version" or "which versions contain
+this block" without opening a single JSONL file.
+
+The record hash is BLAKE2b over the record with sorted keys, leaving out the
+positional block "index", so a block that only moved keeps its hash.
+
+The full pipeline adds each version as it is written; `rebuild` walks the
+existing folders (materialized, compacted or delta-encoded) and indexes the
+ones that are new or changed, so historical versions are covered too.
+`latest` is recorded as an alias of the version it points to.
+
+Usage:
+    python version_catalog.py rebuild  [--root data/processed] [--store DIR]
+    python version_catalog.py versions
+    python version_catalog.py op       <op_id> [--file NAME]
+    python version_catalog.py block    <index> --version V
+    python version_catalog.py hash     <record_hash>
+    python version_catalog.py counts   [--file NAME]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from jsonl_frames import iter_jsonl, iter_jsonl_chunks
+from record_index import INDEX_FILES
+from version_delta import VersionReader
+
+CATALOG_NAME = "catalog.sqlite"
+# {"version", "path"} beside latest/, replaced in one rename on every publish.
+LATEST_POINTER_NAME = "latest.json"
+# Fields left out of the record hash (positional, rewritten when records move).
+POSITIONAL_FIELDS = ("index",)
+JSONL_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+METADATA_NAMES = ("metadata.json", "version.json")
+BATCH_ROWS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    version      TEXT PRIMARY KEY,
+    path         TEXT NOT NULL,
+    content_hash TEXT,
+    generated_at TEXT,
+    signature    TEXT NOT NULL,
+    indexed_at   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias   TEXT PRIMARY KEY,
+    version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    version TEXT NOT NULL,
+    file    TEXT NOT NULL,
+    records INTEGER NOT NULL,
+    PRIMARY KEY (version, file)
+);
+CREATE TABLE IF NOT EXISTS records (
+    version     TEXT NOT NULL,
+    file        TEXT NOT NULL,
+    line        INTEGER NOT NULL,
+    op_id       TEXT,
+    idx         INTEGER,
+    uid         TEXT,
+    source      TEXT,
+    record_hash TEXT NOT NULL,
+    PRIMARY KEY (version, file, line)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS records_op
+    ON records (CAST(op_id AS INTEGER), version) WHERE op_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS records_idx ON records (idx, version) WHERE idx IS NOT NULL;
+CREATE INDEX IF NOT EXISTS records_hash ON records (record_hash, version);
+CREATE INDEX IF NOT EXISTS records_uid ON records (uid) WHERE uid IS NOT NULL;
+"""
+
+
+def record_hash(rec: Dict[str, Any]) -> str:
+    rec = {k: v for k, v in rec.items() if k not in POSITIONAL_FIELDS}
+    data = json.dumps(rec, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def is_record_file(name: str) -> bool:
+    if not name.endswith(JSONL_SUFFIXES):
+        return False
+    # Byte-offset sidecars (record_index.py) are not records.
+    return not any(name.endswith(f"_{kind}.jsonl") for kind in INDEX_FILES)
+
+
+def plain_name(name: str) -> str:
+    """blocks_anon.jsonl.gz -> blocks_anon.jsonl"""
+    return name.split(".jsonl")[0] + ".jsonl"
+
+
+def iter_file_records(reader: VersionReader, version_dir: Path,
+                      name: str) -> Iterator[Dict[str, Any]]:
+    """Records of one file of a version, streamed whether on disk, compacted or delta-encoded."""
+    path = version_dir / name
+    if path.exists():
+        yield from iter_jsonl(path)
+        return
+    # Store chunks are fetched, and deltas replayed, as the records are read.
+    yield from iter_jsonl_chunks(name, reader.iter_bytes(version_dir.name, name))
+
+
+def version_signature(reader: VersionReader, version_dir: Path) -> str:
+    """Changes whenever a version's metadata or file list does."""
+    h = hashlib.sha256()
+    for name in METADATA_NAMES:
+        p = version_dir / name
+        if p.exists():
+            h.update(p.read_bytes())
+    h.update(json.dumps(reader.file_names(version_dir.name)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _load_metadata(version_dir: Path) -> Dict[str, Any]:
+    for name in METADATA_NAMES:
+        p = version_dir / name
+        if p.exists():
+            return json.loads(p.read_text(encoding="utf-8"))
+    return {}
+
+
+def find_version_dirs(root: Path) -> List[Path]:
+    """Pipeline versions (root/versions/*) and builder versions (root/v1, root/v2, ...)."""
+    found = []
+    versions = root / "versions"
+    if versions.is_dir():
+        found += [p for p in sorted(versions.iterdir())
+                  if p.is_dir() and not p.name.startswith(".")]
+    found += [
+        p for p in sorted(root.iterdir())
+        if p.is_dir() and not p.is_symlink() and p.name[:1] == "v" and p.name[1:].isdigit()
+    ]
+    return found
+
+
+class VersionCatalog:
+    """Read/write access to a catalog.sqlite."""
+
+    def __init__(self, db_path: Path, store_dir: Optional[Path] = None):
+        self.db_path = Path(db_path)
+        self.store_dir = store_dir
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "VersionCatalog":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # ---------------- writing ----------------
+
+    def _reader(self, version_dir: Path) -> VersionReader:
+        return VersionReader(version_dir.parent, self.store_dir)
+
+    def is_current(self, version_dir: Path) -> bool:
+        row = self.conn.execute("SELECT signature FROM versions WHERE version = ?",
+                                (version_dir.name,)).fetchone()
+        if row is None:
+            return False
+        return row[0] == version_signature(self._reader(version_dir), version_dir)
+
+    def index_version(self, version_dir: Path) -> int:
+        """(Re)index one version folder; returns the number of records."""
+        version = version_dir.name
+        reader = self._reader(version_dir)
+        meta = _load_metadata(version_dir)
+        total = 0
+        with self.conn:
+            self.conn.execute("DELETE FROM records WHERE version = ?", (version,))
+            self.conn.execute("DELETE FROM files WHERE version = ?", (version,))
+            for name in reader.file_names(version):
+                if not is_record_file(name):
+                    continue
+                file = plain_name(name)
+                count = 0
+                batch: List[Tuple[Any, ...]] = []
+                for rec in iter_file_records(reader, version_dir, name):
+                    idx = rec.get("index")
+                    batch.append((
+                        version, file, count,
+                        None if rec.get("op_id") is None else str(rec["op_id"]),
+                        idx if isinstance(idx, int) else None,
+                        rec.get("uid"), rec.get("source") or rec.get("source_id"), record_hash(rec),
+                    ))
+                    count += 1
+                    if len(batch) >= BATCH_ROWS:
+                        self.conn.executemany("INSERT INTO records VALUES (?,?,?,?,?,?,?,?)", batch)
+                        batch = []
+                self.conn.executemany("INSERT INTO records VALUES (?,?,?,?,?,?,?,?)", batch)
+                self.conn.execute("INSERT INTO files VALUES (?,?,?)", (version, file, count))
+                total += count
+            self.conn.execute(
+                "INSERT OR REPLACE INTO versions VALUES (?,?,?,?,?,?)",
+                (version, str(version_dir), meta.get("content_hash"),
+                 meta.get("generated_at") or meta.get("generated_on"),
+                 version_signature(reader, version_dir), datetime.utcnow().isoformat() + "Z"),
+            )
+        return total
+
+    def set_alias(self, alias: str, version: str) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO aliases VALUES (?,?)", (alias, version))
+
+    def drop_version(self, version: str) -> None:
+        with self.conn:
+            for table in ("records", "files", "versions"):
+                self.conn.execute(f"DELETE FROM {table} WHERE version = ?", (version,))
+            self.conn.execute("DELETE FROM aliases WHERE version = ?", (version,))
+
+    def rebuild(self, root: Path) -> Dict[str, int]:
+        """Index new/changed version folders under `root`, drop vanished ones."""
+        stats = {"indexed": 0, "unchanged": 0, "dropped": 0}
+        dirs = find_version_dirs(root)
+        for vdir in dirs:
+            if self.is_current(vdir):
+                stats["unchanged"] += 1
+                continue
+            n = self.index_version(vdir)
+            print(f"[OK] Indexed {vdir.name} — {n} records")
+            stats["indexed"] += 1
+
+        names = {p.name for p in dirs}
+        for (version,) in self.conn.execute("SELECT version FROM versions").fetchall():
+            if version not in names:
+                self.drop_version(version)
+                stats["dropped"] += 1
+
+        latest = root / "latest"
+        if latest.exists():
+            target = self._latest_target(latest, dirs)
+            if target:
+                self.set_alias("latest", target)
+            else:
+                # A folder that matches no version (legacy copy): index it on its own.
+                if not self.is_current(latest):
+                    print(f"[OK] Indexed latest — {self.index_version(latest)} records")
+                    stats["indexed"] += 1
+        return stats
+
+    @staticmethod
+    def _latest_target(latest: Path, dirs: List[Path]) -> Optional[str]:
+        pointer = latest.with_name(LATEST_POINTER_NAME)
+        if pointer.exists():
+            return json.loads(pointer.read_text(encoding="utf-8")).get("version")
+        if latest.is_symlink():
+            return latest.resolve().name
+        content_hash = _load_metadata(latest).get("content_hash")
+        for vdir in reversed(dirs):
+            if content_hash and _load_metadata(vdir).get("content_hash") == content_hash:
+                return vdir.name
+        return None
+
+    # ---------------- queries ----------------
+
+    def resolve(self, version: str) -> str:
+        row = self.conn.execute("SELECT version FROM aliases WHERE alias = ?",
+                                (version,)).fetchone()
+        return row[0] if row else version
+
+    def versions(self) -> List[Tuple[Any, ...]]:
+        return self.conn.execute(
+            "SELECT v.version, v.generated_at, v.content_hash, COALESCE(SUM(f.records), 0) "
+            "FROM versions v LEFT JOIN files f USING (version) "
+            "GROUP BY v.version ORDER BY v.version"
+        ).fetchall()
+
+    def find_op(self, op_id: str, file: Optional[str] = None) -> List[Tuple[Any, ...]]:
+        """Every record of an op ("17" and "017" alike); ValueError if `op_id` is no number."""
+        try:
+            number = int(op_id)
+        except ValueError:
+            raise ValueError(f"op id must be a number, got {op_id!r}") from None
+        sql = ("SELECT version, file, line, op_id, source, record_hash FROM records "
+               "WHERE CAST(op_id AS INTEGER) = ? AND op_id IS NOT NULL")
+        params: List[Any] = [number]
+        if file:
+            sql += " AND file = ?"
+            params.append(file)
+        return self.conn.execute(sql + " ORDER BY version, file, line", params).fetchall()
+
+    def find_hash(self, digest: str) -> List[Tuple[Any, ...]]:
+        return self.conn.execute(
+            "SELECT version, file, line, idx FROM records WHERE record_hash = ? "
+            "ORDER BY version, file, line",
+            (digest,),
+        ).fetchall()
+
+    def block_hash(self, version: str, index: int) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT record_hash FROM records WHERE idx = ? AND version = ?",
+            (index, self.resolve(version)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def counts(self, file: Optional[str] = None) -> List[Tuple[Any, ...]]:
+        sql = "SELECT version, file, records FROM files"
+        params: List[Any] = []
+        if file:
+            sql += " WHERE file = ?"
+            params.append(file)
+        return self.conn.execute(sql + " ORDER BY version, file", params).fetchall()
+
+
+def _print_rows(header: List[str], rows: List[Tuple[Any, ...]], started: float) -> None:
+    print("\t".join(header))
+    for row in rows:
+        print("\t".join("" if v is None else str(v) for v in row))
+    print(f"[INFO] {len(rows)} rows ({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HHI cross-version record catalog")
+    parser.add_argument("--root", type=Path, default=Path("data/processed"),
+                        help="Processed data root (holds versions/, v1, v2, latest)")
+    parser.add_argument("--db", type=Path, default=None,
+                        help=f"Catalog path (default: <root>/{CATALOG_NAME})")
+    parser.add_argument("--store", type=Path, default=None,
+                        help="Object store for compacted versions")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("rebuild", help="Index new or changed version folders")
+    sub.add_parser("versions", help="List catalogued versions")
+    p = sub.add_parser("op", help="An op in every version")
+    p.add_argument("op_id")
+    p.add_argument("--file", default=None)
+    p = sub.add_parser("block", help="Versions containing a block (by content)")
+    p.add_argument("index", type=int)
+    p.add_argument("--version", required=True)
+    p = sub.add_parser("hash", help="Every occurrence of a record hash")
+    p.add_argument("digest")
+    p = sub.add_parser("counts", help="Record counts per version and file")
+    p.add_argument("--file", default=None)
+
+    args = parser.parse_args(argv)
+    store = args.store or (args.root / "store")
+    db = args.db or args.root / CATALOG_NAME
+
+    with VersionCatalog(db, store if store.exists() else None) as cat:
+        started = time.perf_counter()
+        if args.cmd == "rebuild":
+            stats = cat.rebuild(args.root)
+            print(f"[OK] Catalog {db}: {stats['indexed']} indexed, {stats['unchanged']} unchanged, "
+                  f"{stats['dropped']} dropped")
+        elif args.cmd == "versions":
+            _print_rows(["version", "generated_at", "content_hash", "records"], cat.versions(),
+                        started)
+        elif args.cmd == "op":
+            try:
+                rows = cat.find_op(args.op_id, args.file)
+            except ValueError as e:
+                print(f"[WARN] {e}")
+                return
+            _print_rows(["version", "file", "line", "op_id", "source", "record_hash"], rows,
+                        started)
+        elif args.cmd == "block":
+            digest = cat.block_hash(args.version, args.index)
+            if digest is None:
+                print(f"[WARN] No block {args.index} in {args.version}")
+                return
+            print(f"[INFO] Block {args.index} of {args.version}: {digest}")
+            _print_rows(["version", "file", "line", "index"], cat.find_hash(digest), started)
+        elif args.cmd == "hash":
+            _print_rows(["version", "file", "line", "index"], cat.find_hash(args.digest), started)
+        elif args.cmd == "counts":
+            _print_rows(["version", "file", "records"], cat.counts(args.file), started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+version_delta.py
+Record-level delta encoding for versioned HHI outputs.
+
+A delta version stores, per file, how to rebuild it from its parent (the
+previous version folder): runs of parent records to copy plus the records
+that are new. Records are matched by a stable hash of their content, so a
+record that moved or was merely renumbered is still copied. A positional
+field such as the blocks' global "index" is left out of the hash and
+rewritten on reconstruct ("renumber").
+
+Every SNAPSHOT_INTERVAL links the chain is cut by a full snapshot (a
+materialized folder or an object-store compaction, see object_store.py), so
+rebuilding any version replays at most that many deltas. Reads stream:
+snapshot chunks are fetched one at a time and each delta is replayed over
+its parent's lines as they arrive; a delta that copies a parent range it
+has already passed (a moved record) reads it back from a spill file.
+
+A delta version keeps metadata.json and delta.json.gz on disk; version
+folder names and numbering are untouched.
+
+Usage:
+    python version_delta.py encode      <versions_dir> <version> [--store DIR]
+    python version_delta.py materialize <versions_dir> <version> [--store DIR] [--dest DIR]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import tempfile
+from array import array
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from object_store import STORE_MANIFEST_NAME, ObjectStore
+
+DELTA_NAME = "delta.json.gz"
+# Maximum number of deltas between two full snapshots.
+SNAPSHOT_INTERVAL = 10
+# Files kept on disk next to the delta.
+KEEP_MATERIALIZED = ("metadata.json",)
+# Read size for materialized files.
+READ_BYTES = 1024 * 1024
+
+
+def is_delta(version_dir: Path) -> bool:
+    return (version_dir / DELTA_NAME).exists()
+
+
+def load_delta(version_dir: Path) -> Dict[str, Any]:
+    with gzip.open(version_dir / DELTA_NAME, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def split_lines(data: bytes) -> List[str]:
+    """Split on "\\n" only (records may contain U+2028 and friends), keeping ends."""
+    parts = data.decode("utf-8").split("\n")
+    lines = [part + "\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def iter_split_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """split_lines over a file given as a stream of byte chunks."""
+    rest = b""
+    for chunk in chunks:
+        parts = (rest + chunk).split(b"\n")
+        rest = parts.pop()
+        for part in parts:
+            yield part.decode("utf-8") + "\n"
+    if rest:
+        yield rest.decode("utf-8")
+
+
+def _read_blocks(path: Path) -> Iterator[bytes]:
+    with path.open("rb") as f:
+        yield from iter(lambda: f.read(READ_BYTES), b"")
+
+
+def _record_key(line: str, renumber: Optional[str]) -> bytes:
+    if renumber:
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            rec = None
+        if isinstance(rec, dict):
+            rec.pop(renumber, None)
+            line = json.dumps(rec, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(line.encode("utf-8"), digest_size=16).digest()
+
+
+def _renumber(line: str, field: str, position: int) -> str:
+    rec = json.loads(line)
+    if rec.get(field) == position:
+        return line
+    rec[field] = position
+    return json.dumps(rec, ensure_ascii=False) + "\n"
+
+
+class VersionReader:
+    """Read any version's files, whether materialized, compacted or delta-encoded."""
+
+    def __init__(self, versions_dir: Path, store_dir: Optional[Path] = None):
+        self.versions_dir = versions_dir
+        self.store = ObjectStore(store_dir) if store_dir else None
+
+    def versions(self) -> List[str]:
+        return sorted(p.name for p in self.versions_dir.iterdir()
+                      if p.is_dir() and not p.name.startswith("."))
+
+    def parent_of(self, version: str) -> Optional[str]:
+        names = self.versions()
+        i = names.index(version)
+        return names[i - 1] if i > 0 else None
+
+    def depth(self, version: str) -> int:
+        """Number of deltas replayed to rebuild `version` (0 for a snapshot)."""
+        vdir = self.versions_dir / version
+        return load_delta(vdir)["depth"] if is_delta(vdir) else 0
+
+    def file_names(self, version: str) -> List[str]:
+        vdir = self.versions_dir / version
+        names = {p.name for p in vdir.iterdir() if p.is_file()}
+        if (vdir / STORE_MANIFEST_NAME).exists():
+            manifest = json.loads((vdir / STORE_MANIFEST_NAME).read_text(encoding="utf-8"))
+            names |= set(manifest["files"])
+        if is_delta(vdir):
+            names |= set(load_delta(vdir)["files"])
+        return sorted(names - {STORE_MANIFEST_NAME, DELTA_NAME})
+
+    def _snapshot_chunks(self, version: str, name: str) -> Optional[Iterator[bytes]]:
+        """The bytes of a materialized or compacted file, lazily; None if neither."""
+        vdir = self.versions_dir / version
+        path = vdir / name
+        if path.exists():
+            return _read_blocks(path)
+        manifest_path = vdir / STORE_MANIFEST_NAME
+        if self.store and manifest_path.exists():
+            entry = json.loads(manifest_path.read_text(encoding="utf-8"))["files"].get(name)
+            if entry:
+                return (self.store.get(d) for d in entry["chunks"])
+        return None
+
+    def iter_lines(self, version: str, name: str) -> Iterator[str]:
+        """Stream the lines of `name` in `version`, replaying the delta chain."""
+        chain = []
+        v = version
+        chunks = self._snapshot_chunks(v, name)
+        while chunks is None:
+            vdir = self.versions_dir / v
+            if not is_delta(vdir):
+                raise FileNotFoundError(f"{name} not found in {vdir}")
+            delta = load_delta(vdir)
+            if name not in delta["files"]:
+                raise FileNotFoundError(f"{name} not found in {vdir}")
+            entry = delta["files"][name]
+            chain.append(entry)
+            if entry.get("new_file"):
+                chunks = iter(())  # encoded against an empty parent
+                break
+            v = delta["parent"]
+            chunks = self._snapshot_chunks(v, name)
+
+        lines = iter_split_lines(chunks)
+        for entry in reversed(chain):
+            lines = iter_delta(lines, entry)
+        return lines
+
+    def read_lines(self, version: str, name: str) -> List[str]:
+        """Return the lines of `name` in `version`, replaying the delta chain."""
+        return list(self.iter_lines(version, name))
+
+    def iter_bytes(self, version: str, name: str) -> Iterator[bytes]:
+        """Stream the exact bytes of `name` in `version` (compressed files stay compressed)."""
+        chunks = self._snapshot_chunks(version, name)
+        if chunks is None:
+            chunks = (line.encode("utf-8") for line in self.iter_lines(version, name))
+        return chunks
+
+    def read_bytes(self, version: str, name: str) -> bytes:
+        """The exact bytes of `name` in `version` (compressed files stay compressed)."""
+        return b"".join(self.iter_bytes(version, name))
+
+    def iter_records(self, version: str, name: str) -> Iterator[Dict[str, Any]]:
+        for line in self.iter_lines(version, name):
+            if line.strip():
+                yield json.loads(line)
+
+    def materialize(self, version: str, dest: Path) -> Path:
+        dest.mkdir(parents=True, exist_ok=True)
+        for name in self.file_names(version):
+            # Snapshot files are copied as-is (they may be compressed, not text).
+            with (dest / name).open("wb") as f:
+                for chunk in self.iter_bytes(version, name):
+                    f.write(chunk)
+        return dest
+
+
+def diff_lines(parent: List[str], child: List[str],
+               renumber: Optional[str] = None) -> Dict[str, Any]:
+    """Encode `child` as copy runs of `parent` plus inserted lines."""
+    positions: Dict[bytes, List[int]] = {}
+    parent_keys = [_record_key(line, renumber) for line in parent]
+    for i, key in enumerate(parent_keys):
+        positions.setdefault(key, []).append(i)
+
+    ops: List[List[Any]] = []
+    used = bytearray(len(parent))
+    inserted = 0
+    for line in child:
+        key = _record_key(line, renumber)
+        last = ops[-1] if ops else [None]
+        follow = last[1] + last[2] if last[0] == "c" else len(parent)
+        if follow < len(parent) and parent_keys[follow] == key:
+            used[follow] = 1
+            last[2] += 1
+        elif key in positions:
+            start = positions[key][0]
+            used[start] = 1
+            ops.append(["c", start, 1])
+        elif last[0] == "i":
+            last[1].append(line)
+            inserted += 1
+        else:
+            ops.append(["i", [line]])
+            inserted += 1
+    return {
+        "renumber": renumber,
+        "ops": ops,
+        "stats": {
+            "copied": len(child) - inserted,
+            "inserted": inserted,
+            "deleted": len(parent) - sum(used),
+        },
+    }
+
+
+def apply_delta(parent: List[str], entry: Dict[str, Any]) -> List[str]:
+    renumber = entry.get("renumber")
+    out: List[str] = []
+    for op in entry["ops"]:
+        if op[0] == "c":
+            out.extend(parent[op[1]:op[1] + op[2]])
+        else:
+            out.extend(op[1])
+    if renumber:
+        out = [_renumber(line, renumber, i) if line.strip() else line for i, line in enumerate(out)]
+    return out
+
+
+class _ParentLines:
+    """A parent's lines, pulled as copy runs reach them.
+
+    With `spill`, every line read is also appended to a temp file (offsets
+    kept as ints), so a run that starts behind the read position is served
+    from there.
+    """
+
+    def __init__(self, lines: Iterator[str], spill: bool):
+        self.lines = lines
+        self.pos = 0
+        self.spill = tempfile.TemporaryFile() if spill else None
+        self.offsets = array("q", [0])
+
+    def _pull(self, count: int) -> Iterator[str]:
+        for line in islice(self.lines, count):
+            self.pos += 1
+            if self.spill is not None:
+                data = line.encode("utf-8")
+                self.spill.seek(self.offsets[-1])
+                self.spill.write(data)
+                self.offsets.append(self.offsets[-1] + len(data))
+            yield line
+
+    def take(self, start: int, count: int) -> Iterator[str]:
+        """Lines [start, start + count), like parent[start:start + count]."""
+        end = start + count
+        for i in range(start, min(end, self.pos)):
+            self.spill.seek(self.offsets[i])
+            yield self.spill.read(self.offsets[i + 1] - self.offsets[i]).decode("utf-8")
+        start = max(start, self.pos)
+        for _ in self._pull(start - self.pos):
+            pass
+        yield from self._pull(max(end - start, 0))
+
+    def close(self) -> None:
+        if self.spill is not None:
+            self.spill.close()
+
+
+def _copies_backwards(ops: List[List[Any]]) -> bool:
+    """True if a copy run starts before the end of an earlier one."""
+    end = 0
+    for op in ops:
+        if op[0] == "c":
+            if op[1] < end:
+                return True
+            end = op[1] + op[2]
+    return False
+
+
+def iter_delta(parent: Iterable[str], entry: Dict[str, Any]) -> Iterator[str]:
+    """apply_delta over a stream of parent lines, yielding the child's lines."""
+    renumber = entry.get("renumber")
+    source = _ParentLines(iter(parent), _copies_backwards(entry["ops"]))
+    try:
+        i = 0
+        for op in entry["ops"]:
+            for line in source.take(op[1], op[2]) if op[0] == "c" else op[1]:
+                yield _renumber(line, renumber, i) if renumber and line.strip() else line
+                i += 1
+    finally:
+        source.close()
+
+
+def encode_version(reader: VersionReader, version: str,
+                   renumber: Optional[Dict[str, str]] = None,
+                   derived: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+    """Replace a materialized version's files by a delta against its parent.
+
+    `derived` names files rebuildable from the records (search indexes);
+    they are deleted instead of encoded.
+
+    Returns the per-file stats, or None when the version should stay a
+    snapshot: no parent, the chain is SNAPSHOT_INTERVAL long, a file is not
+    UTF-8 text (compressed output), or a file does not rebuild byte for byte.
+    """
+    renumber = renumber or {}
+    derived = set(derived)
+    vdir = reader.versions_dir / version
+    parent = reader.parent_of(version)
+    if parent is None or is_delta(vdir):
+        return None
+    depth = reader.depth(parent) + 1
+    if depth > SNAPSHOT_INTERVAL:
+        return None
+
+    files = {}
+    for p in sorted(vdir.iterdir()):
+        if not p.is_file() or p.name in KEEP_MATERIALIZED or p.name in derived:
+            continue
+        data = p.read_bytes()
+        try:
+            child = split_lines(data)
+        except UnicodeDecodeError:
+            return None
+        new_file = False
+        try:
+            parent_lines = reader.read_lines(parent, p.name)
+        except FileNotFoundError:
+            parent_lines, new_file = [], True
+        entry = diff_lines(parent_lines, child, renumber.get(p.name))
+        if new_file:
+            entry["new_file"] = True
+        if "".join(apply_delta(parent_lines, entry)).encode("utf-8") != data:
+            return None
+        entry["sha256"] = hashlib.sha256(data).hexdigest()
+        files[p.name] = entry
+
+    tmp = vdir / (DELTA_NAME + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump({"parent": parent, "depth": depth, "files": files}, f, ensure_ascii=False)
+    tmp.replace(vdir / DELTA_NAME)
+    for name in files:
+        (vdir / name).unlink()
+    for name in derived:
+        (vdir / name).unlink(missing_ok=True)
+    return {name: entry["stats"] for name, entry in files.items()}
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HHI record-level version deltas")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("encode", help="Store a materialized version as a delta")
+    p.add_argument("versions_dir", type=Path)
+    p.add_argument("version")
+    p.add_argument("--store", type=Path, default=None)
+    p.add_argument("--renumber", action="append", default=[], metavar="FILE=FIELD",
+                   help='Positional field left out of matching, e.g. "blocks_anon.jsonl=index"')
+
+    p = sub.add_parser("materialize", help="Rebuild any version into a folder")
+    p.add_argument("versions_dir", type=Path)
+    p.add_argument("version")
+    p.add_argument("--store", type=Path, default=None)
+    p.add_argument("--dest", type=Path, required=True)
+
+    args = parser.parse_args(argv)
+    reader = VersionReader(args.versions_dir, args.store)
+
+    if args.cmd == "encode":
+        renumber = dict(item.split("=", 1) for item in args.renumber)
+        stats = encode_version(reader, args.version, renumber)
+        if stats is None:
+            print(f"[WARN] {args.version} kept as a full snapshot")
+        for name, s in (stats or {}).items():
+            print(f"[OK] {name}: {s['copied']} copied, {s['inserted']} inserted, "
+                  f"{s['deleted']} deleted")
+    elif args.cmd == "materialize":
+        dest = reader.materialize(args.version, args.dest)
+        print(f"[OK] Materialized {args.version} -> {dest}")
+
+
+if __name__ == "__main__":
+    main()
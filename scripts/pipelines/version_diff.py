@@ -0,0 +1,335 @@
+"""
+version_diff.py
+Record-level diff between two dataset versions, plus a changelog.
+
+Every record is hashed once (the catalog's record hash: sorted keys, block
+"index" left out) and classified as
+
+    unchanged  same content, same relative order
+    moved      same content, relative order changed
+    modified   content changed, same identity: (source, op_id) for ops,
+               the n-th unmatched block of a source for blocks
+    added / removed
+
+Both versions are streamed (compacted and delta-encoded ones too, see
+version_delta.py). Record fingerprints are spilled to BUCKETS temp files by
+hash, each bucket is matched in memory (a partitioned hash join), then
+unmatched records are re-partitioned by identity to pair modifications.
+Moves are the matched records outside a longest increasing subsequence of
+new positions. Change rows are spilled by position and sorted a bucket at a
+time. Memory is bounded by the largest bucket plus a few ints per record of
+the largest file and SPILL_BUFFER_BYTES per spill; time is O(n log n).
+
+Outputs (in --out):
+
+    changes_<old>_<new>.jsonl   one line per added/removed/modified/moved record
+    CHANGELOG_<new>.json        counts per file and per source (machine-readable)
+    CHANGELOG_<new>.md          the same, in the style of CHANGELOG_v1.md
+
+Usage:
+    python version_diff.py <old_version_dir> <new_version_dir> [--store DIR] [--out DIR]
+
+Author: Hollow House Institute (HHI)
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import tempfile
+from array import array
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from version_catalog import (POSITIONAL_FIELDS, is_record_file, iter_file_records, plain_name,
+                             record_hash)
+from version_delta import VersionReader
+
+CHANGELOG_FORMAT = "hhi-changelog-1"
+# Spill partitions; each holds about 1/BUCKETS of both versions' fingerprints.
+BUCKETS = 64
+# Rows a spill buffers before appending them to its bucket files. A file is
+# only open while a batch is appended, so several spills never hold
+# BUCKETS handles each.
+SPILL_BUFFER_BYTES = 4 << 20
+CHANGE_KINDS = ("added", "removed", "modified", "moved")
+
+
+def _field_digest(value: Any) -> str:
+    # Strings (nearly every field) skip the JSON encoder; the prefix keeps
+    # "1" and 1 apart.
+    if isinstance(value, str):
+        data = b"s" + value.encode("utf-8", "surrogatepass")
+    else:
+        data = b"j" + json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=4).hexdigest()
+
+
+def _identity(rec: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """(source, op_id); op ids restart in every ledger, so both are needed."""
+    source = str(rec.get("source") or rec.get("source_id") or "")
+    op_id = rec.get("op_id")
+    return source, None if op_id is None else str(op_id)
+
+
+class _Partitions:
+    """BUCKETS append-only JSONL spill files in a temp dir, written in batches."""
+
+    def __init__(self, root: Path, prefix: str):
+        self.paths = [root / f"{prefix}{i:02d}.jsonl" for i in range(BUCKETS)]
+        self.pending: List[List[str]] = [[] for _ in range(BUCKETS)]
+        self.pending_size = 0
+
+    def add(self, bucket: int, row: Any) -> None:
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        self.pending[bucket % BUCKETS].append(line)
+        self.pending_size += len(line)
+        if self.pending_size >= SPILL_BUFFER_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the buffered rows to their files (one file open at a time)."""
+        for p, lines in zip(self.paths, self.pending):
+            if lines:
+                with p.open("a", encoding="utf-8") as f:
+                    f.writelines(lines)
+                lines.clear()
+        self.pending_size = 0
+
+    def __iter__(self) -> Iterator[List[Any]]:
+        self.flush()
+        for p in self.paths:
+            if not p.exists():
+                yield []
+                continue
+            with p.open("r", encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f]
+            p.unlink()
+            yield rows
+
+
+def _version_files(reader: VersionReader, version_dir: Path) -> Dict[str, str]:
+    """plain name -> stored name, for every record file of a version."""
+    return {plain_name(n): n for n in reader.file_names(version_dir.name) if is_record_file(n)}
+
+
+def _longest_increasing(values: Sequence[int]) -> bytearray:
+    """Mark the members of one longest strictly increasing subsequence.
+
+    Negative values are holes: never part of it.
+    """
+    tails: List[int] = []       # tails[k] = value ending the best run of length k+1
+    tail_at: List[int] = []     # index into `values` of that tail
+    prev = array("q", [-1]) * len(values)
+    for i, v in enumerate(values):
+        if v < 0:
+            continue
+        k = bisect.bisect_left(tails, v)
+        if k == len(tails):
+            tails.append(v)
+            tail_at.append(i)
+        else:
+            tails[k] = v
+            tail_at[k] = i
+        prev[i] = tail_at[k - 1] if k else -1
+    keep = bytearray(len(values))
+    i = tail_at[-1] if tail_at else -1
+    while i >= 0:
+        keep[i] = 1
+        i = prev[i]
+    return keep
+
+
+def diff_versions(old_dir: Path, new_dir: Path, store_dir: Optional[Path] = None,
+                  out: Optional[TextIO] = None) -> Dict[str, Any]:
+    """Return {"files": {name: counts}, "sources": {...}, "changes": n}.
+
+    The change rows are written to `out` as JSONL, ordered by file and line.
+    """
+    sides = [(0, old_dir), (1, new_dir)]
+    files: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(
+        ("old_records", "new_records", "unchanged") + CHANGE_KINDS, 0))
+    per_source: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(CHANGE_KINDS, 0))
+
+    with tempfile.TemporaryDirectory(prefix="hhi_diff_") as tmp:
+        by_hash = _Partitions(Path(tmp), "h")
+        # 1) Stream both versions into hash partitions.
+        for side, vdir in sides:
+            reader = VersionReader(vdir.parent, store_dir)
+            for file, stored in _version_files(reader, vdir).items():
+                count_key = "new_records" if side else "old_records"
+                for pos, rec in enumerate(iter_file_records(reader, vdir, stored)):
+                    digest = record_hash(rec)
+                    fields = {k: _field_digest(v) for k, v in rec.items()
+                              if k not in POSITIONAL_FIELDS}
+                    row = [digest, side, file, pos, *_identity(rec), fields]
+                    by_hash.add(int(digest[:8], 16), row)
+                    files[file][count_key] += 1
+
+        # Change rows are range-partitioned on (file, line), so reading the
+        # buckets in order and sorting each one sorts them all.
+        base: Dict[str, int] = {}
+        total = 0
+        for file in sorted(files):
+            base[file] = total
+            total += max(files[file]["old_records"], files[file]["new_records"])
+        by_line = _Partitions(Path(tmp), "c")
+
+        def add_change(change: Dict[str, Any]) -> None:
+            files[change["file"]][change["change"]] += 1
+            per_source[change["source"]][change["change"]] += 1
+            line = change["new_line"] if change["new_line"] is not None else change["old_line"]
+            by_line.add((base[change["file"]] + line) * BUCKETS // max(total, 1), change)
+
+        # 2) Match identical records bucket by bucket; spill the rest by identity.
+        # new_at[file][old_pos] = new position of a matched record, -1 if unmatched.
+        new_at = {file: array("q", [-1]) * c["old_records"] for file, c in files.items()}
+        by_match = _Partitions(Path(tmp), "m")
+        by_identity = _Partitions(Path(tmp), "k")
+        for rows in by_hash:
+            groups: Dict[Tuple[str, str], List[List[List[Any]]]] = defaultdict(lambda: [[], []])
+            for row in rows:
+                groups[(row[2], row[0])][row[1]].append(row)
+            for (file, _), (old, new) in groups.items():
+                old.sort(key=lambda r: r[3])
+                new.sort(key=lambda r: r[3])
+                for a, b in zip(old, new):
+                    new_at[file][a[3]] = b[3]
+                    by_match.add(a[3], [file, a[3], b[3], b[4], b[5]])
+                for row in old[len(new):] + new[len(old):]:
+                    key = hashlib.blake2b(f"{row[2]}\0{row[4]}\0{row[5]}".encode("utf-8"),
+                                          digest_size=4)
+                    by_identity.add(int(key.hexdigest(), 16), row)
+
+        # 3) Same identity, different content: modified; leftovers added/removed.
+        for rows in by_identity:
+            groups2: Dict[Tuple[str, str, Optional[str]], List[List[List[Any]]]] = \
+                defaultdict(lambda: [[], []])
+            for row in rows:
+                groups2[(row[2], row[4], row[5])][row[1]].append(row)
+            for (file, source, ident), (old, new) in groups2.items():
+                old.sort(key=lambda r: r[3])
+                new.sort(key=lambda r: r[3])
+                for a, b in zip(old, new):
+                    fa, fb = a[6], b[6]
+                    changed = sorted(k for k in set(fa) | set(fb) if fa.get(k) != fb.get(k))
+                    add_change({"change": "modified", "file": file, "source": source,
+                                "op_id": ident, "old_line": a[3], "new_line": b[3],
+                                "fields": changed})
+                for a in old[len(new):]:
+                    add_change({"change": "removed", "file": file, "source": source,
+                                "op_id": ident, "old_line": a[3], "new_line": None})
+                for b in new[len(old):]:
+                    add_change({"change": "added", "file": file, "source": source,
+                                "op_id": ident, "old_line": None, "new_line": b[3]})
+
+        # 4) Moves: matched records outside the longest in-order run.
+        in_order = {file: _longest_increasing(new_at.pop(file)) for file in list(new_at)}
+        for rows in by_match:
+            for file, a_pos, b_pos, source, ident in rows:
+                if in_order[file][a_pos]:
+                    files[file]["unchanged"] += 1
+                else:
+                    add_change({"change": "moved", "file": file, "source": source,
+                                "op_id": ident, "old_line": a_pos, "new_line": b_pos})
+
+        # 5) Write the change rows in order.
+        if out is not None:
+            for rows in by_line:
+                rows.sort(key=lambda c: (c["file"], c["new_line"] if c["new_line"] is not None
+                                         else c["old_line"], c["change"]))
+                for c in rows:
+                    out.write(json.dumps(c, ensure_ascii=False) + "\n")
+
+    return {
+        "files": dict(sorted(files.items())),
+        "sources": dict(sorted(per_source.items())),
+        "changes": sum(c[k] for c in files.values() for k in CHANGE_KINDS),
+    }
+
+
+def _metadata(version_dir: Path) -> Dict[str, Any]:
+    for name in ("metadata.json", "version.json"):
+        p = version_dir / name
+        if p.exists():
+            return json.loads(p.read_text(encoding="utf-8"))
+    return {}
+
+
+def _markdown(summary: Dict[str, Any]) -> str:
+    lines = [
+        f"# HHI Dataset Changelog — {summary['new']}",
+        "",
+        f"Generated on: {summary['generated_at']}",
+        f"Compared with: {summary['old']}",
+        "",
+        "## Files",
+        "| File | Records | Unchanged | Added | Removed | Modified | Moved |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for name, c in summary["files"].items():
+        lines.append(f"| {name} | {c['old_records']} → {c['new_records']} | {c['unchanged']} | "
+                     f"{c['added']} | {c['removed']} | {c['modified']} | {c['moved']} |")
+    if summary["sources"]:
+        lines += ["", "## Changed Sources"]
+        for source, c in summary["sources"].items():
+            parts = ", ".join(f"{c[k]} {k}" for k in CHANGE_KINDS if c[k])
+            lines.append(f"- {source or '(no source)'}: {parts}")
+    lines += ["", "## Notes", f"Record-level details: {summary['changes']}", ""]
+    return "\n".join(lines)
+
+
+def write_changelog(old_dir: Path, new_dir: Path, out_dir: Path,
+                    store_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """Diff two versions and write changes_*.jsonl, CHANGELOG_<new>.json/.md into `out_dir`."""
+    old_meta, new_meta = _metadata(old_dir), _metadata(new_dir)
+    old = old_meta.get("version") or old_meta.get("dataset_version") or old_dir.name
+    new = new_meta.get("version") or new_meta.get("dataset_version") or new_dir.name
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    changes_name = f"changes_{old}_{new}.jsonl"
+    with (out_dir / changes_name).open("w", encoding="utf-8") as f:
+        result = diff_versions(old_dir, new_dir, store_dir, f)
+
+    summary = {
+        "format": CHANGELOG_FORMAT,
+        "old": old,
+        "new": new,
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "old_content_hash": old_meta.get("content_hash"),
+        "new_content_hash": new_meta.get("content_hash"),
+        "files": result["files"],
+        "sources": result["sources"],
+        "changes": changes_name,
+    }
+    (out_dir / f"CHANGELOG_{new}.json").write_text(
+        json.dumps(summary, indent=4, ensure_ascii=False), encoding="utf-8")
+    (out_dir / f"CHANGELOG_{new}.md").write_text(_markdown(summary), encoding="utf-8")
+    return summary
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Record-level diff between two HHI dataset versions")
+    parser.add_argument("old", type=Path, help="Older version folder")
+    parser.add_argument("new", type=Path, help="Newer version folder")
+    parser.add_argument("--store", type=Path, default=None,
+                        help="Object store for compacted versions")
+    parser.add_argument("--out", type=Path, default=Path("."), help="Where to write the changelog")
+    args = parser.parse_args(argv)
+
+    summary = write_changelog(args.old, args.new, args.out, args.store)
+    for name, c in summary["files"].items():
+        print(f"[OK] {name}: {c['old_records']} -> {c['new_records']} records, "
+              + ", ".join(f"{c[k]} {k}" for k in ("unchanged",) + CHANGE_KINDS))
+    print(f"[OK] Wrote CHANGELOG_{summary['new']}.json/.md and {summary['changes']} to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""Make the flat pipeline scripts importable by module name, as they import each other."""
+
+import sys
+from pathlib import Path
+
+PIPELINES = Path(__file__).resolve().parents[1] / "scripts" / "pipelines"
+if str(PIPELINES) not in sys.path:
+    sys.path.insert(0, str(PIPELINES))
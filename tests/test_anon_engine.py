@@ -0,0 +1,100 @@
+"""Compiled single-pass anonymizer against the ordered passes it replaced."""
+
+import random
+import re
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+import HHI_Codex_FullPipeline_Anon as pipeline
+from anon_engine import AnonEngine, Gazetteer, Tokenize
+from synth_codex_raw import generate_file
+
+DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+LEDGER = Path(__file__).resolve().parents[1] / "02_OPS" / "Master_OPS_Ledger_434.txt"
+
+# Word boundaries, overlaps and case folding the single scan has to get right.
+TRICKY = [
+    "Amy's mom met Montez (not Tez) in Kansas City, Texas on May 5, 2020.",
+    "I'm sure I’ve seen my ex-husband's ex-wife; I'd call 555-123-4567.",
+    "Write to amy.rex@houston.example.com or brenda@newmexico.org, mine too.",
+    "AMY, amy and aMy; Lincoln Nebraska Lincoln-Nebraska; exex ex ex-",
+    "12/05/2021 2021-12-05 Dec 5, 21 june 14 Jun 14,2019 Sept 3",
+    "my partner's girlfriend's boyfriend's son's daughter, Eddie Floyd",
+    "Llano River, Albuquerque, New  Mexico, New Mexico.",
+    "I I'm I'mx xI my mine myself mother-in-law dad's",
+]
+
+
+def legacy_anonymize(text: str, anon_map: Dict[str, str]) -> str:
+    """anonymize_text_hard of the baseline pipeline: one re.sub per rule, in order."""
+    text = pipeline.EMAIL_PATTERN.sub("CONTACT_EMAIL", text)
+    text = pipeline.PHONE_PATTERN.sub("CONTACT_PHONE", text)
+
+    def token(category: str, prefix: str, surface: str) -> str:
+        key = f"{category}::{surface}"
+        if key not in anon_map:
+            idx = sum(k.startswith(f"{category}::") for k in anon_map) + 1
+            anon_map[key] = f"{prefix}_{idx:03d}"
+        return anon_map[key]
+
+    text = pipeline.DATE_PATTERN.sub(lambda m: token("DATE", "DATE", m.group(0)), text)
+    text = pipeline.MONTH_DATE_PATTERN.sub(lambda m: token("DATE", "DATE", m.group(0)), text)
+    for name in pipeline.CUSTOM_NAMES:
+        text = re.sub(rf"\b{name}\b", token("NAME", "NAME", name), text, flags=re.I)
+    for loc in pipeline.CUSTOM_LOCATIONS:
+        text = re.sub(rf"\b{re.escape(loc)}\b", token("LOC", "LOC", loc), text, flags=re.I)
+    for pattern, replacement in pipeline.PRONOUN_RULES:
+        text = re.sub(pattern, replacement, text, flags=re.I)
+    for rel in pipeline.RELATION_TERMS:
+        text = re.sub(rf"\b{rel}\b", token("REL", "RELATION", rel), text, flags=re.I)
+    return text
+
+
+def _blocks():
+    texts = list(TRICKY)
+    if LEDGER.exists():
+        ledger = pipeline.normalize_text(LEDGER.read_text(encoding="utf-8", errors="ignore"))
+        texts += ledger.split("\n\n")
+    for i in range(4):
+        texts += generate_file(17, i, 8192).split("\n\n")
+    rng = random.Random(5)
+    words = " ".join(TRICKY).split()
+    texts += [" ".join(rng.choice(words) for _ in range(30)) for _ in range(300)]
+    return texts
+
+
+@pytest.fixture(scope="module")
+def blocks():
+    return _blocks()
+
+
+def test_engine_matches_the_baseline_passes(blocks):
+    engine_map: Dict[str, str] = {}
+    legacy_map: Dict[str, str] = {}
+    for text in blocks:
+        assert pipeline.ANON_ENGINE.anonymize(text, engine_map) == \
+            legacy_anonymize(text, legacy_map)
+    assert list(engine_map.items()) == list(legacy_map.items())
+
+
+def test_engine_matches_its_sequential_reference(blocks):
+    engine_map: Dict[str, str] = {}
+    sequential_map: Dict[str, str] = {}
+    for text in blocks:
+        assert pipeline.ANON_ENGINE.anonymize(text, engine_map) == \
+            pipeline.ANON_ENGINE.anonymize_sequential(text, sequential_map)
+    assert list(engine_map.items()) == list(sequential_map.items())
+
+
+def test_category_numbers_follow_the_keys_already_in_the_map():
+    engine = AnonEngine([Tokenize(DATE, "DATE"), Gazetteer(["Ana", "Bo"], "NAME")])
+    anon_map = {"DATE::1999-01-01": "DATE_001"}
+    assert engine.anonymize("Ana met Bo on 2020-01-02", anon_map) == \
+        "NAME_001 met NAME_002 on DATE_002"
+    # Keys added behind the engine's back are counted too.
+    anon_map["DATE::1999-01-02"] = "DATE_003"
+    assert engine.anonymize("2020-01-03", anon_map) == "DATE_004"
+    # A different map starts its own count.
+    assert engine.anonymize("2020-01-03 Bo", {}) == "DATE_001 NAME_002"
@@ -0,0 +1,78 @@
+"""End-to-end runs of HHI_Codex_FullPipeline_Anon.py under a temp root."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+import HHI_Codex_FullPipeline_Anon as pipeline
+from release_profile import source_id
+
+
+def _ledger(*ops) -> str:
+    parts = []
+    for op_id, mode in ops:
+        parts.append(f"■ Op {op_id} — Operation {op_id}\nMode: {mode}\nGlyph: Spiral\n")
+    return "\n".join(parts)
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    """Re-root every configured path under tmp_path (as bench_pipelines.py does)."""
+    old_root = pipeline.ROOT
+    for name, value in list(vars(pipeline).items()):
+        if name.isupper() and isinstance(value, Path) and value.is_relative_to(old_root):
+            monkeypatch.setattr(pipeline, name, tmp_path / value.relative_to(old_root))
+    pipeline.RAW_DIR.mkdir(parents=True)
+    return tmp_path
+
+
+def _run(*argv: str) -> None:
+    pipeline.main(["--workers", "1", *argv])
+
+
+@pytest.mark.parametrize("profile, key", [("full", "source"), ("compact", "source_id")])
+def test_ops_carry_their_source_and_diff_per_ledger(root, profile, key):
+    raw = pipeline.RAW_DIR
+    # Both ledgers number their ops from 1.
+    (raw / "a.txt").write_text(_ledger((1, "Alpha"), (2, "Beta")), encoding="utf-8")
+    (raw / "b.txt").write_text(_ledger((1, "Gamma"), (2, "Delta")), encoding="utf-8")
+    _run("--profile", profile)
+    (raw / "a.txt").write_text(_ledger((1, "Omega"), (2, "Beta")), encoding="utf-8")
+    _run("--profile", profile)
+
+    ops_file = pipeline.VERSIONS_DIR / "v002" / "ops_ledger_anon.jsonl"
+    ops = [json.loads(line) for line in ops_file.read_text(encoding="utf-8").splitlines()]
+    sources = [op[key] for op in ops]
+    assert len(set(sources)) == 2 and all(sources)
+
+    changelog = json.loads((pipeline.CHANGELOG_DIR / "CHANGELOG_v002.json").read_text("utf-8"))
+    ops_counts = changelog["files"]["ops_ledger_anon.jsonl"]
+    assert (ops_counts["modified"], ops_counts["added"], ops_counts["removed"]) == (1, 0, 0)
+    changes = [json.loads(line) for line in
+               (pipeline.CHANGELOG_DIR / changelog["changes"]).read_text("utf-8").splitlines()]
+    op_changes = [c for c in changes if c["op_id"] is not None]
+    assert [(c["change"], c["op_id"]) for c in op_changes] == [("modified", "1")]
+    a_source = "a.txt" if key == "source" else source_id(str(raw / "a.txt"), raw)
+    assert op_changes[0]["source"] == a_source
+    assert "" not in changelog["sources"]
+
+
+@pytest.mark.parametrize("symlinks", [True, False])
+def test_publish_latest_rewrites_the_pointer(root, monkeypatch, symlinks):
+    if not symlinks:
+        def no_symlink(*args, **kwargs):
+            raise OSError("symlinks unavailable")
+        monkeypatch.setattr(pipeline.os, "symlink", no_symlink)
+    for name in ("v001", "v002"):
+        vdir = pipeline.VERSIONS_DIR / name
+        vdir.mkdir(parents=True)
+        (vdir / "metadata.json").write_text(json.dumps({"version": name}), encoding="utf-8")
+        method = pipeline.publish_latest(vdir)
+        assert method == ("symlink" if symlinks else "hardlinks")
+        pointer = json.loads(pipeline.LATEST_POINTER.read_text(encoding="utf-8"))
+        assert pointer == {"version": name, "path": f"versions/{name}"}
+        meta = json.loads((pipeline.LATEST_DIR / "metadata.json").read_text(encoding="utf-8"))
+        assert meta["version"] == name
+    leftovers = {p.name for p in pipeline.OUT_ROOT.iterdir()}
+    assert leftovers == {"versions", "latest", "latest.json"}
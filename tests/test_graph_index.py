@@ -0,0 +1,30 @@
+"""CSR graph index of codex_graph_edges rows."""
+
+from graph_index import GraphIndex, build_graph
+
+
+def _edge(source, op_id, glyph):
+    return {"source": source, "from": f"op:{op_id}", "to": f"glyph:{glyph}",
+            "relation": "carries_glyph"}
+
+
+def test_ops_of_different_ledgers_stay_apart(tmp_path):
+    # Both ledgers have an op 001; they carry unrelated glyphs.
+    edges = [_edge("a.txt", "001", "AAAAAA"), _edge("b.txt", "001", "BBBBBB"),
+             _edge("a.txt", "001", "AAAAAA")]
+    graph = build_graph(edges)
+    assert graph.nodes == ["glyph:AAAAAA", "glyph:BBBBBB", "op:a.txt#001", "op:b.txt#001"]
+    assert graph.edge_count == 2
+    assert [size for size, _ in graph.component_sizes()] == [2, 2]
+
+    graph.save(tmp_path)
+    loaded = GraphIndex.load(tmp_path)
+    layers = loaded.k_hop(loaded.node_id("glyph:BBBBBB"), 1)
+    assert [loaded.nodes[int(i)] for i in layers[0]] == ["op:b.txt#001"]
+
+
+def test_shared_glyph_links_ops_across_ledgers():
+    graph = build_graph([_edge("a.txt", "001", "CCCCCC"), _edge("b.txt", "001", "CCCCCC")])
+    lo, hi = graph.kind_range("op")
+    assert graph.nodes[lo:hi] == ["op:a.txt#001", "op:b.txt#001"]
+    assert graph.component_sizes() == [(3, 0)]
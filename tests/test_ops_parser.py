@@ -0,0 +1,58 @@
+"""Shared OPS parser: both split modes against the regexes they replaced."""
+
+import re
+
+import pytest
+
+from codex_extract import extract_file, extract_file_multipass
+from ops_parser import iter_ops
+
+# The OPS_PATTERN of build_codex_datasets_v3_1.py and process_codex_raw.py.
+V3_1_PATTERN = re.compile(r"■\s*Op\s+(\d+)\s*—\s*Operation\s+(\d+)(.*?)(?=■\s*Op\s+\d+|$)", re.S)
+
+MIDLINE = ("■ Op 1 — Operation 1\n"
+           "see also ■ Op 2 — Operation 2 body\n"
+           "■ Op 3 — Operation 3\nMode: Ami Node 7\n")
+
+SAMPLES = [
+    MIDLINE,
+    "",
+    "preamble ■ Op 4 — Operation 4\nGlyph: Spiral\n\n■ Op 5 — Operation 5",
+    "■ Op 6 — Operation 6 ■ Op 7 not a header ■ Op 8 — Operation 8 tail",
+    "■ Op 9 — Operation 9\n■ Op 10 — Operation 10\n",
+    "■ Op 11 — Operation 11 ▶ é ■Op 12—Operation 12\n\n",
+]
+
+
+def test_line_start_mode_skips_midline_headers():
+    ops = list(iter_ops(MIDLINE))
+    assert [op.op_id for op in ops] == ["1", "3"]
+    assert "Operation 2 body" in ops[0].body
+    assert ops[1].fields == {"mode": "Ami Node 7"}
+
+
+def test_midline_mode_splits_like_the_v3_1_pattern():
+    assert [op.op_id for op in iter_ops(MIDLINE, midline=True)] == ["1", "2", "3"]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_midline_mode_matches_the_old_regex(text):
+    old = [m.group(1, 2, 3) for m in V3_1_PATTERN.finditer(text)]
+    new = [(op.op_id, op.op_number, op.body) for op in iter_ops(text, False, midline=True)]
+    assert new == old
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_offsets_locate_each_op(text):
+    data = text.encode("utf-8")
+    for midline in (False, True):
+        for op in iter_ops(text, False, midline):
+            chunk = data[op.offset:op.offset + op.length].decode("utf-8")
+            assert chunk.startswith("■") and chunk.endswith(op.body)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_v3_1_extractors_agree(text):
+    assert extract_file("a.txt", text) == extract_file_multipass("a.txt", text)
+    ops = extract_file("a.txt", text)["ops"]
+    assert [rec["op_id"] for rec in ops] == [m.group(1) for m in V3_1_PATTERN.finditer(text)]
@@ -0,0 +1,33 @@
+"""SQLite catalog of records across versions."""
+
+import json
+
+import pytest
+
+from version_catalog import VersionCatalog, main
+
+
+@pytest.fixture
+def root(tmp_path):
+    vdir = tmp_path / "versions" / "v001"
+    vdir.mkdir(parents=True)
+    rows = [{"op_id": "017", "source": "a.txt"}, {"op_id": "017", "source": "b.txt"}]
+    (vdir / "ops_ledger_anon.jsonl").write_text(
+        "".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    return tmp_path
+
+
+def test_find_op_matches_padded_ids_per_source(root):
+    with VersionCatalog(root / "catalog.sqlite") as cat:
+        cat.rebuild(root)
+        rows = cat.find_op("17")
+    assert [(r[0], r[3], r[4]) for r in rows] == [("v001", "017", "a.txt"),
+                                                  ("v001", "017", "b.txt")]
+
+
+def test_op_cli_warns_on_a_non_numeric_id(root, capsys):
+    main(["--root", str(root), "rebuild"])
+    main(["--root", str(root), "op", "abc"])
+    assert "[WARN] op id must be a number, got 'abc'" in capsys.readouterr().out
+    with VersionCatalog(root / "catalog.sqlite") as cat, pytest.raises(ValueError):
+        cat.find_op("abc")
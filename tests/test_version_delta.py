@@ -0,0 +1,106 @@
+"""Delta-encoded versions rebuild byte for byte."""
+
+import json
+import random
+from typing import Dict, List
+
+import pytest
+
+import version_delta
+from object_store import ObjectStore
+from version_delta import (VersionReader, apply_delta, diff_lines, encode_version, is_delta,
+                           iter_delta)
+
+RENUMBER = {"blocks_anon.jsonl": "index"}
+
+
+def _blocks(texts: List[str]) -> str:
+    return "".join(json.dumps({"index": i, "text_anon": t}, ensure_ascii=False) + "\n"
+                   for i, t in enumerate(texts))
+
+
+def _edit(texts: List[str], rng: random.Random) -> List[str]:
+    texts = list(texts)
+    for _ in range(rng.randint(1, 6)):
+        roll, i = rng.random(), rng.randrange(len(texts))
+        if roll < 0.3:
+            del texts[i]
+        elif roll < 0.6:
+            texts.insert(i, f"new {rng.random()}")
+        elif roll < 0.8:
+            texts.insert(rng.randrange(len(texts)), texts.pop(i))   # move
+        else:
+            texts[i] += " (edited)"
+    return texts
+
+
+@pytest.fixture
+def chain(tmp_path) -> Dict[str, Dict[str, bytes]]:
+    """Four versions with moves, renumbered blocks, a new file and odd line breaks."""
+    rng = random.Random(11)
+    texts = [f"block {i}   é" for i in range(60)]
+    versions = {}
+    for n in range(1, 5):
+        files = {
+            "blocks_anon.jsonl": _blocks(texts).encode("utf-8"),
+            "ops_ledger_anon.jsonl": "".join(
+                json.dumps({"op_id": f"{i:03d}", "mode": texts[i % len(texts)]}) + "\n"
+                for i in range(20 + n)).encode("utf-8"),
+            "metadata.json": json.dumps({"version": f"v{n:03d}"}).encode("utf-8"),
+        }
+        if n >= 3:
+            files["notes.txt"] = f"no trailing newline {n}".encode("utf-8")
+        vdir = tmp_path / "versions" / f"v{n:03d}"
+        vdir.mkdir(parents=True)
+        for name, data in files.items():
+            (vdir / name).write_bytes(data)
+        versions[vdir.name] = files
+        texts = _edit(texts, rng)
+    return versions
+
+
+def test_delta_chain_round_trips(tmp_path, chain):
+    versions_dir, store_dir = tmp_path / "versions", tmp_path / "store"
+    ObjectStore(store_dir).compact(versions_dir / "v001")
+    reader = VersionReader(versions_dir, store_dir)
+    for version in ("v002", "v003"):
+        stats = encode_version(reader, version, RENUMBER)
+        assert stats is not None and stats["blocks_anon.jsonl"]["copied"] > 0
+        assert is_delta(versions_dir / version)
+    assert reader.depth("v003") == 2
+
+    for version, files in chain.items():
+        assert reader.file_names(version) == sorted(files)
+        for name, data in files.items():
+            assert reader.read_bytes(version, name) == data
+            assert "".join(reader.iter_lines(version, name)).encode("utf-8") == data
+        dest = reader.materialize(version, tmp_path / "out" / version)
+        assert {p.name: p.read_bytes() for p in dest.iterdir()} == files
+
+
+def test_snapshot_interval_cuts_the_chain(tmp_path, chain, monkeypatch):
+    monkeypatch.setattr(version_delta, "SNAPSHOT_INTERVAL", 1)
+    reader = VersionReader(tmp_path / "versions")
+    assert encode_version(reader, "v002", RENUMBER) is not None
+    assert encode_version(reader, "v003", RENUMBER) is None
+    assert not is_delta(tmp_path / "versions" / "v003")
+    assert reader.read_bytes("v002", "metadata.json") == chain["v002"]["metadata.json"]
+
+
+def test_streamed_replay_equals_apply_delta():
+    rng = random.Random(3)
+    for _ in range(500):
+        parent = [f"{rng.randrange(12)}\n" for _ in range(rng.randrange(30))]
+        child = [rng.choice(parent) if parent and rng.random() < 0.7 else f"x{rng.random()}\n"
+                 for _ in range(rng.randrange(30))]
+        entry = diff_lines(parent, child)
+        assert apply_delta(parent, entry) == child
+        assert list(iter_delta(iter(parent), entry)) == child
+
+
+def test_renumbered_records_are_copied_not_inserted():
+    parent = _blocks(["a", "b", "c"]).splitlines(True)
+    child = _blocks(["b", "c", "a"]).splitlines(True)
+    entry = diff_lines(parent, child, "index")
+    assert entry["stats"] == {"copied": 3, "inserted": 0, "deleted": 0}
+    assert list(iter_delta(parent, entry)) == child
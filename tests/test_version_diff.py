@@ -0,0 +1,125 @@
+"""Record-level diff between two plain (materialized) dataset versions."""
+
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from object_store import ObjectStore
+from version_diff import diff_versions
+
+
+def _write_version(root: Path, name: str, files: Dict[str, List[Dict[str, Any]]]) -> Path:
+    vdir = root / name
+    vdir.mkdir(parents=True)
+    for file, records in files.items():
+        with (vdir / file).open("w", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec) + "\n")
+    return vdir
+
+
+def _diff(tmp_path: Path, old: Dict[str, list], new: Dict[str, list]):
+    out = io.StringIO()
+    result = diff_versions(_write_version(tmp_path, "v001", old),
+                           _write_version(tmp_path, "v002", new), out=out)
+    changes = [json.loads(line) for line in out.getvalue().splitlines()]
+    return result, changes
+
+
+def _op(source: str, op_id: str, mode: str) -> Dict[str, Any]:
+    return {"op_id": op_id, "op_number": op_id, "source": source, "mode": mode,
+            "block_anon": f"{source} op {op_id} {mode}"}
+
+
+def test_duplicate_op_ids_across_ledgers_pair_by_source(tmp_path):
+    # Every ledger numbers its ops from 1. Op 1 of a.txt is edited; op 1 of
+    # b.txt is removed. Pairing on op_id alone would report b.txt's op 1 as
+    # a modification of a.txt's.
+    old = {"ops_ledger_anon.jsonl": [_op("a.txt", "1", "x"), _op("a.txt", "2", "x"),
+                                     _op("b.txt", "1", "y"), _op("b.txt", "2", "y")]}
+    new = {"ops_ledger_anon.jsonl": [_op("a.txt", "1", "z"), _op("a.txt", "2", "x"),
+                                     _op("b.txt", "2", "y")]}
+    result, changes = _diff(tmp_path, old, new)
+
+    kinds = {(c["change"], c["source"], c["op_id"]) for c in changes}
+    assert kinds == {("modified", "a.txt", "1"), ("removed", "b.txt", "1")}
+    modified = next(c for c in changes if c["change"] == "modified")
+    assert (modified["old_line"], modified["new_line"]) == (0, 0)
+    assert "mode" in modified["fields"]
+    assert result["sources"]["a.txt"]["modified"] == 1
+    assert result["sources"]["b.txt"]["removed"] == 1
+    assert "" not in result["sources"]
+
+
+def test_compact_source_id_is_part_of_the_identity(tmp_path):
+    def op(sid, op_id, mode):
+        return {"op_id": op_id, "op_number": op_id, "source_id": sid, "mode": mode,
+                "block_anon": mode}
+
+    old = {"ops_ledger_anon.jsonl": [op("s1", "1", "x"), op("s2", "1", "y")]}
+    new = {"ops_ledger_anon.jsonl": [op("s2", "1", "q")]}
+    _, changes = _diff(tmp_path, old, new)
+    assert {(c["change"], c["source"]) for c in changes} == {("removed", "s1"),
+                                                             ("modified", "s2")}
+
+
+def _block(index: int, source: str, text: str) -> Dict[str, Any]:
+    return {"index": index, "source": source, "text_anon": text}
+
+
+def _kinds(tmp_path: Path, store: bool = False):
+    ops_old = [_op("a.txt", str(i), "x") for i in range(1, 7)]
+    ops_new = [ops_old[0], ops_old[2], ops_old[1],                   # op 2 moved
+               _op("a.txt", "4", "edited"),                          # op 4 modified
+               ops_old[5], _op("a.txt", "7", "x")]                   # op 5 removed, 7 added
+    blocks_old = [_block(0, "a.txt", "one"), _block(1, "a.txt", "two"),
+                  _block(2, "b.txt", "three")]
+    # New indexes only (positional): unchanged. b.txt's block edited: modified.
+    blocks_new = [_block(5, "a.txt", "one"), _block(6, "a.txt", "two"),
+                  _block(7, "b.txt", "three!")]
+    old = _write_version(tmp_path / "versions", "v001",
+                         {"ops_ledger_anon.jsonl": ops_old, "blocks_anon.jsonl": blocks_old})
+    new = _write_version(tmp_path / "versions", "v002",
+                         {"ops_ledger_anon.jsonl": ops_new, "blocks_anon.jsonl": blocks_new})
+    store_dir = None
+    if store:
+        store_dir = tmp_path / "store"
+        ObjectStore(store_dir).compact(old)
+    out = io.StringIO()
+    result = diff_versions(old, new, store_dir, out)
+    return result, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize("store", [False, True])
+def test_change_kinds(tmp_path, store):
+    result, changes = _kinds(tmp_path, store)
+
+    ops = result["files"]["ops_ledger_anon.jsonl"]
+    assert ops == {"old_records": 6, "new_records": 6, "unchanged": 3,
+                   "added": 1, "removed": 1, "modified": 1, "moved": 1}
+    blocks = result["files"]["blocks_anon.jsonl"]
+    assert blocks == {"old_records": 3, "new_records": 3, "unchanged": 2,
+                      "added": 0, "removed": 0, "modified": 1, "moved": 0}
+    assert result["changes"] == 5
+
+    rows = [(c["file"], c["change"], c["op_id"], c["old_line"], c["new_line"]) for c in changes]
+    assert rows == [
+        ("blocks_anon.jsonl", "modified", None, 2, 2),
+        ("ops_ledger_anon.jsonl", "moved", "2", 1, 2),
+        ("ops_ledger_anon.jsonl", "modified", "4", 3, 3),
+        ("ops_ledger_anon.jsonl", "removed", "5", 4, None),
+        ("ops_ledger_anon.jsonl", "added", "7", None, 5),
+    ]
+    assert changes[0]["fields"] == ["text_anon"]
+    assert result["sources"] == {"a.txt": {"added": 1, "removed": 1, "modified": 1, "moved": 1},
+                                 "b.txt": {"added": 0, "removed": 0, "modified": 1, "moved": 0}}
+
+
+def test_identical_versions_have_no_changes(tmp_path):
+    records = {"ops_ledger_anon.jsonl": [_op("a.txt", "1", "x"), _op("a.txt", "1", "x")]}
+    result, changes = _diff(tmp_path, records, records)
+    assert changes == [] and result["changes"] == 0
+    assert result["files"]["ops_ledger_anon.jsonl"]["unchanged"] == 2